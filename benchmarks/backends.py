@@ -0,0 +1,57 @@
+"""
+Benchmark of HTML backends on fragment-heavy and document-heavy workloads
+
+    python -m benchmarks.backends
+    python -m benchmarks.backends --size 50000 --fragments 2000
+"""
+import argparse
+import random
+from typing import Dict, List
+
+from benchmarks.corpus import make_document, make_registry, make_shortcode
+from benchmarks.run import measure
+from shortcoder.backends import BACKENDS, lxml_available
+
+
+def available_backends() -> List[str]:
+    return [name for name in BACKENDS if name != "lxml" or lxml_available()]
+
+
+def run(backend: str, size: int = 200_000, density: float = 0.1, fragments: int = 1000, repeat: int = 3) -> Dict:
+    """milliseconds per operation of a registry using ``backend``"""
+    sh = make_registry(2, backend)
+    rnd = random.Random(0)
+    # fragment-heavy: many small rendered shortcodes, each reversed on its own
+    snippets = [sh.parse(make_shortcode(rnd, 2)) for _ in range(fragments)]
+    # document-heavy: one large rendered document
+    source, _ = make_document(size, density)
+    rendered = sh.parse(source)
+    html = sh.shortcodes["yt"]
+    operations = {
+        f"fragment x{fragments}": lambda: [html.backend.fragment(snippet) for snippet in snippets],
+        f"reverse x{fragments}": lambda: [sh.reverse(snippet) for snippet in snippets],
+        "parse document": lambda: sh.parse(source),
+        "reverse document": lambda: sh.reverse(rendered),
+        "reverse document=True": lambda: sh.reverse(rendered, document=True),
+    }
+    return {name: measure(func, repeat) * 1000 for name, func in operations.items()}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200_000, help="characters of the document")
+    parser.add_argument("--density", type=float, default=0.1, help="shortcode probability per word")
+    parser.add_argument("--fragments", type=int, default=1000, help="rendered shortcodes to reverse one by one")
+    parser.add_argument("--repeat", type=int, default=3, help="samples per operation")
+    args = parser.parse_args(argv)
+
+    backends = available_backends()
+    results = {name: run(name, args.size, args.density, args.fragments, args.repeat) for name in backends}
+    print(f"{'operation':<24}" + "".join(f"{name + ' ms':>16}" for name in backends))
+    for operation in results[backends[0]]:
+        print(f"{operation:<24}" + "".join(f"{results[name][operation]:16.2f}" for name in backends))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,32 @@
+"""
+Compare shortcode argument tokenizers:
+
+    python -m benchmarks.bench_tokenizer
+"""
+import shlex
+import timeit
+
+from shortcoder.tokenizer import split_args
+
+CASES = {
+    "positional": "2fmCcfAb4k4",
+    "keyword": "href=https://example.com/some/page text=image",
+    "quoted": """href="https://example.com/page with space" text="it's quoted" title='a "b" c'""",
+}
+
+
+def main(number: int = 20000):
+    for case, text in CASES.items():
+        assert split_args(text) == shlex.split(text)
+        results = {}
+        for name, func in (("shlex.split", shlex.split), ("split_args", split_args)):
+            results[name] = min(timeit.repeat(lambda: func(text), number=number, repeat=3)) / number
+        speedup = results["shlex.split"] / results["split_args"]
+        print(
+            f"{case:<12} shlex.split {results['shlex.split'] * 1e6:8.2f}us"
+            f"  split_args {results['split_args'] * 1e6:8.2f}us  x{speedup:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Synthetic corpus generators modelled on examples/youtube.py and examples/html-links.py
+"""
+import random
+from typing import List, Tuple
+
+from shortcoder import HtmlKwargShortcode, HtmlPargShortcode, Input, Shortcoder
+
+YT_TEMPLATE = (
+    '<iframe width="560" height="315" data-id="{id}" src="https://www.youtube.com/embed/{id}" '
+    'title="YouTube video player" frameborder="0" allow="accelerometer; autoplay; clipboard-write; '
+    'encrypted-media; gyroscope; picture-in-picture; web-share" allowfullscreen></iframe>'
+)
+LINK_TEMPLATE = '<a href="{url}" class="blue">{text}</a>'
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore "
+    "magna aliqua <b>bold</b> <em>emphasis</em> <a href=\"https://example.com\">plain link</a>"
+).split(" ")
+
+
+def make_shortcodes(registry_size: int, backend: str = None) -> List:
+    """
+    youtube and link shortcodes followed by numbered copies to pad the registry to ``registry_size``,
+    using HTML ``backend`` (default when None)
+    """
+    shortcodes = [
+        HtmlPargShortcode("yt", inputs=[Input("id", xpath="@data-id")], template=YT_TEMPLATE, backend=backend),
+        HtmlKwargShortcode(
+            "link",
+            inputs=[Input("url", xpath="@href"), Input("text", xpath="text()", default="some link")],
+            template=LINK_TEMPLATE,
+            backend=backend,
+        ),
+    ]
+    for i in range(registry_size - len(shortcodes)):
+        shortcodes.append(
+            HtmlPargShortcode(
+                f"embed{i}", inputs=[Input("id", xpath="@data-id")], template=YT_TEMPLATE, backend=backend
+            )
+        )
+    return shortcodes[:registry_size]
+
+
+def make_registry(registry_size: int = 2, backend: str = None) -> Shortcoder:
+    return Shortcoder(make_shortcodes(registry_size, backend))
+
+
+def make_shortcode(rnd: random.Random, registry_size: int) -> str:
+    choice = rnd.randrange(max(registry_size, 2))
+    video = "".join(rnd.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") for _ in range(11))
+    if choice == 0:
+        return f"[%yt {video} %]"
+    if choice == 1:
+        return f'[%link url=https://example.com/{video} text="link to {video}" %]'
+    return f"[%embed{choice - 2} {video} %]"
+
+
+def make_document(size: int, density: float, registry_size: int = 2, seed: int = 0) -> Tuple[str, int]:
+    """
+    Generate markdown-like document of roughly ``size`` characters
+
+    ``density`` is the probability of a shortcode in place of a word. Returns document and shortcode count.
+    """
+    rnd = random.Random(seed)
+    parts = []
+    length = count = 0
+    while length < size:
+        if rnd.random() < density:
+            part = make_shortcode(rnd, registry_size)
+            count += 1
+        else:
+            part = rnd.choice(WORDS)
+        parts.append(part)
+        length += len(part) + 1
+    return " ".join(parts), count
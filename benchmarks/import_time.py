@@ -0,0 +1,60 @@
+"""
+Import time benchmark of ``import shortcoder`` in fresh interpreters, e.g. for CLI and serverless invocations
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 20 --top 15
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# modules that should only be imported once the feature needing them is used
+HEAVY_MODULES = ("lxml", "asyncio", "concurrent.futures", "multiprocessing", "inspect", "pickle", "mmap")
+
+PROBE = "import sys, shortcoder; print(' '.join(sorted(sys.modules)))"
+
+
+def import_profile(statement: str = PROBE) -> Tuple[Dict[str, Tuple[int, int]], List[str]]:
+    """``{module: (self, cumulative microseconds)}`` of ``-X importtime`` and modules loaded by statement"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True, check=True
+    )
+    profile = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        if own.strip().isdigit():
+            profile[name.strip()] = (int(own), int(cumulative))
+    return profile, process.stdout.split()
+
+
+def run(runs: int = 10) -> Tuple[float, Dict[str, Tuple[int, int]], List[str]]:
+    """median milliseconds of ``import shortcoder``, profile of the median run and heavy modules it loaded"""
+    profiles = sorted((import_profile() for _ in range(runs)), key=lambda result: result[0]["shortcoder"][1])
+    profile, modules = profiles[len(profiles) // 2]
+    median = statistics.median(result[0]["shortcoder"][1] for result in profiles) / 1000
+    heavy = [name for name in HEAVY_MODULES if name in modules]
+    return median, profile, heavy
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters to import shortcoder in")
+    parser.add_argument("--top", type=int, default=10, help="modules with the highest self time to list")
+    args = parser.parse_args(argv)
+
+    median, profile, heavy = run(args.runs)
+    print(f"import shortcoder: {median:.1f} ms (median of {args.runs})")
+    print(f"heavy modules loaded: {', '.join(heavy) or 'none'}")
+    print(f"{'module':<40} {'self ms':>8} {'total ms':>9}")
+    slowest = sorted(profile.items(), key=lambda item: item[1][0], reverse=True)[: args.top]
+    for name, (own, cumulative) in slowest:
+        print(f"{name:<40} {own / 1000:8.2f} {cumulative / 1000:9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,59 @@
+"""
+Memory benchmark for long-lived registries and tokenized documents, e.g. in a preview server
+
+    python -m benchmarks.memory
+    python -m benchmarks.memory --registries 100 --documents 20
+"""
+import argparse
+import gc
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.corpus import make_document, make_registry
+
+
+def allocated(build: Callable) -> int:
+    """bytes still allocated by objects ``build`` returns"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def run(registries: int = 50, registry_size: int = 40, documents: int = 10, size: int = 200_000) -> Dict[str, float]:
+    """bytes per registry, per tokenized document and per scanned document"""
+    sh = make_registry(registry_size)
+    texts: List[str] = [make_document(size, 0.1, registry_size, seed=seed)[0] for seed in range(documents)]
+    results = {
+        "registry": allocated(lambda: [make_registry(registry_size) for _ in range(registries)]) / registries,
+        "tokenized document": allocated(lambda: [sh.tokenize(text) for text in texts]) / documents,
+        "find_shortcodes": allocated(lambda: [sh.find_shortcodes(text) for text in texts]) / documents,
+    }
+    if hasattr(sh, "scan"):
+        results["scan"] = allocated(lambda: [sh.scan(text) for text in texts]) / documents
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registries", type=int, default=50, help="registries to build")
+    parser.add_argument("--registry-size", type=int, default=40, help="shortcodes per registry")
+    parser.add_argument("--documents", type=int, default=10, help="documents to tokenize")
+    parser.add_argument("--size", type=int, default=200_000, help="characters per document")
+    args = parser.parse_args(argv)
+
+    results = run(args.registries, args.registry_size, args.documents, args.size)
+    print(f"{'structure':<20} {'KiB each':>10}")
+    for name, size in results.items():
+        print(f"{name:<20} {size / 1024:10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
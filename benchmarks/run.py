@@ -0,0 +1,131 @@
+"""
+Benchmark suite for parse, reverse and round-trip throughput
+
+    python -m benchmarks.run                          # run and print results
+    python -m benchmarks.run --save baseline.json     # store results as baseline
+    python -m benchmarks.run --compare baseline.json  # fail when throughput regressed past --threshold
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+from benchmarks.corpus import make_document, make_registry
+
+
+class Case(NamedTuple):
+    name: str
+    size: int
+    density: float
+    registry_size: int
+
+
+SIZES = (10_000, 200_000)
+DENSITIES = (0.01, 0.1)
+REGISTRY_SIZES = (2, 40)
+
+
+def cases(quick: bool = False) -> List[Case]:
+    sizes = SIZES[:1] if quick else SIZES
+    result = []
+    for size in sizes:
+        for density in DENSITIES:
+            for registry_size in REGISTRY_SIZES:
+                result.append(Case(f"{size // 1000}k-d{density}-r{registry_size}", size, density, registry_size))
+    return result
+
+
+def measure(func: Callable, repeat: int, min_time: float = 0.02) -> float:
+    """best wall time per call out of ``repeat`` samples, each looping for at least ``min_time`` seconds"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+def run_case(case: Case, repeat: int) -> Dict[str, Dict[str, float]]:
+    sh = make_registry(case.registry_size)
+    source, count = make_document(case.size, case.density, case.registry_size)
+    rendered = sh.parse(source)
+    shortcode = sh.shortcodes["yt"]
+    operations = {
+        "parse": (lambda: sh.parse(source), len(source)),
+        "reverse": (lambda: sh.reverse(rendered), len(rendered)),
+        "round-trip": (lambda: sh.reverse(sh.parse(source)), len(source)),
+        # HTMLMixin.convert alone, MB/s of rendered output
+        "convert": (
+            lambda: [shortcode.convert({"id": "2fmCcfAb4k4"}) for _ in range(count)],
+            len(shortcode.convert({"id": "2fmCcfAb4k4"})) * count,
+        ),
+    }
+    results = {}
+    for operation, (func, size) in operations.items():
+        seconds = measure(func, repeat)
+        results[operation] = {
+            "seconds": seconds,
+            "mb_per_s": size / seconds / 1e6,
+            "shortcodes_per_s": count / seconds,
+        }
+    return results
+
+
+def run(quick: bool = False, repeat: int = 5) -> Dict[str, Dict[str, Dict[str, float]]]:
+    return {case.name: run_case(case, repeat) for case in cases(quick)}
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """list of regressions where shortcodes/s dropped more than ``threshold`` below baseline"""
+    regressions = []
+    for case, operations in baseline.get("results", {}).items():
+        for operation, expected in operations.items():
+            current = results.get(case, {}).get(operation)
+            if current is None or not expected["shortcodes_per_s"]:
+                continue
+            ratio = current["shortcodes_per_s"] / expected["shortcodes_per_s"]
+            if ratio < 1 - threshold:
+                regressions.append(f"{case} {operation}: {ratio:.0%} of baseline")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="only run the smallest document size")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, best is kept")
+    parser.add_argument("--save", help="write results to json baseline file")
+    parser.add_argument("--compare", help="compare results against json baseline file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick, repeat=args.repeat)
+    print(f"{'case':<20} {'operation':<11} {'MB/s':>8} {'shortcodes/s':>14}")
+    for case, operations in results.items():
+        for operation, result in operations.items():
+            print(f"{case:<20} {operation:<11} {result['mb_per_s']:8.2f} {result['shortcodes_per_s']:14,.0f}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import sys
+
+from shortcoder.cli import main
+
+sys.exit(main())
@@ -0,0 +1,463 @@
+"""
+Contains HTML backends used by HTML shortcodes to parse, serialize and query markup
+
+``lxml`` is the reference backend and is used by default when it is installed. ``html.parser`` only needs
+the standard library: it builds a small element tree with Python's ``html.parser``, serializes it the way
+lxml does and evaluates the subset of xpath used for inputs: ``@attr``, ``text()`` and child paths such as
+``span/text()`` or ``./a/@href``. Both backends produce the same output for well-formed markup; markup lxml
+has to repair, e.g. misnested elements or stray ``<style>`` fragments, can be structured differently.
+"""
+
+import re
+from html import unescape
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+# (lxml.etree, lxml.html) once imported; shortcodes restored from a pickle or registry snapshot only import
+# lxml when something is rendered or reversed through it
+_lxml = None
+_lxml_available = None
+
+
+def load_lxml() -> Tuple[Any, Any]:
+    """import lxml on first use and return ``(lxml.etree, lxml.html)`` modules"""
+    global _lxml
+    if _lxml is None:
+        try:
+            from lxml import etree, html
+        except ImportError:
+            raise ImportError("lxml package is required for HtmlShortcode; try: pip install lxml") from None
+        _lxml = etree, html
+    return _lxml
+
+
+def lxml_available() -> bool:
+    """whether lxml can be imported, checked without importing it"""
+    global _lxml_available
+    if _lxml_available is None:
+        from importlib.util import find_spec
+
+        _lxml_available = _lxml is not None or find_spec("lxml") is not None
+    return _lxml_available
+
+
+def handle_lxml_errors(exception: Exception):
+    """return exception that should be raised for lxml parsing error or None if fragment should be skipped"""
+    if isinstance(exception, ValueError):
+        if "Unicode strings with encoding declartion are not supported" in "".join(exception.args):
+            return
+    return exception
+
+
+class HtmlBackend:
+    """
+    HTML parser, serializer and xpath engine of HTML shortcodes
+
+    Elements returned by a backend support the part of the lxml element API shortcodes use: ``tag``,
+    ``attrib``, ``get`` and ``set``. Backends are shared, stateless instances, see ``get_backend``.
+    """
+
+    name: str = ""
+
+    def __reduce__(self):
+        # pickles and registry snapshots refer to the shared instance by name
+        return get_backend, (self.name,)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+    def fragment(self, text: str):
+        """parse markup to its single root element, or to a ``div`` or ``span`` wrapping several nodes"""
+        raise NotImplementedError
+
+    def tostring(self, element) -> str:
+        """serialize element with its tail text"""
+        raise NotImplementedError
+
+    def supports_xpath(self, expression: str) -> bool:
+        """whether ``xpath`` can compile expression"""
+        return True
+
+    def xpath(self, expression: str) -> Callable[[Any], List]:
+        """compile xpath to a function returning its results for an element"""
+        raise NotImplementedError
+
+    def marked_elements(self, markers: Iterable[str]) -> Optional[Callable[[str], List]]:
+        """
+        function parsing a whole document and returning its elements with any of the class markers in order;
+        None when marked elements are parsed faster one by one from their source spans
+        """
+        return None
+
+
+class LxmlBackend(HtmlBackend):
+    """lxml backend; lxml is imported on first use"""
+
+    name = "lxml"
+
+    def __init__(self) -> None:
+        if not lxml_available():
+            raise ImportError("lxml package is required for the lxml HTML backend; try: pip install lxml")
+
+    def fragment(self, text: str):
+        _, html = load_lxml()
+        return html.fromstring(text)
+
+    def tostring(self, element) -> str:
+        _, html = load_lxml()
+        return html.tostring(element, encoding="unicode")
+
+    def xpath(self, expression: str) -> Callable[[Any], List]:
+        etree, _ = load_lxml()
+        return etree.XPath(expression)
+
+    def marked_elements(self, markers: Iterable[str]) -> Callable[[str], List]:
+        conditions = " or ".join(
+            f"contains(concat(' ', @class, ' '), ' {marker} ')" for marker in markers if "'" not in marker
+        )
+        etree, html = load_lxml()
+        query = etree.XPath(f"//*[@class][{conditions or 'false()'}]")
+        return lambda text: query(html.document_fromstring(text))
+
+
+# elements without content or end tag, as in libxml2's element table
+EMPTY_ELEMENTS = frozenset("area base basefont br col frame hr img input isindex link meta param".split())
+# elements whose content is text rather than markup: raw text is serialized as is, escapable raw text is
+# unescaped when parsed and escaped again when serialized
+RAW_TEXT_ELEMENTS = frozenset(["script", "style"])
+ESCAPABLE_RAW_TEXT_ELEMENTS = frozenset(["iframe", "xmp", "noembed", "noframes", "plaintext"])
+RCDATA_ELEMENTS = frozenset(["textarea", "title"])
+# elements that make lxml wrap several fragment nodes in a div rather than a span
+BLOCK_ELEMENTS = frozenset(
+    "address blockquote caption center col colgroup dd del dir div dl dt fieldset form h1 h2 h3 h4 h5 h6 hr ins "
+    "isindex legend li menu noscript ol optgroup option p pre table tbody td tfoot th thead tr ul".split()
+)
+# open elements implicitly closed by a start tag, e.g. ``<li>a<li>b``, unless a scope boundary is open after them
+_CLOSED_BY = {
+    **{tag: ("p",) for tag in BLOCK_ELEMENTS},
+    "a": ("a",),
+    "li": ("li", "p"),
+    "dt": ("dt", "dd", "p"),
+    "dd": ("dt", "dd", "p"),
+    "tr": ("tr", "td", "th"),
+    "td": ("td", "th"),
+    "th": ("td", "th"),
+    "option": ("option",),
+}
+_SCOPE_BOUNDARIES = frozenset(["applet", "button", "caption", "marquee", "object", "ol", "table", "td", "th", "ul"])
+# attributes lxml serializes as URIs: percent-escaped after leading blanks are dropped
+_URI_ATTRIBUTES = frozenset(["href", "src", "action"])
+_re_uri_unsafe = re.compile(r"[\x00-\x20\x7f-\U0010ffff]")
+_re_newlines = re.compile(r"\r\n?")
+_re_script_macro = re.compile(r"(&\{[^}]*\})")
+# single element with quoted or valueless attributes and plain text, e.g. most rendered shortcodes
+_re_simple_element = re.compile(
+    r"<([a-z][a-z0-9]*)((?:[ \t\n\r\f]+[A-Za-z_:][\w:.-]*(?:=(?:\"[^\"]*\"|'[^']*'))?)*)[ \t\n\r\f]*>([^<]*)</\1>"
+)
+_re_simple_attribute = re.compile(r"([^\s=]+)(=(?:\"([^\"]*)\"|'([^']*)'))?")
+_re_simple_xpath = re.compile(
+    r"(?:\./)?(?:(?:[A-Za-z_][\w.-]*|\*)/)*(?:[A-Za-z_][\w.-]*|\*|@[A-Za-z_][\w.:-]*|text\(\))"
+)
+
+
+class Element:
+    """Element of the html.parser backend with lxml-like ``text``, ``tail`` and children"""
+
+    __slots__ = ("tag", "attrib", "valueless", "children", "text", "tail")
+
+    def __init__(self, tag: str, attrib: Optional[Dict[str, str]] = None, valueless: Tuple[str, ...] = ()):
+        self.tag = tag
+        self.attrib = attrib if attrib is not None else {}
+        # attributes written without a value, e.g. ``allowfullscreen``
+        self.valueless = valueless
+        self.children: List[Union["Element", "Comment"]] = []
+        self.text: Optional[str] = None
+        self.tail: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"<Element {self.tag}>"
+
+    def __len__(self) -> int:
+        return len(self.children)
+
+    def get(self, name: str, default=None):
+        return self.attrib.get(name, default)
+
+    def set(self, name: str, value: str):
+        self.attrib[name] = value
+        if name in self.valueless:
+            self.valueless = tuple(other for other in self.valueless if other != name)
+
+    def iter(self) -> Iterator["Element"]:
+        """this element and its descendant elements in document order"""
+        yield self
+        for child in self.children:
+            if isinstance(child, Element):
+                yield from child.iter()
+
+    def text_nodes(self) -> List[str]:
+        """text of this element interleaved with its children, like xpath ``text()``"""
+        nodes = [self.text] if self.text else []
+        nodes.extend(child.tail for child in self.children if child.tail)
+        return nodes
+
+
+class Comment:
+    """Comment of the html.parser backend"""
+
+    __slots__ = ("text", "tail")
+    tag = None
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tail: Optional[str] = None
+
+
+class _TreeBuilder(HTMLParser):
+    """builds a tree of ``Element`` under a nameless root, repairing markup the way lxml commonly does"""
+
+    CDATA_CONTENT_ELEMENTS = tuple(RAW_TEXT_ELEMENTS | ESCAPABLE_RAW_TEXT_ELEMENTS | RCDATA_ELEMENTS)
+    # document structure is implied, as lxml does for fragments
+    IGNORED_ELEMENTS = frozenset(["html", "head", "body"])
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.root = Element("")
+        self.open = [self.root]
+
+    def _append(self, node):
+        self.open[-1].children.append(node)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if tag in self.IGNORED_ELEMENTS:
+            return
+        closes = _CLOSED_BY.get(tag)
+        if closes:
+            for index in range(len(self.open) - 1, 0, -1):
+                open_tag = self.open[index].tag
+                if open_tag in closes:
+                    del self.open[index:]
+                    break
+                if open_tag in _SCOPE_BOUNDARIES:
+                    break
+        attrib = {}
+        valueless = []
+        for name, value in attrs:
+            if name in attrib:
+                continue
+            if value is None:
+                valueless.append(name)
+            attrib[name] = value or ""
+        element = Element(tag, attrib, tuple(valueless))
+        self._append(element)
+        if tag not in EMPTY_ELEMENTS:
+            self.open.append(element)
+
+    # like lxml, ``<div/>`` opens a div and only empty elements can be self-closed
+    handle_startendtag = handle_starttag
+
+    def handle_endtag(self, tag: str):
+        for index in range(len(self.open) - 1, 0, -1):
+            if self.open[index].tag == tag:
+                del self.open[index:]
+                return
+
+    def handle_data(self, data: str):
+        current = self.open[-1]
+        if current.tag in RCDATA_ELEMENTS:
+            data = unescape(data)
+        if current.children:
+            last = current.children[-1]
+            last.tail = (last.tail or "") + data
+        else:
+            current.text = (current.text or "") + data
+
+    def handle_comment(self, data: str):
+        self._append(Comment(data))
+
+    def handle_pi(self, data: str):
+        # ``<?...>`` is a bogus comment in HTML
+        self._append(Comment("?" + data))
+
+
+def _escape_text(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _quote_attribute(value: str) -> str:
+    if "&{" in value:
+        # libxml2 keeps ``&{...}`` script macros of HTML 4 attributes as they are
+        value = "".join(
+            piece if index % 2 else _escape_text(piece) for index, piece in enumerate(_re_script_macro.split(value))
+        )
+    else:
+        value = _escape_text(value)
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', "&quot;") + '"'
+
+
+def _escape_uri(value: str) -> str:
+    value = value.lstrip(" \t\n\r")
+    return _re_uri_unsafe.sub(lambda match: "".join(f"%{byte:02X}" for byte in match.group().encode()), value)
+
+
+class ParserBackend(HtmlBackend):
+    """dependency-free backend built on ``html.parser``, see module documentation for its xpath subset"""
+
+    name = "html.parser"
+
+    def parse(self, text: str) -> Element:
+        """parse markup to a nameless root element holding its top-level nodes"""
+        if "\r" in text:
+            # newlines are normalized in the markup, character references can still produce carriage returns
+            text = _re_newlines.sub("\n", text)
+        builder = _TreeBuilder()
+        builder.feed(text)
+        builder.close()
+        root = builder.root
+        if root.text:
+            # whitespace before the content of a document is dropped
+            root.text = root.text.lstrip(" \t\n\f") or None
+        return root
+
+    def fragment(self, text: str) -> Element:
+        if "\r" in text:
+            text = _re_newlines.sub("\n", text)
+        match = _re_simple_element.fullmatch(text)
+        if match is not None:
+            element = self._simple_element(*match.groups())
+            if element is not None:
+                return element
+        root = self.parse(text)
+        children = root.children
+        if not children and not (root.text or "").strip():
+            raise ValueError("Document is empty")
+        if len(children) == 1 and not (root.text or "").strip() and not (children[0].tail or "").strip():
+            return children[0]
+        root.tag = "div" if any(element.tag in BLOCK_ELEMENTS for element in root.iter()) else "span"
+        return root
+
+    @staticmethod
+    def _simple_element(tag: str, attributes: str, text: str) -> Optional[Element]:
+        """element parsed without html.parser, as it would parse it; None if tag needs the tree builder"""
+        if tag in _TreeBuilder.IGNORED_ELEMENTS or tag in EMPTY_ELEMENTS:
+            return None
+        if text and tag in _TreeBuilder.CDATA_CONTENT_ELEMENTS:
+            return None
+        attrib = {}
+        valueless = []
+        for name, assigned, double, single in _re_simple_attribute.findall(attributes):
+            name = name.lower()
+            if name in attrib:
+                continue
+            if not assigned:
+                valueless.append(name)
+            value = double or single
+            attrib[name] = unescape(value) if "&" in value else value
+        element = Element(tag, attrib, tuple(valueless))
+        if text:
+            element.text = unescape(text) if "&" in text else text
+        return element
+
+    def tostring(self, element) -> str:
+        pieces = []
+        self._serialize(element, pieces)
+        if element.tail:
+            pieces.append(_escape_text(element.tail))
+        return "".join(pieces)
+
+    def _serialize(self, node, pieces: List[str]):
+        if isinstance(node, Comment):
+            pieces.append(f"<!--{node.text}-->")
+            return
+        tag = node.tag
+        pieces.append("<" + tag)
+        for name, value in node.attrib.items():
+            if name in node.valueless and not value:
+                pieces.append(" " + name)
+                continue
+            if name in _URI_ATTRIBUTES or name == "name" and tag == "a":
+                value = _escape_uri(value)
+            pieces.append(f" {name}={_quote_attribute(value)}")
+        pieces.append(">")
+        if tag in EMPTY_ELEMENTS or tag == "li" and not node.text and not node.children:
+            # libxml2 leaves out end tags it can imply
+            return
+        escape = str if tag in RAW_TEXT_ELEMENTS else _escape_text
+        if node.text:
+            pieces.append(escape(node.text))
+        for child in node.children:
+            self._serialize(child, pieces)
+            if child.tail:
+                pieces.append(escape(child.tail))
+        pieces.append(f"</{tag}>")
+
+    def supports_xpath(self, expression: str) -> bool:
+        return _re_simple_xpath.fullmatch(expression) is not None
+
+    def xpath(self, expression: str) -> Callable[[Element], List]:
+        """
+        Raises
+        ------
+        ValueError
+            raised for xpaths other than child paths ending in an element name, ``@attr`` or ``text()``
+        """
+        if not self.supports_xpath(expression):
+            raise ValueError(
+                f"xpath {expression!r} is not supported by the html.parser backend, "
+                "use child paths ending in an element name, @attribute or text()"
+            )
+        *steps, last = (expression[2:] if expression.startswith("./") else expression).split("/")
+
+        def children(elements: List[Element], name: str) -> List[Element]:
+            return [
+                child
+                for element in elements
+                for child in element.children
+                if isinstance(child, Element) and (name == "*" or child.tag == name)
+            ]
+
+        def select(element: Element) -> List:
+            elements = [element]
+            for step in steps:
+                elements = children(elements, step)
+            if last == "text()":
+                return [text for element in elements for text in element.text_nodes()]
+            if last.startswith("@"):
+                name = last[1:]
+                return [element.attrib[name] for element in elements if name in element.attrib]
+            return children(elements, last)
+
+        return select
+
+
+BACKENDS: Dict[str, Type[HtmlBackend]] = {"lxml": LxmlBackend, "html.parser": ParserBackend}
+_backends: Dict[str, HtmlBackend] = {}
+
+
+def get_backend(backend: Union[str, HtmlBackend, None] = None) -> HtmlBackend:
+    """
+    Shared HTML backend by name, see ``BACKENDS``; None selects lxml when it is installed and html.parser otherwise
+
+    Raises
+    ------
+    ValueError
+        raised for unknown backend names
+    ImportError
+        raised when lxml backend is requested but lxml is not installed
+    """
+    if isinstance(backend, HtmlBackend):
+        return backend
+    if backend is None:
+        backend = "lxml" if lxml_available() else "html.parser"
+    instance = _backends.get(backend)
+    if instance is None:
+        try:
+            cls = BACKENDS[backend]
+        except KeyError:
+            raise ValueError(f"unknown HTML backend {backend!r}, expected one of {sorted(BACKENDS)}") from None
+        instance = _backends[backend] = cls()
+    return instance
@@ -0,0 +1,139 @@
+"""
+Contains helpers for converting many documents in parallel with a process or thread pool
+"""
+import os
+from collections import deque
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+BatchInput = Union[str, os.PathLike]
+
+# shortcode manager of the current worker process, set by pool initializer
+_worker_shortcoder = None
+
+
+class BatchResult(NamedTuple):
+    """Result of a single batch document; exactly one of ``output`` and ``error`` is set"""
+
+    index: int
+    path: Optional[os.PathLike]
+    output: Optional[str]
+    error: Optional[BaseException]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _init_worker(shortcoder):
+    global _worker_shortcoder
+    _worker_shortcoder = shortcoder
+
+
+def _convert(shortcoder, method: str, text: str, context: Optional[Dict]) -> str:
+    if method == "parse":
+        return shortcoder.parse(text, context)
+    return shortcoder.reverse(text)
+
+
+def _run_chunk(
+    method: str,
+    chunk: List[Tuple[int, BatchInput]],
+    context: Optional[Dict],
+    encoding: str,
+    shortcoder=None,
+) -> List[BatchResult]:
+    """convert chunk of documents capturing errors of every document separately"""
+    shortcoder = shortcoder or _worker_shortcoder
+    results = []
+    for index, document in chunk:
+        path = document if isinstance(document, os.PathLike) else None
+        try:
+            if path is not None:
+                with open(path, encoding=encoding) as f:
+                    text = f.read()
+            else:
+                text = document
+            results.append(BatchResult(index, path, _convert(shortcoder, method, text, context), None))
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException as e:
+            results.append(BatchResult(index, path, None, e))
+    return results
+
+
+def _make_executor(shortcoder, executor: str, workers: int) -> "Executor":
+    # concurrent.futures pulls in multiprocessing, only imported once a pool is needed
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    if executor == "process":
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shortcoder,))
+    if executor == "thread":
+        return ThreadPoolExecutor(max_workers=workers)
+    raise ValueError(f"unknown executor {executor!r}, expected 'process' or 'thread'")
+
+
+def run_batch(
+    shortcoder,
+    method: str,
+    documents: Iterable[BatchInput],
+    context: Optional[Dict] = None,
+    workers: Optional[int] = None,
+    executor: str = "process",
+    chunksize: int = 16,
+    ordered: bool = True,
+    encoding: str = "utf-8",
+) -> Iterator[BatchResult]:
+    """
+    Convert documents with shortcoder ``method`` ("parse" or "reverse") across a pool of workers
+
+    Documents are submitted in chunks of ``chunksize`` with at most two chunks per worker in flight,
+    so the documents iterable is consumed lazily. ``workers=0`` converts documents in the current thread.
+    """
+    items = enumerate(documents)
+    chunks = iter(lambda: list(islice(items, chunksize)), [])
+    if workers == 0:
+        for chunk in chunks:
+            yield from _run_chunk(method, chunk, context, encoding, shortcoder)
+        return
+    workers = workers or os.cpu_count() or 1
+    # threads share the manager directly, processes receive it once through the pool initializer
+    local = shortcoder if executor == "thread" else None
+    with _make_executor(shortcoder, executor, workers) as pool:
+
+        def submit(chunk):
+            future = pool.submit(_run_chunk, method, chunk, context, encoding, local)
+            future.chunk = chunk
+            return future
+
+        def collect(future) -> List[BatchResult]:
+            try:
+                return future.result()
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except BaseException as e:
+                # e.g. broken pool or unpicklable result: fail every document of the chunk
+                return [
+                    BatchResult(index, doc if isinstance(doc, os.PathLike) else None, None, e)
+                    for index, doc in future.chunk
+                ]
+
+        pending = deque(submit(chunk) for chunk in islice(chunks, workers * 2))
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                from concurrent.futures import FIRST_COMPLETED, wait
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = [future for future in pending if future in finished]
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                yield from collect(future)
+                chunk = next(chunks, None)
+                if chunk:
+                    pending.append(submit(chunk))
@@ -0,0 +1,65 @@
+"""
+Contains argument binders that map tokenized shortcode arguments to shortcode input values
+
+Binders are compiled once per shortcode when it is registered so parsing only has to look them up.
+"""
+from typing import Dict, List
+
+from shortcoder.exceptions import ExtraParameters, InvalidKeywords
+
+
+class PositionalBinder:
+    """Binds positional arguments, e.g. [% shortcode value1 value2 %], to input names by index"""
+
+    __slots__ = ("name", "names", "defaults", "inputs")
+
+    def __init__(self, shortcode) -> None:
+        self.name = shortcode.name
+        self.inputs = shortcode.inputs
+        self.names = tuple(inp.name for inp in shortcode.inputs)
+        self.defaults = {inp.name: inp.default for inp in shortcode.inputs if inp.default is not None}
+
+    def __call__(self, args: List[str]) -> Dict[str, str]:
+        if len(args) > len(self.names):
+            raise ExtraParameters(
+                "shortcode {name} got {count} parameters when {exp} expected ".format(
+                    name=self.name,
+                    count=len(args),
+                    exp=len(self.names),
+                )
+            )
+        kwargs = self.defaults.copy()
+        kwargs.update(zip(self.names, args))
+        return kwargs
+
+
+class KeywordBinder:
+    """Binds keyword arguments, e.g. [% shortcode key1=value1 key2=value2 %], validating keys against a set"""
+
+    __slots__ = ("name", "names", "defaults", "inputs")
+
+    def __init__(self, shortcode) -> None:
+        self.name = shortcode.name
+        self.inputs = shortcode.inputs
+        self.names = frozenset(inp.name for inp in shortcode.inputs)
+        self.defaults = {inp.name: inp.default for inp in shortcode.inputs if inp.default is not None}
+
+    def __call__(self, args: List[str]) -> Dict[str, str]:
+        kwargs = self.defaults.copy()
+        names = self.names
+        invalid = None
+        for arg in args:
+            key, value = arg.split("=", 1)
+            if key not in names:
+                invalid = invalid or []
+                invalid.append(key)
+            kwargs[key] = value
+        if invalid:
+            raise InvalidKeywords(
+                "shortcode {name} got unknown keys {keys}, allowed: {inputs}".format(
+                    name=self.name,
+                    keys=invalid,
+                    inputs=self.inputs,
+                )
+            )
+        return kwargs
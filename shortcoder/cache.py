@@ -0,0 +1,90 @@
+"""
+Contains bounded LRU cache for rendered shortcode output
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+def fingerprint(value: Any) -> Hashable:
+    """
+    Turn context value to a hashable fingerprint
+
+    dicts, lists, tuples and sets are frozen recursively; any other value has to be hashable itself.
+    Values are fingerprinted together with their type, so values that are equal but render differently,
+    e.g. ``True``, ``1`` and ``1.0`` or ``[1]`` and ``(1,)``, get different fingerprints.
+
+    Raises
+    ------
+    TypeError
+        raised when value contains unhashable objects
+    """
+    cls = type(value)
+    if cls is str:
+        return value
+    if isinstance(value, dict):
+        return cls, frozenset((fingerprint(key), fingerprint(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return cls, tuple(fingerprint(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return cls, frozenset(fingerprint(item) for item in value)
+    if cls is float:
+        # -0.0 equals 0.0 and nan equals nothing, the exact value is compared instead
+        return cls, value.hex()
+    hash(value)
+    return cls, value
+
+
+class RenderCache:
+    """
+    Bounded LRU cache of rendered shortcodes
+
+    Keys are ``(shortcode name, bound kwargs, context fingerprint)`` tuples built by the shortcode manager.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        if maxsize <= 0:
+            raise ValueError(f"cache maxsize has to be positive, got {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """return cached value and mark it as recently used or None if key is not cached"""
+        try:
+            value = self._data[key]
+            self._data.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: str):
+        """store value evicting least recently used entries if cache is full"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """drop all entries and reset stats"""
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"RenderCache({self.stats()})"
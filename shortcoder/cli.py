@@ -0,0 +1,232 @@
+"""
+Command line build tool: converts a directory tree with a shortcode registry loaded from a python module
+
+    shortcoder parse content/ build/ --registry mysite.shortcodes:sh --jobs 4
+
+Content hashes of converted inputs and a hash of the registry are kept in a manifest file so unchanged
+files are skipped on the next run and any registry change rebuilds everything.
+"""
+
+import argparse
+import hashlib
+import importlib
+import importlib.machinery
+import importlib.util
+import inspect
+import json
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, List, Optional, Tuple
+
+from shortcoder import snapshot
+from shortcoder.manager import Shortcoder
+from shortcoder.template import Template
+
+MANIFEST_NAME = ".shortcoder-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def load_module(spec: str) -> ModuleType:
+    """import module by dotted name or from a ``.py`` file path"""
+    if spec.endswith(".py"):
+        path = Path(spec).resolve()
+        module_spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(module_spec)
+        sys.modules[path.stem] = module
+        module_spec.loader.exec_module(module)
+        return module
+    return importlib.import_module(spec)
+
+
+def load_registry(spec: str) -> Tuple[Shortcoder, Optional[ModuleType]]:
+    """
+    Load shortcode manager from ``module:attribute`` spec
+
+    Attribute can be a Shortcoder instance or a callable returning one; if omitted the module has to
+    contain exactly one Shortcoder instance. Spec can also be a path of a registry snapshot file.
+    """
+    if snapshot.is_snapshot(spec):
+        return Shortcoder.from_snapshot(spec), None
+    module_spec, _, attribute = spec.rpartition(":")
+    if not module_spec or "/" in attribute or "\\" in attribute or attribute.endswith(".py"):
+        module_spec, attribute = spec, ""
+    module = load_module(module_spec)
+    if attribute:
+        registry = getattr(module, attribute)
+        if callable(registry) and not isinstance(registry, Shortcoder):
+            registry = registry()
+    else:
+        found = [value for value in vars(module).values() if isinstance(value, Shortcoder)]
+        if len(found) != 1:
+            raise ValueError(f"expected exactly one Shortcoder in {module_spec}, found {len(found)}; use module:name")
+        registry = found[0]
+    if not isinstance(registry, Shortcoder):
+        raise ValueError(f"{spec} is not a Shortcoder instance")
+    return registry, module
+
+
+def pool_executor(module: Optional[ModuleType]) -> str:
+    """
+    executor for ``parse_many``: process workers unpickle shortcodes by module name, so a registry module
+    loaded from a file path that is not importable from ``sys.path`` only works in forked workers
+    """
+    if module is None or "." in module.__name__:
+        return "process"
+    spec = importlib.machinery.PathFinder.find_spec(module.__name__)
+    if spec is not None and spec.origin == getattr(module, "__file__", None):
+        return "process"
+    import multiprocessing
+
+    return "process" if multiprocessing.get_start_method() == "fork" else "thread"
+
+
+def _describe_callable(func) -> str:
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+
+
+def registry_digest(registry: Shortcoder, module: Optional[ModuleType] = None) -> str:
+    """hash of registry definition: registry module source plus every shortcode's inputs and templates"""
+    digest = hashlib.sha256()
+    source = getattr(module, "__file__", None)
+    if source and Path(source).exists():
+        digest.update(Path(source).read_bytes())
+    for name, shortcode in sorted(registry.shortcodes.items()):
+        template = getattr(shortcode, "template", None)
+        if isinstance(template, Template):
+            template = [template.source, sorted(template.escape)]
+        elif getattr(template, "__name__", None) == "format" and isinstance(getattr(template, "__self__", None), str):
+            template = template.__self__
+        elif template is not None:
+            template = _describe_callable(template)
+        description = {
+            "name": name,
+            "type": f"{type(shortcode).__module__}.{type(shortcode).__qualname__}",
+            "inputs": [(inp.name, inp.xpath, inp.default) for inp in shortcode.inputs],
+            "template": template,
+            "class": getattr(shortcode, "class_", None),
+            "convert": _describe_callable(type(shortcode).convert),
+        }
+        digest.update(json.dumps(description, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def load_manifest(path: Path) -> Dict:
+    try:
+        manifest = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def build(
+    registry: Shortcoder,
+    mode: str,
+    source: Path,
+    output: Path,
+    pattern: str = "**/*",
+    manifest_path: Optional[Path] = None,
+    digest: str = "",
+    jobs: int = 0,
+    force: bool = False,
+    executor: str = "process",
+) -> Dict[str, List[str]]:
+    """
+    Convert every file matching ``pattern`` in ``source`` tree into the same relative path under ``output``
+
+    Files that are not UTF-8 text are copied unchanged. The output directory and the manifest are never
+    read as sources, even when they are inside ``source``.
+
+    Returns
+    -------
+    Dict
+        relative paths that were ``converted``, ``copied`` as non-text, ``skipped`` as unchanged and ``failed``
+        with an error
+    """
+    manifest_path = manifest_path or output / MANIFEST_NAME
+    manifest = {} if force else load_manifest(manifest_path)
+    previous = manifest.get("files", {}) if manifest.get("registry") == digest and manifest.get("mode") == mode else {}
+    files = {}
+    report = {"converted": [], "copied": [], "skipped": [], "failed": []}
+    changed = []
+    excluded = (output.resolve(), manifest_path.resolve())
+    for path in sorted(source.glob(pattern)):
+        resolved = path.resolve()
+        if not path.is_file() or any(resolved == root or root in resolved.parents for root in excluded):
+            continue
+        relative = path.relative_to(source).as_posix()
+        data = path.read_bytes()
+        content_hash = hashlib.sha256(data).hexdigest()
+        if previous.get(relative) == content_hash and (output / relative).exists():
+            files[relative] = content_hash
+            report["skipped"].append(relative)
+            continue
+        try:
+            data.decode("utf-8")
+        except UnicodeDecodeError:
+            target = output / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+            files[relative] = content_hash
+            report["copied"].append(relative)
+            continue
+        changed.append((relative, content_hash, path))
+    convert = registry.parse_many if mode == "parse" else registry.reverse_many
+    results = convert([path for _, _, path in changed], workers=jobs, executor=executor)
+    for (relative, content_hash, _), result in zip(changed, results):
+        if not result.ok:
+            report["failed"].append(f"{relative}: {type(result.error).__name__}: {result.error}")
+            continue
+        target = output / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(result.output, encoding="utf-8")
+        files[relative] = content_hash
+        report["converted"].append(relative)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(
+        json.dumps({"version": MANIFEST_VERSION, "mode": mode, "registry": digest, "files": files}, indent=1)
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="shortcoder", description="convert shortcodes in a directory tree")
+    parser.add_argument("mode", choices=["parse", "reverse"], help="parse shortcodes or reverse rendered output")
+    parser.add_argument("source", type=Path, help="source directory")
+    parser.add_argument("output", type=Path, help="output directory")
+    parser.add_argument(
+        "-r",
+        "--registry",
+        required=True,
+        help="module or .py file with a Shortcoder, e.g. mysite.shortcodes:sh, or a registry snapshot file",
+    )
+    parser.add_argument("-g", "--glob", default="**/*", help="source file pattern (default: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="parallel worker processes (default: none)")
+    parser.add_argument("-m", "--manifest", type=Path, help=f"manifest path (default: OUTPUT/{MANIFEST_NAME})")
+    parser.add_argument("-f", "--force", action="store_true", help="ignore manifest and rebuild everything")
+    args = parser.parse_args(argv)
+
+    registry, module = load_registry(args.registry)
+    report = build(
+        registry,
+        args.mode,
+        args.source,
+        args.output,
+        pattern=args.glob,
+        manifest_path=args.manifest,
+        digest=registry_digest(registry, module),
+        jobs=args.jobs,
+        force=args.force,
+        executor=pool_executor(module) if args.jobs else "process",
+    )
+    for failure in report["failed"]:
+        print(f"error: {failure}", file=sys.stderr)
+    print(
+        f"{len(report['converted'])} converted, {len(report['skipped'])} unchanged, {len(report['failed'])} failed, "
+        f"{len(report['copied'])} copied",
+        file=sys.stderr,
+    )
+    return 1 if report["failed"] else 0
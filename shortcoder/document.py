@@ -0,0 +1,414 @@
+"""
+Contains tokenized document representation produced by ``Shortcoder.tokenize`` and compact marker records
+"""
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, islice
+from typing import TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from shortcoder.exceptions import UnknownShortcode
+from shortcoder.stream import _re_shortcode_head
+
+if TYPE_CHECKING:
+    from shortcoder.manager import Shortcoder
+
+
+class Node:
+    """Shortcode occurrence in tokenized text: name, parsed arguments and source offsets"""
+
+    __slots__ = ("name", "args", "start", "end", "kwargs")
+
+    def __init__(self, name: str, args: List[str], start: int, end: int) -> None:
+        self.name = name
+        self.args = args
+        self.start = start
+        self.end = end
+        # bound input values, filled in on first render or validation
+        self.kwargs: Optional[Dict[str, str]] = None
+
+    def __repr__(self) -> str:
+        return f"Node({self.name}, {self.args}, {self.start}, {self.end})"
+
+
+Token = Union[Tuple[int, int], Node]
+
+
+class Document:
+    """
+    Tokenized text
+
+    Only ``Node`` shortcodes are stored, in source order; literal spans between them are produced as
+    ``(start, end)`` offsets into ``text`` when iterating over ``tokens``.
+    """
+
+    def __init__(self, shortcoder: "Shortcoder", text: str, nodes: List[Node]) -> None:
+        self.shortcoder = shortcoder
+        self.text = text
+        self.nodes = nodes
+
+    @property
+    def tokens(self) -> List[Token]:
+        """literal spans and shortcode nodes in source order"""
+        return list(self)
+
+    def __iter__(self) -> Iterator[Token]:
+        pos = 0
+        for node in self.nodes:
+            if node.start > pos:
+                yield pos, node.start
+            yield node
+            pos = node.end
+        if pos < len(self.text):
+            yield pos, len(self.text)
+
+    def find(self, name: Optional[str] = None) -> List[Node]:
+        """shortcode nodes, optionally only the ones with given name"""
+        return [node for node in self.nodes if name is None or node.name == name]
+
+    def source(self, token: Token) -> str:
+        """original text of token"""
+        if isinstance(token, Node):
+            return self.text[token.start : token.end]
+        return self.text[token[0] : token[1]]
+
+    def bind(self, node: Node) -> Dict[str, str]:
+        """
+        bound input values of node, cached on the node
+
+        Raises
+        ------
+        UnknownShortcode
+            raised when node's shortcode is not registered
+        """
+        if node.kwargs is None:
+            try:
+                _, binder = self.shortcoder._binders[node.name]
+            except KeyError:
+                raise UnknownShortcode(node.name, self.source(node))
+            node.kwargs = binder(node.args)
+        return node.kwargs
+
+    def validate(self) -> List[Tuple[Node, BaseException]]:
+        """bind every node and return ``(node, error)`` for the ones that cannot be rendered"""
+        errors = []
+        for node in self.nodes:
+            try:
+                self.bind(node)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except BaseException as e:
+                errors.append((node, e))
+        return errors
+
+    def render(self, context: Optional[Dict] = None) -> str:
+        """render document with given context, or the shortcoder's context if not supplied"""
+        shortcoder = self.shortcoder
+        convert = shortcoder._converter(context or shortcoder.context)
+        binders = shortcoder._binders
+        text = self.text
+        pieces = []
+        pos = 0
+        for node in self.nodes:
+            pieces.append(text[pos : node.start])
+            kwargs = node.kwargs if node.kwargs is not None else self.bind(node)
+            pieces.append(convert(node.name, binders[node.name][0], kwargs))
+            pos = node.end
+        pieces.append(text[pos:])
+        return "".join(pieces)
+
+
+class Marker(NamedTuple):
+    """Shortcode marker: name, raw arguments and source offsets"""
+
+    name: str
+    args: str
+    start: int
+    end: int
+
+
+class Markers(Sequence[Marker]):
+    """
+    Compact record of shortcode markers found in a text
+
+    Every marker is stored as six offsets (start, end and the spans of its name and arguments) in a single
+    ``array`` instead of as match objects or substring copies; names and arguments are sliced from ``text``
+    only when a ``Marker`` is accessed.
+    """
+
+    __slots__ = ("text", "offsets")
+
+    def __init__(self, text: str, offsets: array) -> None:
+        self.text = text
+        self.offsets = offsets
+
+    @classmethod
+    def scan(cls, text: str, pattern: re.Pattern) -> "Markers":
+        """record every ``(name, args)`` match of shortcode ``pattern`` in text"""
+        offsets = array("q")
+        for match in pattern.finditer(text):
+            offsets.extend((*match.span(), *match.span(1), *match.span(2)))
+        return cls(text, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) // 6
+
+    def __getitem__(self, index: int) -> Marker:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("marker index out of range")
+        start, end, name_start, name_end, args_start, args_end = self.offsets[index * 6 : index * 6 + 6]
+        return Marker(self.text[name_start:name_end], self.text[args_start:args_end], start, end)
+
+    def span(self, index: int) -> Tuple[int, int]:
+        """source offsets of marker without slicing its name and arguments"""
+        return self.offsets[index * 6], self.offsets[index * 6 + 1]
+
+    def __repr__(self) -> str:
+        return f"Markers({len(self)})"
+
+
+class Change(NamedTuple):
+    """Output change of an edit: ``output[start:end]`` of the previous output was replaced by ``text``"""
+
+    start: int
+    end: int
+    text: str
+
+
+# target characters of text per block of an incremental document
+BLOCK_SIZE = 2048
+
+
+class _Block:
+    """shortcode nodes of a block of incremental document, offsets relative to the block, and their fragments"""
+
+    __slots__ = ("nodes", "fragments")
+
+    def __init__(self, nodes: List[Node], fragments: List[str]) -> None:
+        self.nodes = nodes
+        self.fragments = fragments
+
+
+def _split_blocks(text: str, nodes: List[Node], fragments: List[str]) -> Tuple[List[_Block], List[str], List[str]]:
+    """
+    split text with its nodes and rendered fragments into blocks of about ``BLOCK_SIZE`` characters, cut in
+    literal text only; returns blocks, their texts and their outputs. Node offsets are made relative to their block
+    """
+    blocks, texts, outputs = [], [], []
+
+    def add(start: int, end: int, first: int, last: int):
+        pieces, pos = [], start
+        for node, fragment in zip(nodes[first:last], fragments[first:last]):
+            pieces.append(text[pos : node.start])
+            pieces.append(fragment)
+            pos = node.end
+            node.start -= start
+            node.end -= start
+        pieces.append(text[pos:end])
+        blocks.append(_Block(nodes[first:last], fragments[first:last]))
+        texts.append(text[start:end])
+        outputs.append("".join(pieces))
+
+    start = first = previous_end = 0
+    for index in range(len(nodes) + 1):
+        limit = nodes[index].start if index < len(nodes) else len(text)
+        while limit - start > BLOCK_SIZE:
+            # anywhere between the end of the previous node and the start of the next one is literal text
+            cut = max(start + BLOCK_SIZE, previous_end)
+            add(start, cut, first, index)
+            start, first = cut, index
+        if index < len(nodes):
+            previous_end = nodes[index].end
+    if start < len(text) or not blocks:
+        add(start, len(text), first, len(nodes))
+    return blocks, texts, outputs
+
+
+class IncrementalDocument:
+    """
+    Text kept rendered across edits
+
+    Every shortcode node keeps its rendered fragment. ``edit`` re-lexes the text only from the last shortcode
+    that cannot be affected by the edit until the scan lines up with an unchanged shortcode again, so only
+    shortcodes around the edit are tokenized, bound and rendered again.
+
+    Text, nodes and fragments are kept in blocks of about ``BLOCK_SIZE`` characters with node offsets relative to
+    their block. An edit rebuilds only the blocks it re-lexes, so it does not touch the text, output or nodes
+    after them; ``text`` and ``output`` are joined from the blocks on first access after an edit.
+    """
+
+    def __init__(self, shortcoder: "Shortcoder", text: str, context: Optional[Dict] = None) -> None:
+        self.shortcoder = shortcoder
+        self.context = context or shortcoder.context
+        self._convert = shortcoder._converter(self.context)
+        self._blocks: List[_Block] = [_Block([], [])]
+        self._texts: List[str] = [""]
+        self._outputs: List[str] = [""]
+        self._text: Optional[str] = ""
+        self._output: Optional[str] = ""
+        self.edit(0, 0, text)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(self._texts)
+        return self._text
+
+    @property
+    def output(self) -> str:
+        if self._output is None:
+            self._output = "".join(self._outputs)
+        return self._output
+
+    @property
+    def nodes(self) -> List[Node]:
+        """copies of shortcode nodes with offsets into ``text``"""
+        nodes, pos = [], 0
+        for block, text in zip(self._blocks, self._texts):
+            for node in block.nodes:
+                copy = Node(node.name, node.args, node.start + pos, node.end + pos)
+                copy.kwargs = node.kwargs
+                nodes.append(copy)
+            pos += len(text)
+        return nodes
+
+    def _render(self, text: str, node: Node) -> str:
+        try:
+            handler, binder = self.shortcoder._binders[node.name]
+        except KeyError:
+            raise UnknownShortcode(node.name, text[node.start : node.end])
+        node.kwargs = binder(node.args)
+        return self._convert(node.name, handler, node.kwargs)
+
+    def _stable(self, text: str, start: int, offset: int) -> bool:
+        """whether node at start ending before an edit at offset is matched the same way after the edit"""
+        match = self.shortcoder.re_shcode.match(text, start)
+        head = _re_shortcode_head.match(text, start).end()
+        # longest name candidate matched: text after the match cannot produce a different match
+        return match.end(1) == head and head < offset
+
+    def edit(self, offset: int, deleted: int, inserted: str) -> Change:
+        """
+        replace ``deleted`` characters at ``offset`` with ``inserted`` text and re-render affected shortcodes
+
+        Returns
+        -------
+        Change
+            span of the previous output and the text that replaced it; ``output`` is updated as well
+
+        Raises
+        ------
+        ValueError
+            raised when edited span is out of the text bounds
+        """
+        starts = list(accumulate(map(len, self._texts), initial=0))
+        end = offset + deleted
+        if offset < 0 or deleted < 0 or end > starts[-1]:
+            raise ValueError(f"edit span {offset}:{end} is out of text bounds 0:{starts[-1]}")
+        count = len(self._blocks)
+        # re-lexed blocks, widened when the scan has to start before or continue after them
+        lo = max(bisect_right(starts, offset, 0, count) - 1, 0)
+        hi = min(max(bisect_left(starts, end, 0, count), lo + 1), count)
+        while True:
+            result = self._relex(lo, hi, starts[lo], offset - starts[lo], deleted, inserted)
+            if result is _BEFORE:
+                lo = max(lo - (hi - lo), 0)
+            elif result is _AFTER:
+                hi = min(hi + (hi - lo), count)
+            else:
+                break
+        text, nodes, fragments, change = result
+        output_start = sum(map(len, islice(self._outputs, lo)))
+        blocks, texts, outputs = _split_blocks(text, nodes, fragments)
+        self._blocks[lo:hi] = blocks
+        self._texts[lo:hi] = texts
+        self._outputs[lo:hi] = outputs
+        self._text = self._output = None
+        return Change(change.start + output_start, change.end + output_start, change.text)
+
+    def _relex(self, lo: int, hi: int, base: int, offset: int, deleted: int, inserted: str):
+        """
+        Apply edit at ``offset`` relative to block ``lo`` to blocks ``lo:hi``
+
+        Returns ``_BEFORE`` or ``_AFTER`` when re-lexing has to start before or continue after these blocks,
+        otherwise their edited text, nodes and fragments with offsets into that text and the ``Change`` of
+        their output.
+        """
+        blocks = self._blocks[lo:hi]
+        old_text = "".join(self._texts[lo:hi])
+        nodes, fragments, starts, ends = [], [], [], []
+        pos = 0
+        for block, block_text in zip(blocks, self._texts[lo:hi]):
+            for node in block.nodes:
+                starts.append(node.start + pos)
+                ends.append(node.end + pos)
+            nodes.extend(block.nodes)
+            fragments.extend(block.fragments)
+            pos += len(block_text)
+
+        end = offset + deleted
+        text = old_text[:offset] + inserted + old_text[end:]
+        delta = len(inserted) - deleted
+        inserted_end = offset + len(inserted)
+
+        first = bisect_left(ends, offset + 1)
+        while first and not self._stable(old_text, starts[first - 1], offset):
+            first -= 1
+        if not first and lo:
+            return _BEFORE
+        lex_start = ends[first - 1] if first else 0
+        tail = bisect_left(starts, end, first)
+
+        matches = []
+        resync = len(nodes)
+        lex_end = len(text)
+        for match in self.shortcoder.re_shcode.finditer(text, lex_start):
+            start = match.start()
+            if start >= inserted_end:
+                index = bisect_left(starts, start - delta, tail)
+                if index < len(nodes) and starts[index] == start - delta:
+                    # from here on the text and therefore every match is the same as before the edit
+                    resync, lex_end = index, start
+                    break
+            matches.append(match)
+        if resync == len(nodes) and hi < len(self._blocks):
+            # a match could continue in the next block
+            return _AFTER
+
+        tokenizer = self.shortcoder.tokenizer
+        new_nodes, new_fragments = [], []
+        pieces, pos = [], lex_start
+        for match in matches:
+            name, args = match.groups()
+            node = Node(sys.intern(name), tokenizer(args.strip()), *match.span())
+            fragment = self._render(text, node)
+            new_nodes.append(node)
+            new_fragments.append(fragment)
+            pieces.append(text[pos : node.start])
+            pieces.append(fragment)
+            pos = node.end
+        pieces.append(text[pos:lex_end])
+
+        # output length differences of the nodes before the re-lexed span and of the ones replaced
+        shifts = [len(fragments[index]) - (ends[index] - starts[index]) for index in range(resync)]
+        base = sum(shifts[:first])
+        old_lex_end = starts[resync] if resync < len(nodes) else len(old_text)
+        change = Change(lex_start + base, old_lex_end + base + sum(shifts[first:]), "".join(pieces))
+
+        for index in range(first):
+            nodes[index].start, nodes[index].end = starts[index], ends[index]
+        for index in range(resync, len(nodes)):
+            nodes[index].start, nodes[index].end = starts[index] + delta, ends[index] + delta
+        nodes[first:resync] = new_nodes
+        fragments[first:resync] = new_fragments
+        return text, nodes, fragments, change
+
+
+# results of ``IncrementalDocument._relex`` asking for more blocks
+_BEFORE = object()
+_AFTER = object()
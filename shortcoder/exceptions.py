@@ -28,3 +28,15 @@ class ShortcodeNotReversible(BaseException):
 
 class RenderingError(BaseException):
     """raised when shortcode rendering fails"""
+
+
+class InvalidTemplate(BaseException):
+    """raised when shortcode template is malformed or refers to unknown fields"""
+
+
+class UnterminatedShortcode(BaseException):
+    """raised when shortcode marker or enclosing shortcode is not closed; args are message and text position"""
+
+
+class RoundTripError(BaseException):
+    """raised by strict verification when a shortcode does not survive reverse; args are message and mismatch"""
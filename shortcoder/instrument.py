@@ -0,0 +1,86 @@
+"""
+Contains opt-in instrumentation of the shortcode manager's hot paths
+"""
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Tuple
+
+# phases recorded by the shortcode manager
+TOKENIZE = "tokenize"
+BIND = "bind"
+RENDER = "render"
+REVERSE = "reverse"
+REVERSE_REGEX = "reverse.regex"
+REVERSE_PARSE = "reverse.parse"
+REVERSE_XPATH = "reverse.xpath"
+
+# name used for document level timings that do not belong to a single shortcode
+DOCUMENT = "*"
+
+Callback = Callable[[str, str, float], None]
+
+
+class _PhaseStats:
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self, max_samples: int) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    """nearest-rank percentile of sorted samples"""
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Instrumentation:
+    """
+    Per-shortcode timing statistics and callbacks
+
+    Every recorded timing is identified by shortcode name and phase: ``tokenize``, ``bind`` and ``render``
+    when parsing; ``reverse.regex``, ``reverse.parse`` and ``reverse.xpath`` for HTML reversing or
+    ``reverse`` for shortcodes with their own reverse implementation. Document level timings use ``*`` name.
+    Callbacks are called with ``(name, phase, seconds)`` for every timing, e.g. to forward them to a
+    metrics system.
+    """
+
+    def __init__(self, callbacks: Iterable[Callback] = (), max_samples: int = 10_000) -> None:
+        self.callbacks: List[Callback] = list(callbacks)
+        self.max_samples = max_samples
+        self._stats: Dict[Tuple[str, str], _PhaseStats] = {}
+
+    def add_callback(self, callback: Callback):
+        self.callbacks.append(callback)
+
+    def record(self, name: str, phase: str, seconds: float):
+        """record single timing; only the latest ``max_samples`` timings are kept for percentiles"""
+        try:
+            stats = self._stats[name, phase]
+        except KeyError:
+            stats = self._stats[name, phase] = _PhaseStats(self.max_samples)
+        stats.count += 1
+        stats.total += seconds
+        stats.samples.append(seconds)
+        for callback in self.callbacks:
+            callback(name, phase, seconds)
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """snapshot of ``{name: {phase: {count, total, mean, p50, p90, p99}}}``"""
+        snapshot = {}
+        for (name, phase), stats in self._stats.items():
+            ordered = sorted(stats.samples)
+            snapshot.setdefault(name, {})[phase] = {
+                "count": stats.count,
+                "total": stats.total,
+                "mean": stats.total / stats.count,
+                "p50": _percentile(ordered, 50),
+                "p90": _percentile(ordered, 90),
+                "p99": _percentile(ordered, 99),
+            }
+        return snapshot
+
+    def reset(self):
+        self._stats.clear()
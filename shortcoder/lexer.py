@@ -0,0 +1,107 @@
+"""
+Contains linear-time shortcode lexer with support for enclosing shortcodes
+
+Shortcode markers are matched with the manager's ``re_shcode`` anchored at every ``[%``. Neither name nor
+arguments of the default pattern can extend past the next ``[%``, so every character is scanned a bounded
+number of times even on malformed text. Enclosing shortcodes, e.g. ``[%box%]...[%/box%]``, are closed by a
+marker of their name prefixed with ``/``; their body can contain any other shortcodes and is rendered first.
+"""
+import re
+from typing import Callable, Container, Iterator, List, Tuple, TypeVar
+
+from shortcoder.exceptions import UnterminatedShortcode
+
+CLOSING_PREFIX = "/"
+
+Piece = TypeVar("Piece")
+
+
+def line_column(text: str, position: int) -> Tuple[int, int]:
+    """1-based line and column of ``position`` in text"""
+    return text.count("\n", 0, position) + 1, position - text.rfind("\n", 0, position)
+
+
+def unterminated(text: str, position: int, message: str) -> UnterminatedShortcode:
+    """exception for shortcode at ``position`` with its line and column in the message"""
+    line, column = line_column(text, position)
+    snippet = text[position : position + 40]
+    return UnterminatedShortcode(f"{message} at line {line} column {column}: {snippet!r}", position)
+
+
+def iter_markers(text: str, pattern: re.Pattern) -> Iterator[re.Match]:
+    """
+    matches of shortcode ``pattern`` at every ``[%`` of text; a ``[%`` that does not start a match but is
+    closed by ``%]`` before the next ``[%`` (e.g. ``[% %]``) is left as literal text
+
+    Raises
+    ------
+    UnterminatedShortcode
+        raised for ``[%`` that is not closed by ``%]`` before the next ``[%`` or the end of text
+    """
+    find = text.find
+    start = find("[%")
+    # next "%]" is found once per position it is passed, not once per "[%"
+    close = -1
+    while start != -1:
+        match = pattern.match(text, start)
+        if match is not None:
+            yield match
+            start = find("[%", match.end())
+            continue
+        following = find("[%", start + 2)
+        if close < start + 2:
+            close = find("%]", start + 2)
+            if close == -1:
+                close = len(text)
+        if close == len(text) or following != -1 and following < close:
+            raise unterminated(text, start, "unterminated shortcode")
+        start = following
+
+
+def walk(
+    text: str,
+    pattern: re.Pattern,
+    enclosing: Container[str],
+    leaf: Callable[[re.Match], Piece],
+    enclose: Callable[[re.Match, str, List], Piece],
+) -> List:
+    """
+    Split text into literal strings and rendered shortcodes, bottom-up
+
+    ``leaf(match)`` renders a standalone shortcode. Shortcodes whose names are in ``enclosing`` collect
+    everything up to their closing marker; ``enclose(match, source, pieces)`` then renders them from their
+    opening marker match, whole source text and the already rendered pieces of their body.
+
+    Raises
+    ------
+    UnterminatedShortcode
+        raised for unterminated markers, enclosing shortcodes without closing marker and closing markers
+        that do not close the innermost open enclosing shortcode
+    """
+    pieces = []
+    # (opening marker match, pieces of the enclosing body or document)
+    stack = []
+    pos = 0
+    for match in iter_markers(text, pattern):
+        pieces.append(text[pos : match.start()])
+        pos = match.end()
+        name = match.group(1)
+        if name in enclosing:
+            stack.append((match, pieces))
+            pieces = []
+        elif name.startswith(CLOSING_PREFIX) and name[len(CLOSING_PREFIX) :] in enclosing:
+            if not stack:
+                raise unterminated(text, match.start(), f"closing marker of {name[1:]} without opening marker")
+            opening, parent = stack[-1]
+            if opening.group(1) != name[len(CLOSING_PREFIX) :]:
+                raise unterminated(text, opening.start(), f"enclosing shortcode {opening.group(1)} is not closed")
+            stack.pop()
+            parent.append(enclose(opening, text[opening.start() : pos], pieces))
+            pieces = parent
+        else:
+            pieces.append(leaf(match))
+    if stack:
+        opening, _ = stack[-1]
+        raise unterminated(text, opening.start(), f"enclosing shortcode {opening.group(1)} is not closed")
+    pieces.append(text[pos:])
+    return pieces
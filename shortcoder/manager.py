@@ -1,21 +1,75 @@
+# asyncio, inspect, mmap and concurrent.futures are imported on first use: importing shortcoder
+# for plain synchronous parsing, e.g. in a short-lived CLI or serverless process, does not pay for them
+import os
 import re
-import shlex
-from typing import List, Dict
+import sys
+from collections import Counter
+from time import perf_counter
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Dict, Optional, Set, TextIO, Union
+from shortcoder.batch import BatchInput, BatchResult, run_batch
+from shortcoder.cache import RenderCache, fingerprint
+from shortcoder.document import Document, IncrementalDocument, Markers, Node
 from shortcoder.exceptions import (
     DuplicateShortcode,
-    InvalidKeywords,
-    ExtraParameters,
     NoShortcodesRegistered,
     UnknownShortcode,
 )
-from shortcoder.shortcodes.base import _Shortcode, KeywordShortcode, PositionalShortcode
+from shortcoder.instrument import BIND, RENDER, REVERSE, TOKENIZE, Instrumentation
+from shortcoder.lexer import line_column, walk
+from shortcoder.reverse import HtmlReverser, PatternReverser
+from shortcoder.shortcodes.base import _Shortcode
+from shortcoder import snapshot
+from shortcoder.snapshot import SnapshotFile
+from shortcoder.stream import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_SPAN,
+    bytes_pattern,
+    iter_chunks,
+    parse_buffer,
+    parse_chunks,
+    reverse_chunks,
+)
+from shortcoder.tokenizer import split_args
+from shortcoder.verify import Mismatch, Verification
+
+
+def _isawaitable(obj) -> bool:
+    """``inspect.isawaitable`` that does not import inspect for the usual string results of synchronous parsing"""
+    if obj is None or isinstance(obj, str):
+        return False
+    import inspect
+
+    return inspect.isawaitable(obj)
+
+
+async def _gather(awaitables: List) -> List:
+    """await all awaitables concurrently, cancelling the rest when one fails"""
+    import asyncio
+
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
 
 
 class Shortcoder:
     default_shortcodes = tuple()
-    re_shcode = re.compile(r"\[%\s*(\S+)(.+?)%\]", re.DOTALL)
+    # name and arguments are matched atomically, i.e. ``(?=(X))\1``, and never extend past the next ``[%``
+    # so matching at every ``[%`` of a text takes linear time in total
+    re_shcode = re.compile(r"\[%\s*(?=((?:(?!%\]|\[%)\S)+))\1(?=((?:[^%\[]+|%(?!\])|\[(?!%))*))\2%\]", re.DOTALL)
 
-    def __init__(self, shortcodes: List[_Shortcode] = None, context: Dict = None) -> None:
+    def __init__(
+        self,
+        shortcodes: List[_Shortcode] = None,
+        context: Dict = None,
+        tokenizer: Callable[[str], List[str]] = None,
+        cache_size: int = 0,
+        instrumentation: Optional[Instrumentation] = None,
+        verification: Optional[Verification] = None,
+    ) -> None:
         """
         Shortcode parser
 
@@ -25,15 +79,33 @@ class Shortcoder:
             List of shortcodes to register on init
         context : Dict, optional
             any extra context that will be passed to every shortcode conversion
+        tokenizer : Callable, optional
+            function splitting shortcode arguments into tokens, defaults to ``split_args``;
+            ``shlex.split`` can be passed for the original pure-python lexer
+        cache_size : int, optional
+            enables LRU cache of rendered shortcodes holding up to this many entries. Shortcodes whose
+            output depends on anything but their inputs and context should set ``cacheable = False``
+        instrumentation : Instrumentation, optional
+            enables per-shortcode timing of parse and reverse phases, see ``stats``
+        verification : Verification, optional
+            enables round-trip verification of a sample of shortcodes rendered by ``parse``, see ``verify``
         """
         self.shortcodes = {}
+        self._binders = {}
+        self._html_reverser = None
+        self._pattern_reverser = None
+        self._reverse_stages = []
         for shortcode in shortcodes or self.default_shortcodes:
             self.register(shortcode)
         self.context = context or {}
+        self.tokenizer = tokenizer or split_args
+        self.render_cache: Optional[RenderCache] = RenderCache(cache_size) if cache_size else None
+        self.instrumentation = instrumentation
+        self.verification = verification
 
     def register(self, shortcode: _Shortcode):
         """
-        register a shortcode to the current parser object
+        register a shortcode to the current parser object and compile its argument binder
 
         Parameters
         ----------
@@ -47,12 +119,66 @@ class Shortcoder:
         """
         if shortcode.name in self.shortcodes:
             raise DuplicateShortcode(f"{shortcode.name} already registered")
+        self._binders[shortcode.name] = (shortcode, shortcode.make_binder())
         self.shortcodes[shortcode.name] = shortcode
+        if HtmlReverser.accepts(shortcode):
+            if self._html_reverser is None:
+                self._html_reverser = HtmlReverser(shortcode.backend)
+                self._reverse_stages.append(self._html_reverser)
+            if not self._html_reverser.add(shortcode):
+                # HTML shortcodes using another backend than the first one reverse on their own
+                self._reverse_stages.append(shortcode)
+        elif PatternReverser.accepts(shortcode):
+            if self._pattern_reverser is None:
+                self._pattern_reverser = PatternReverser()
+                self._reverse_stages.append(self._pattern_reverser)
+            if not self._pattern_reverser.add(shortcode):
+                self._reverse_stages.append(shortcode)
+        else:
+            self._reverse_stages.append(shortcode)
+
+    def snapshot(self, file: SnapshotFile):
+        """
+        write compiled registry to a snapshot file, see ``from_snapshot``
+
+        Parameters
+        ----------
+        file
+            path or binary file object
+        """
+        snapshot.dump(self, file)
+
+    @classmethod
+    def from_snapshot(cls, file: SnapshotFile) -> "Shortcoder":
+        """
+        load shortcode manager from a snapshot file written by ``snapshot``
+
+        Shortcodes are restored as compiled, without running their constructors, and lxml is only imported
+        once an HTML shortcode is reversed or rendered with input values that need the lxml render path.
+
+        Parameters
+        ----------
+        file
+            path or binary file object
+
+        Raises
+        ------
+        ValueError
+            raised when file is not a snapshot of a shortcode manager
+        """
+        shortcoder = snapshot.load(file)
+        if not isinstance(shortcoder, cls):
+            raise ValueError(f"snapshot contains {type(shortcoder).__name__}, expected {cls.__name__}")
+        return shortcoder
 
     def parse(self, text: str, context=None) -> str:
         """
         parse text and convert shortcodes to their convert values
 
+        Enclosing shortcodes, e.g. ``[%box title%]body[%/box%]``, are converted after every shortcode in their
+        body and get the converted body as ``content`` value. With ``verification`` enabled, sampled shortcodes
+        are verified once the whole text is converted, see ``verify``.
+
         Parameters
         ----------
         text
@@ -73,53 +199,519 @@ class Shortcoder:
             raised when unknown shortcode is encountered
         UnknownShortcodeKey
             raised when kwarg shortcode encounters unknown key
+        UnterminatedShortcode
+            raised when shortcode marker or enclosing shortcode is not closed, with its position in text
+        RoundTripError
+            raised by strict ``verification`` when a sampled shortcode does not survive reverse
+        """
+        if not self.shortcodes:
+            raise NoShortcodesRegistered
+        if not context:
+            context = self.context
+
+        render = self._renderer(context)
+        if self.verification is None:
+            return "".join(self._walk(text, render))
+        rendered = []
+        output = "".join(self._walk(text, render, rendered))
+        self._verify(text, rendered, context, self.verification)
+        return output
+
+    def _walk(self, text: str, render: Callable[..., str], rendered: Optional[List] = None) -> List[str]:
+        """
+        literal and rendered pieces of text; ``(name, start, end, output)`` of every rendered shortcode is
+        appended to ``rendered`` if supplied
+        """
+
+        if rendered is None:
+
+            def leaf(match: re.Match):
+                name, args = match.groups()
+                return render(name, args, match.group())
+
+            def enclose(match: re.Match, source: str, pieces: List[str]):
+                name, args = match.groups()
+                return render(name, args, source, "".join(pieces))
+
+        else:
+
+            def leaf(match: re.Match):
+                name, args = match.groups()
+                output = render(name, args, match.group())
+                rendered.append((name, match.start(), match.end(), output))
+                return output
+
+            def enclose(match: re.Match, source: str, pieces: List[str]):
+                name, args = match.groups()
+                output = render(name, args, source, "".join(pieces))
+                rendered.append((name, match.start(), match.start() + len(source), output))
+                return output
+
+        return walk(text, self.re_shcode, self._enclosing(), leaf, enclose)
+
+    def verify(self, text: str, context: Dict = None, verification: Optional[Verification] = None) -> List[Mismatch]:
+        """
+        Round-trip every shortcode in text and return the ones that do not survive it
+
+        Every rendered shortcode is reversed from its output alone and the reversed shortcode is rendered again;
+        it survives when it is reversed to a shortcode of the same name rendering the same output. Rendering
+        goes through the render cache, so with ``cache_size`` set the second render is a cache hit for every
+        shortcode whose input values survived.
+
+        Parameters
+        ----------
+        text
+            text to verify
+        context
+            extra context to render shortcodes with. If not supplied self.context will be used
+        verification
+            sampling settings collecting the results, by default a new one verifying every shortcode
+
+        Returns
+        -------
+        List[Mismatch]
+            shortcodes that did not survive, with their source offsets, line and column in text
         """
         if not self.shortcodes:
             raise NoShortcodesRegistered
         if not context:
             context = self.context
+        if verification is None:
+            verification = Verification()
+        render = self._renderer(context)
+        rendered = []
+        self._walk(text, render, rendered)
+        return self._verify(text, rendered, context, verification)
+
+    def _verify(self, text: str, rendered: List, context: Dict, verification: Verification) -> List[Mismatch]:
+        """
+        verify sample of rendered ``(name, start, end, output)`` shortcodes of text and return mismatches;
+        the round trips are not recorded by instrumentation nor counted in ``reverse_counter``
+        """
+        render = self._renderer(context, instrumented=False)
+        mismatches = []
+        for index in verification.sample([name for name, _, _, _ in rendered]):
+            name, start, end, output = rendered[index]
+            if not isinstance(output, str):
+                continue
+            reversed_text = again = error = None
+            try:
+                reversed_text = self._reverse_unrecorded(output)
+                match = self.re_shcode.match(reversed_text)
+                if match is not None and match.group(1) == name:
+                    again = "".join(self._walk(reversed_text, render))
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except BaseException as e:
+                error = e
+            if error is None and again == output:
+                verification.record(None)
+                continue
+            line, column = line_column(text, start)
+            source = text[start:end]
+            mismatch = Mismatch(name, start, end, line, column, source, output, reversed_text, again, error)
+            mismatches.append(mismatch)
+            verification.record(mismatch)
+        return mismatches
+
+    async def aparse(self, text: str, context: Dict = None, concurrency: Optional[int] = None) -> str:
+        """
+        parse text like ``parse`` awaiting shortcodes with ``async def convert`` concurrently
+
+        Synchronous shortcodes are converted right away while the text is scanned; awaitable results are run
+        together once scanning is done and spliced back in source order. Enclosing shortcodes with awaitable
+        results in their body are converted once those are awaited.
+
+        Parameters
+        ----------
+        text
+            text to parse
+        context
+            extra context to pass to shortcode.convert method. If not supplied self.context will be used
+        concurrency
+            maximum number of awaitable conversions running at the same time, unlimited if not supplied
+
+        Returns
+        -------
+        text
+            converted text
+
+        Raises
+        ------
+        NoShortcodesRegistered
+            raised when manager has no shortcodes registered
+        UnknownShortcode
+            raised when unknown shortcode is encountered
+        UnterminatedShortcode
+            raised when shortcode marker or enclosing shortcode is not closed, with its position in text
+        """
+        if not self.shortcodes:
+            raise NoShortcodesRegistered
+        if not context:
+            context = self.context
+        if concurrency is not None and concurrency < 1:
+            raise ValueError(f"concurrency has to be positive, got {concurrency}")
+
+        import asyncio
+        import inspect
+
+        render = self._renderer(context)
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        # coroutines created while scanning, closed if scanning fails before they are awaited
+        created = []
+
+        async def limited(awaitable):
+            async with semaphore:
+                return await awaitable
+
+        def deferred(result):
+            if not inspect.isawaitable(result):
+                return result
+            created.append(result)
+            if semaphore:
+                # only conversions take a slot, enclosing shortcodes waiting for their body do not
+                result = limited(result)
+                created.append(result)
+            return result
+
+        async def enclose_awaited(match: re.Match, source: str, pieces: List):
+            results = iter(await _gather([piece for piece in pieces if inspect.isawaitable(piece)]))
+            content = "".join(next(results) if inspect.isawaitable(piece) else piece for piece in pieces)
+            name, args = match.groups()
+            result = deferred(render(name, args, source, content))
+            return await result if inspect.isawaitable(result) else result
+
+        def leaf(match: re.Match):
+            name, args = match.groups()
+            return deferred(render(name, args, match.group()))
+
+        def enclose(match: re.Match, source: str, pieces: List):
+            if any(inspect.isawaitable(piece) for piece in pieces):
+                awaitable = enclose_awaited(match, source, pieces)
+                created.append(awaitable)
+                return awaitable
+            name, args = match.groups()
+            return deferred(render(name, args, source, "".join(pieces)))
+
+        try:
+            pieces = walk(text, self.re_shcode, self._enclosing(), leaf, enclose)
+        except BaseException:
+            for awaitable in created:
+                if inspect.iscoroutine(awaitable):
+                    awaitable.close()
+            raise
+        pending = [index for index, piece in enumerate(pieces) if inspect.isawaitable(piece)]
+        if not pending:
+            return "".join(pieces)
+        for index, result in zip(pending, await _gather([pieces[index] for index in pending])):
+            pieces[index] = result
+        return "".join(pieces)
+
+    def parse_stream(
+        self,
+        source: Union[TextIO, Iterable[str]],
+        context: Dict = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_span: int = DEFAULT_MAX_SPAN,
+    ) -> Iterator[str]:
+        """
+        parse text stream and yield converted chunks
+
+        Shortcodes are converted one by one like in ``tokenize``: enclosing shortcodes are not supported and
+        unterminated markers are kept as literal text.
+
+        Parameters
+        ----------
+        source
+            text file object or iterable of text chunks
+        context
+            extra context to pass to shortcode.convert method. If not supplied self.context will be used
+        chunk_size
+            number of characters to read at once from file objects
+        max_span
+            longest unterminated shortcode to buffer before treating it as literal text
+
+        Yields
+        ------
+        str
+            converted text chunks
+
+        Raises
+        ------
+        ValueError
+            raised before anything is read when an enclosing shortcode is registered
+        """
+        if not self.shortcodes:
+            raise NoShortcodesRegistered
+        self._check_no_enclosing("parse_stream")
+        render = self._renderer(context or self.context)
+
+        def convert(match: re.Match):
+            name, args = match.groups()
+            return render(name, args, match.group())
+
+        return parse_chunks(iter_chunks(source, chunk_size), self.re_shcode, convert, max_span=max_span)
+
+    def parse_buffer(self, buffer, writer: BinaryIO, context: Dict = None, encoding: str = "utf-8") -> int:
+        """
+        parse encoded text in place and write converted bytes, e.g. from a memory-mapped file
+
+        Shortcodes are searched for with a bytes version of ``re_shcode``, only their spans are decoded and
+        literal regions are written to ``writer`` straight from the buffer. Like ``parse_stream`` enclosing
+        shortcodes are rejected and unterminated markers are kept as literal text.
+
+        Parameters
+        ----------
+        buffer
+            any bytes-like object: bytes, mmap, memoryview or e.g. ``SharedMemory.buf`` shared between workers
+        writer
+            binary file object, ideally buffered
+        context
+            extra context to pass to shortcode.convert method. If not supplied self.context will be used
+        encoding
+            encoding of the buffer and output; UTF-8 or a single-byte ASCII-compatible encoding
+
+        Returns
+        -------
+        int
+            number of bytes written
+
+        Raises
+        ------
+        ValueError
+            raised before anything is written when an enclosing shortcode is registered
+        """
+        if not self.shortcodes:
+            raise NoShortcodesRegistered
+        self._check_no_enclosing("parse_buffer")
+        pattern = bytes_pattern(self.re_shcode, encoding)
+        render = self._renderer(context or self.context)
 
         def convert(match: re.Match):
             name, args = match.groups()
+            return render(name.decode(encoding), args.decode(encoding), match.group().decode(encoding))
+
+        return parse_buffer(buffer, pattern, convert, writer, encoding)
+
+    def parse_file(
+        self,
+        source: Union[str, os.PathLike],
+        target: Union[str, os.PathLike],
+        context: Dict = None,
+        encoding: str = "utf-8",
+        buffer_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> int:
+        """
+        parse file of any size by memory-mapping it, see ``parse_buffer``; returns number of bytes written
+        """
+        if os.path.exists(target) and os.path.samefile(source, target):
+            raise ValueError(f"cannot parse {source} in place")
+        self._check_no_enclosing("parse_file")
+        with open(source, "rb") as file, open(target, "wb", buffering=buffer_size) as writer:
+            if not os.fstat(file.fileno()).st_size:
+                # empty files cannot be mapped
+                return self.parse_buffer(b"", writer, context, encoding)
+            import mmap
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return self.parse_buffer(mapped, writer, context, encoding)
+
+    def parse_many(
+        self,
+        documents: Iterable[BatchInput],
+        context: Dict = None,
+        workers: Optional[int] = None,
+        executor: str = "process",
+        chunksize: int = 16,
+        ordered: bool = True,
+    ) -> Iterator[BatchResult]:
+        """
+        parse many documents in parallel
+
+        Parameters
+        ----------
+        documents
+            document texts or ``os.PathLike`` paths of documents to read
+        context
+            extra context to pass to shortcode.convert method. If not supplied self.context will be used
+        workers
+            number of pool workers, defaults to cpu count; 0 parses in the current thread
+        executor
+            "process" or "thread" pool. Process workers receive a pickled copy of this manager,
+            so templates and shortcodes have to be picklable (e.g. no lambda templates)
+        chunksize
+            number of documents submitted to a worker at once
+        ordered
+            yield results in document order rather than as soon as they are done
+
+        Yields
+        ------
+        BatchResult
+            ``(index, path, output, error)`` of every document; errors such as UnknownShortcode are captured
+            per document instead of aborting the batch
+        """
+        return run_batch(self, "parse", documents, context, workers, executor, chunksize, ordered)
+
+    def _enclosing(self) -> Set[str]:
+        """names of enclosing shortcodes, read on every parse as the flag can be set after registration"""
+        return {name for name, shortcode in self.shortcodes.items() if shortcode.enclosing}
+
+    def _check_no_enclosing(self, method: str):
+        """streaming methods render shortcodes one by one and cannot collect the body of enclosing shortcodes"""
+        enclosing = self._enclosing()
+        if enclosing:
+            raise ValueError(f"{method} does not support enclosing shortcodes {sorted(enclosing)}, use parse")
+
+    def _converter(self, context: Dict, instrumented: bool = True) -> Callable[[str, _Shortcode, Dict[str, str]], str]:
+        """build function converting a shortcode from its bound input values, using the render cache if enabled"""
+        cache = self.render_cache
+        if cache is not None:
             try:
-                handler = self.shortcodes[name]
-            except KeyError:
-                raise UnknownShortcode(name, match.group())
-            args = shlex.split(args.strip())
-            if isinstance(handler, PositionalShortcode):
-                kwargs = {}
-                for i, arg in enumerate(args):
-                    try:
-                        kwargs[handler.inputs[i].name] = arg
-                    except IndexError:
-                        raise ExtraParameters(
-                            "shortcode {name} got {count} parameters when {exp} expected ".format(
-                                name=name,
-                                count=len(args),
-                                exp=len(handler.inputs),
-                            )
-                        )
+                context_key = fingerprint(context)
+            except TypeError:
+                cache = None
+        plain_inputs = {}
+
+        def convert(name: str, handler: _Shortcode, kwargs: Dict[str, str]) -> str:
+            if cache is None or not handler.cacheable:
                 return handler.convert(kwargs, context=context)
-            elif isinstance(handler, KeywordShortcode):
-                kwargs = {}
-                for i, arg in enumerate(args):
-                    key, value = arg.split("=", 1)
-                    kwargs[key] = value
-                _input_names = [i.name for i in handler.inputs]
-                invalid = [key for key in kwargs if key not in _input_names]
-                if invalid:
-                    raise InvalidKeywords(
-                        "shortcode {name} got unknown keys {keys}, allowed: {inputs}".format(
-                            name=name,
-                            keys=invalid,
-                            inputs=handler.inputs,
-                        )
-                    )
+            plain = plain_inputs.get(name)
+            if plain is None:
+                # tokenized values are always strings, other types can only come from input defaults
+                plain = plain_inputs[name] = all(type(inp.default) in (str, type(None)) for inp in handler.inputs)
+            try:
+                key = (name, frozenset(kwargs.items()) if plain else fingerprint(kwargs), context_key)
+            except TypeError:
+                # unhashable input defaults
                 return handler.convert(kwargs, context=context)
+            result = cache.get(key)
+            if result is None:
+                result = handler.convert(kwargs, context=context)
+                if _isawaitable(result):
+                    return cache_awaited(key, result)
+                if result is not None:
+                    cache.put(key, result)
+            return result
+
+        async def cache_awaited(key, awaitable):
+            result = await awaitable
+            if result is not None:
+                cache.put(key, result)
+            return result
+
+        if self.instrumentation is None or not instrumented:
+            return convert
+        record = self.instrumentation.record
+
+        async def time_awaited(name: str, awaitable, start: float):
+            try:
+                return await awaitable
+            finally:
+                record(name, RENDER, perf_counter() - start)
+
+        def instrumented_convert(name: str, handler: _Shortcode, kwargs: Dict[str, str]) -> str:
+            start = perf_counter()
+            result = convert(name, handler, kwargs)
+            if _isawaitable(result):
+                # timed from the call until the awaited result, including time spent waiting for a slot
+                return time_awaited(name, result, start)
+            record(name, RENDER, perf_counter() - start)
+            return result
+
+        return instrumented_convert
+
+    def _renderer(self, context: Dict, instrumented: bool = True) -> Callable[..., str]:
+        """
+        build function rendering a single shortcode from its name, raw arguments and source text;
+        converted body of an enclosing shortcode is passed as ``content``
+        """
+        binders = self._binders
+        tokenizer = self.tokenizer
+        convert = self._converter(context, instrumented)
+
+        def render(name: str, args: str, source: str, content: Optional[str] = None) -> str:
+            try:
+                handler, binder = binders[name]
+            except KeyError:
+                raise UnknownShortcode(name, source)
+            kwargs = binder(tokenizer(args.strip()))
+            if content is not None:
+                kwargs["content"] = content
+            return convert(name, handler, kwargs)
+
+        if self.instrumentation is None or not instrumented:
+            return render
+        record = self.instrumentation.record
+
+        def instrumented_render(name: str, args: str, source: str, content: Optional[str] = None) -> str:
+            try:
+                handler, binder = binders[name]
+            except KeyError:
+                raise UnknownShortcode(name, source)
+            start = perf_counter()
+            tokens = tokenizer(args.strip())
+            tokenized = perf_counter()
+            kwargs = binder(tokens)
+            record(name, TOKENIZE, tokenized - start)
+            record(name, BIND, perf_counter() - tokenized)
+            if content is not None:
+                kwargs["content"] = content
+            return convert(name, handler, kwargs)
+
+        return instrumented_render
+
+    def tokenize(self, text: str) -> Document:
+        """
+        split text into literal spans and shortcode nodes once so it can be rendered, searched and validated
+        repeatedly without scanning the text again
+
+        Every marker is a node of its own: closing markers of enclosing shortcodes are not paired with their
+        opening marker and unterminated markers, e.g. in text that is still being typed, are literal text.
+
+        Parameters
+        ----------
+        text
+            text to tokenize
+
+        Returns
+        -------
+        Document
+            ``Node`` shortcodes with parsed arguments; ``tokens`` adds ``(start, end)`` offsets of literal spans
+
+        Raises
+        ------
+        ValueError
+            raised when shortcode arguments have unbalanced quotes
+        """
+        nodes = []
+        tokenizer = self.tokenizer
+        for match in self.re_shcode.finditer(text):
+            name, args = match.groups()
+            # names repeat across a document, interning keeps a single copy of each
+            nodes.append(Node(sys.intern(name), tokenizer(args.strip()), *match.span()))
+        return Document(self, text, nodes)
+
+    def incremental(self, text: str, context: Optional[Dict] = None) -> IncrementalDocument:
+        """
+        render text and keep it rendered across edits, e.g. for live previews
+
+        Text is tokenized like in ``tokenize``, so unterminated markers of shortcodes being typed are literal text.
+
+        Parameters
+        ----------
+        text
+            initial text
+        context
+            context used to render shortcodes, the shortcoder's context if not supplied
+
+        Returns
+        -------
+        IncrementalDocument
+            document with rendered ``output``; ``edit(offset, deleted, inserted)`` re-renders only the
+            shortcodes around the edit and returns the output ``Change``
+        """
+        return IncrementalDocument(self, text, context)
 
-        result = self.re_shcode.sub(convert, text)
-        return result
-    
     def find_shortcodes(self, text: str) -> List[str]:
         """
         Find all shortcodes in text
@@ -136,10 +728,109 @@ class Shortcoder:
         """
         return self.re_shcode.findall(text)
 
-    def reverse(self, text: str) -> str:
+    def scan(self, text: str) -> Markers:
+        """
+        Find all shortcode markers in text like ``find_shortcodes``, recorded compactly as offsets
+
+        Parameters
+        ----------
+        text
+            text to search
+
+        Returns
+        -------
+        Markers
+            sequence of ``Marker(name, args, start, end)`` backed by a single array of offsets into text
+        """
+        return Markers.scan(text, self.re_shcode)
+
+    @property
+    def reverse_counter(self) -> Counter:
+        """number of HTML elements ``skipped`` by the class marker prefilter and ``parsed`` while reversing"""
+        if self._html_reverser is None:
+            return Counter(skipped=0, parsed=0)
+        return self._html_reverser.counter
+
+    def reverse(self, text: str, document: bool = False) -> str:
         """
         Reverse shortcode value to shortcode if possible
+
+        HTML shortcodes are reversed together in a single pass over the text, which runs at the position of
+        the first registered HTML shortcode. Shortcodes declaring ``re_reverse`` and ``extract`` are likewise
+        reversed together in one scan of a combined pattern at the position of the first of them, see
+        ``PatternReverser`` for how overlapping matches are resolved. Shortcodes with their own reverse
+        implementation run in registration order.
+
+        Parameters
+        ----------
+        text
+            text to reverse
+        document
+            parse the whole text with lxml once and reverse every marked element found in it instead of
+            slicing the text into elements with ``re_reverse``; handles nested elements correctly and
+            preserves all other source text as is
         """
-        for code in self.shortcodes.values():
-            text = code.reverse(text)
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            for stage in self._reverse_stages:
+                if stage is self._html_reverser and document:
+                    text = stage.reverse_document(text)
+                else:
+                    text = stage.reverse(text)
+            return text
+        for stage in self._reverse_stages:
+            if stage is self._html_reverser:
+                if document:
+                    text = stage.reverse_document(text, instrumentation)
+                else:
+                    text = stage.reverse(text, instrumentation)
+                continue
+            if stage is self._pattern_reverser:
+                text = stage.reverse(text, instrumentation)
+                continue
+            start = perf_counter()
+            text = stage.reverse(text)
+            instrumentation.record(stage.name, REVERSE, perf_counter() - start)
         return text
+
+    def _reverse_unrecorded(self, text: str) -> str:
+        """reverse without instrumentation and without counting elements in ``reverse_counter``"""
+        for stage in self._reverse_stages:
+            text = stage.reverse(text, count=False) if stage is self._html_reverser else stage.reverse(text)
+        return text
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        snapshot of instrumentation timings, see ``Instrumentation.stats``; empty when instrumentation is disabled
+        """
+        if self.instrumentation is None:
+            return {}
+        return self.instrumentation.stats()
+
+    def reverse_many(
+        self,
+        documents: Iterable[BatchInput],
+        workers: Optional[int] = None,
+        executor: str = "process",
+        chunksize: int = 16,
+        ordered: bool = True,
+    ) -> Iterator[BatchResult]:
+        """Reverse many documents in parallel, see ``parse_many`` for parameters"""
+        return run_batch(self, "reverse", documents, None, workers, executor, chunksize, ordered)
+
+    def reverse_stream(
+        self,
+        source: Union[TextIO, Iterable[str]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_span: int = DEFAULT_MAX_SPAN,
+    ) -> Iterator[str]:
+        """
+        Reverse text stream and yield reversed chunks
+
+        Text is reversed in segments that never split an HTML element matched by ``HTMLMixin.re_reverse``;
+        shortcodes with their own reverse implementation must not match across such segments.
+        See ``parse_stream`` for parameters.
+        """
+        yield from reverse_chunks(
+            iter_chunks(source, chunk_size), HtmlReverser.re_reverse, self.reverse, max_span=max_span
+        )
@@ -0,0 +1,406 @@
+"""
+Contains reverse engines used by the shortcode manager to turn rendered output back to shortcodes
+"""
+import re
+from bisect import bisect_right
+from collections import Counter
+from html import unescape
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Pattern, Tuple, Union
+
+from shortcoder.backends import HtmlBackend, get_backend, handle_lxml_errors
+from shortcoder.instrument import DOCUMENT, REVERSE, REVERSE_PARSE, REVERSE_REGEX, REVERSE_XPATH, Instrumentation
+from shortcoder.shortcodes.base import _Shortcode
+from shortcoder.shortcodes.html import HTMLMixin
+
+
+VOID_ELEMENTS = frozenset(
+    ["area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"]
+)
+
+_re_start_tag = re.compile(
+    r"""<([A-Za-z][^\s/>]*)((?:\s+[^\s"'>/=]+(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'>]*))?)*)\s*/?>"""
+)
+_re_marker_boundary = re.compile(r"[\w-]")
+_re_comment = re.compile(r"<!--.*?(?:-->|$)", re.DOTALL)
+_re_attribute = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]*)))?""")
+
+
+def _parse_attributes(text: str) -> Dict[str, str]:
+    """attributes of a start tag as lxml sees them: lowercase names, unescaped values, first duplicate wins"""
+    attributes = {}
+    for match in _re_attribute.finditer(text):
+        name, double, single, bare = match.groups()
+        value = double if double is not None else single if single is not None else bare or ""
+        attributes.setdefault(name.lower(), unescape(value))
+    return attributes
+
+
+class HtmlReverser:
+    """
+    Single-pass reverser for HTML shortcodes
+
+    HTML shortcodes are indexed by their class marker (e.g. ``shortcode-yt``) so the text is scanned once,
+    every candidate element is parsed once and only the shortcode owning the marker extracts its inputs.
+    Candidate elements that do not mention any registered marker are skipped without being parsed;
+    ``counter`` keeps track of how many elements were ``skipped`` and ``parsed``. Elements are parsed with
+    ``backend``, so only shortcodes using the same HTML backend can be added.
+    """
+
+    re_reverse = HTMLMixin.re_reverse
+
+    def __init__(self, backend: Union[str, HtmlBackend, None] = None) -> None:
+        self.backend = get_backend(backend)
+        self.handlers: Dict[str, HTMLMixin] = {}
+        self.counter = Counter(skipped=0, parsed=0)
+        self._re_markers: Optional[Pattern] = None
+        self._re_marker_candidates: Optional[Pattern] = None
+        self._marked_elements: Optional[Callable] = None
+        self._re_end_tags: Dict[str, Pattern] = {}
+
+    def __getstate__(self) -> Dict:
+        # compiled xpath cannot be pickled, it is compiled again on first use
+        state = self.__dict__.copy()
+        state["_marked_elements"] = None
+        return state
+
+    @classmethod
+    def accepts(cls, shortcode: _Shortcode) -> bool:
+        """whether shortcode can be reversed by this engine rather than by its own reverse method"""
+        return (
+            isinstance(shortcode, HTMLMixin)
+            and type(shortcode).reverse is HTMLMixin.reverse
+            and shortcode.re_reverse is cls.re_reverse
+        )
+
+    def add(self, shortcode: HTMLMixin) -> bool:
+        """
+        index shortcode by its class marker; first registered shortcode wins shared markers.
+        Returns False when shortcode uses another HTML backend, leaving it unchanged
+        """
+        if shortcode.backend is not self.backend:
+            return False
+        self.handlers.setdefault(shortcode.class_, shortcode)
+        self._re_markers = self._re_marker_candidates = None
+        self._marked_elements = None
+        return True
+
+    @property
+    def re_markers(self) -> Pattern:
+        """combined regex matching any registered class marker as a standalone word"""
+        if self._re_markers is None:
+            markers = "|".join(re.escape(marker) for marker in sorted(self.handlers, key=len, reverse=True))
+            self._re_markers = re.compile(rf"(?<![\w-])(?:{markers})(?![\w-])")
+        return self._re_markers
+
+    def _iter_markers(self, text: str) -> Iterator[int]:
+        """
+        offsets of standalone class markers in text; same matches as ``re_markers`` but a leading lookbehind
+        would keep the regex engine from scanning for the markers' literal prefix, so it is checked here
+        """
+        if self._re_marker_candidates is None:
+            markers = "|".join(re.escape(marker) for marker in sorted(self.handlers, key=len, reverse=True))
+            self._re_marker_candidates = re.compile(rf"(?:{markers})(?![\w-])")
+        for match in self._re_marker_candidates.finditer(text):
+            start = match.start()
+            if not start or not _re_marker_boundary.match(text, start - 1):
+                yield start
+
+    @property
+    def marked_elements(self) -> Optional[Callable[[str], List]]:
+        """
+        function parsing a document and selecting every element carrying any registered class marker;
+        None when the backend parses marked elements one by one
+        """
+        if self._marked_elements is None:
+            self._marked_elements = self.backend.marked_elements(self.handlers)
+        return self._marked_elements
+
+    def _find_handler(self, tree) -> Optional[HTMLMixin]:
+        handlers = self.handlers
+        for class_ in tree.get("class", "").split(" "):
+            handler = handlers.get(class_)
+            if handler is not None:
+                return handler
+        return None
+
+    def reverse(self, text: str, instrumentation: Optional[Instrumentation] = None, count: bool = True) -> str:
+        """Reverse all indexed shortcodes in text in a single scan; ``count=False`` leaves ``counter`` as is"""
+        if instrumentation is not None:
+            return self._reverse_instrumented(text, instrumentation)
+        has_marker = self.re_markers.search
+        skipped = parsed = 0
+
+        def convert(match: re.Match):
+            nonlocal skipped, parsed
+            fragment = match.group()
+            if not has_marker(fragment):
+                skipped += 1
+                return fragment
+            parsed += 1
+            try:
+                tree = self.backend.fragment(fragment)
+            except Exception as e:
+                if new_exception := handle_lxml_errors(e):
+                    raise new_exception
+                return fragment
+            handler = self._find_handler(tree)
+            if handler is None:
+                return fragment
+            return handler._reverse_element(tree) or fragment
+
+        result = self.re_reverse.sub(convert, text)
+        if count:
+            self.counter.update(skipped=skipped, parsed=parsed)
+        return result
+
+    def _reverse_instrumented(self, text: str, instrumentation: Instrumentation) -> str:
+        """reverse while recording backend parse and xpath time per shortcode and the remaining regex scan time"""
+        has_marker = self.re_markers.search
+        record = instrumentation.record
+        skipped = parsed = 0
+        in_callbacks = 0.0
+
+        def convert(match: re.Match):
+            nonlocal skipped, parsed, in_callbacks
+            fragment = match.group()
+            if not has_marker(fragment):
+                skipped += 1
+                return fragment
+            parsed += 1
+            start = perf_counter()
+            try:
+                try:
+                    tree = self.backend.fragment(fragment)
+                except Exception as e:
+                    if new_exception := handle_lxml_errors(e):
+                        raise new_exception
+                    return fragment
+                handler = self._find_handler(tree)
+                parsed_at = perf_counter()
+                record(handler.name if handler else DOCUMENT, REVERSE_PARSE, parsed_at - start)
+                if handler is None:
+                    return fragment
+                result = handler._reverse_element(tree) or fragment
+                record(handler.name, REVERSE_XPATH, perf_counter() - parsed_at)
+                return result
+            finally:
+                in_callbacks += perf_counter() - start
+
+        start = perf_counter()
+        result = self.re_reverse.sub(convert, text)
+        record(DOCUMENT, REVERSE_REGEX, perf_counter() - start - in_callbacks)
+        self.counter.update(skipped=skipped, parsed=parsed)
+        return result
+
+    def _element_end(self, text: str, tag: str, pos: int) -> Optional[int]:
+        """end offset of the closing tag matching an element opened right before pos, None if it is not closed"""
+        pattern = self._re_end_tags.get(tag)
+        if pattern is None:
+            pattern = self._re_end_tags[tag] = re.compile(
+                rf"<!--.*?-->|<(/?){re.escape(tag)}(?=[\s/>])[^>]*>", re.IGNORECASE | re.DOTALL
+            )
+        depth = 1
+        for match in pattern.finditer(text, pos):
+            closing = match.group(1)
+            if closing is None:
+                continue
+            if closing:
+                depth -= 1
+                if depth == 0:
+                    return match.end()
+            elif not match.group().endswith("/>"):
+                depth += 1
+        return None
+
+    def _marked_spans(self, text: str) -> List[Tuple[int, int, str, Dict[str, str], HTMLMixin]]:
+        """``(start, end, tag, attributes, handler)`` of source elements carrying a registered class marker"""
+        spans = []
+        checked = -1
+        comments = [match.span() for match in _re_comment.finditer(text)] if "<!--" in text else []
+        comment_starts = [start for start, _ in comments]
+        for marker in self._iter_markers(text):
+            index = bisect_right(comment_starts, marker) - 1
+            if index >= 0 and marker < comments[index][1]:
+                continue
+            tag_start = text.rfind("<", 0, marker)
+            if tag_start == checked:
+                continue
+            checked = tag_start
+            tag = _re_start_tag.match(text, tag_start) if tag_start != -1 else None
+            if tag is None or tag.end() <= marker:
+                continue
+            attributes = _parse_attributes(tag.group(2))
+            handler = None
+            for class_ in attributes.get("class", "").split(" "):
+                handler = self.handlers.get(class_)
+                if handler is not None:
+                    break
+            if handler is None:
+                continue
+            name = tag.group(1).lower()
+            end = tag.end() if name in VOID_ELEMENTS else self._element_end(text, name, tag.end())
+            if end is not None:
+                spans.append((tag_start, end, name, attributes, handler))
+        return spans
+
+    def reverse_document(self, text: str, instrumentation: Optional[Instrumentation] = None) -> str:
+        """
+        Reverse all indexed shortcodes parsing the whole text with the backend once
+
+        Marked elements are selected in a single query and paired with their source spans, which are
+        replaced by shortcode text; everything else is left as it was in the source. Nested elements are
+        paired properly rather than sliced by ``re_reverse``. When source spans and parsed elements cannot be
+        paired one to one (e.g. markup the backend has to repair) or the backend does not parse whole documents
+        each span is parsed on its own instead.
+        """
+        record = instrumentation.record if instrumentation is not None else None
+        start = perf_counter()
+        spans = self._marked_spans(text)
+        if not spans:
+            return text
+        select = self.marked_elements
+        try:
+            elements = select(text) if select is not None else None
+        except Exception:
+            # e.g. encoding declaration in unicode text; spans are parsed one by one and report errors themselves
+            elements = None
+        if elements is not None and (
+            len(elements) != len(spans)
+            or any(
+                element.tag != tag or dict(element.attrib) != attributes
+                for element, (_, _, tag, attributes, _) in zip(elements, spans)
+            )
+        ):
+            elements = None
+        if record:
+            record(DOCUMENT, REVERSE_PARSE, perf_counter() - start)
+
+        pieces = []
+        pos = 0
+        for index, (span_start, span_end, _, _, handler) in enumerate(spans):
+            if span_start < pos:
+                # nested inside an element that was already reversed
+                continue
+            if elements is not None:
+                tree = elements[index]
+            else:
+                try:
+                    tree = self.backend.fragment(text[span_start:span_end])
+                except Exception as e:
+                    if new_exception := handle_lxml_errors(e):
+                        raise new_exception
+                    continue
+            extract_start = perf_counter()
+            result = handler._reverse_element(tree)
+            if record:
+                record(handler.name, REVERSE_XPATH, perf_counter() - extract_start)
+            if result:
+                pieces.append(text[pos:span_start])
+                pieces.append(result)
+                pos = span_end
+        pieces.append(text[pos:])
+        self.counter.update(parsed=len(spans))
+        return "".join(pieces)
+
+
+class PatternReverser:
+    """
+    Single-scan reverser for shortcodes declaring ``re_reverse`` and ``extract``
+
+    Patterns of all accepted shortcodes are merged into one alternation, so the text is scanned once instead
+    of once per shortcode. Overlapping matches are resolved like a single regex would: the match starting
+    first wins and of matches starting at the same position the shortcode registered first wins. Text of a
+    winning match is never scanned again, even when its ``extract`` returns None. This differs from reversing
+    shortcode by shortcode only when patterns of different shortcodes overlap.
+    """
+
+    # flags that can be scoped to a single alternative of the combined pattern
+    scoped_flags = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x"}
+    # numbered backreferences and conditionals would point at other groups once patterns are merged
+    re_numbered_reference = re.compile(r"\\[1-9]|\\g<\d|\(\?\(\d")
+    re_group_name = re.compile(r"(?<!\\)\(\?P([<=])(\w+)")
+
+    def __init__(self) -> None:
+        self.handlers: List[_Shortcode] = []
+        self.pattern: Optional[Pattern] = None
+        self._dispatch: Optional[Pattern] = None
+
+    @classmethod
+    def accepts(cls, shortcode: _Shortcode) -> bool:
+        """whether shortcode declares its reverse pattern and the pattern can be merged with others"""
+        pattern = shortcode.re_reverse
+        return (
+            pattern is not None
+            and type(shortcode).reverse is _Shortcode.reverse
+            and isinstance(pattern.pattern, str)
+            and not cls.re_numbered_reference.search(pattern.pattern)
+            and not pattern.flags & ~(re.UNICODE | sum(cls.scoped_flags))
+        )
+
+    def _combine(self, handlers: List[_Shortcode], groups: bool = False) -> Pattern:
+        """
+        Alternation of handler patterns, each in a ``_r{index}`` named group if ``groups`` is set. Flags shared by
+        all patterns apply to the whole alternation, others are scoped to their alternative; scoped flags and
+        alternative groups keep the regex engine from skipping ahead to possible match starts, so the scanning
+        pattern uses neither unless patterns differ in flags. Group names get a per pattern prefix.
+        """
+        flags = {handler.re_reverse.flags & ~re.UNICODE for handler in handlers}
+        shared = flags.pop() if len(flags) == 1 else 0
+        alternatives = []
+        for index, handler in enumerate(handlers):
+            pattern = handler.re_reverse
+            source = self.re_group_name.sub(rf"(?P\1_r{index}_\2", pattern.pattern)
+            if pattern.flags & re.VERBOSE:
+                # verbose patterns can end with a comment which would swallow the closing parenthesis
+                source += "\n"
+            letters = "".join(letter for flag, letter in self.scoped_flags.items() if pattern.flags & ~shared & flag)
+            alternative = f"(?{letters}:{source})"
+            alternatives.append(f"(?P<_r{index}>{alternative})" if groups else alternative)
+        return re.compile("|".join(alternatives), shared)
+
+    def add(self, shortcode: _Shortcode) -> bool:
+        """merge shortcode's pattern; returns False when merged pattern does not compile, leaving it unchanged"""
+        handlers = self.handlers + [shortcode]
+        if len(handlers) == 1:
+            self.handlers, self.pattern = handlers, shortcode.re_reverse
+            return True
+        try:
+            pattern, dispatch = self._combine(handlers), self._combine(handlers, groups=True)
+        except re.error:
+            return False
+        self.handlers = handlers
+        self.pattern, self._dispatch = pattern, dispatch
+        return True
+
+    def _reverse_match(self, match: re.Match) -> Tuple[_Shortcode, str]:
+        # matching at the same position again with named alternatives tells which pattern matched; matching
+        # with that pattern on its own gives extract a match with the shortcode's own groups
+        if len(self.handlers) == 1:
+            shortcode = self.handlers[0]
+            return shortcode, shortcode._reverse_match(match)
+        start = match.start()
+        shortcode = self.handlers[int(self._dispatch.match(match.string, start).lastgroup[2:])]
+        return shortcode, shortcode._reverse_match(shortcode.re_reverse.match(match.string, start))
+
+    def reverse(self, text: str, instrumentation: Optional[Instrumentation] = None) -> str:
+        """Reverse all added shortcodes in text in a single scan"""
+        if instrumentation is None:
+            return self.pattern.sub(lambda match: self._reverse_match(match)[1], text)
+
+        record = instrumentation.record
+        in_callbacks = 0.0
+
+        def convert(match: re.Match):
+            nonlocal in_callbacks
+            start = perf_counter()
+            shortcode, result = self._reverse_match(match)
+            elapsed = perf_counter() - start
+            record(shortcode.name, REVERSE, elapsed)
+            in_callbacks += elapsed
+            return result
+
+        start = perf_counter()
+        result = self.pattern.sub(convert, text)
+        record(DOCUMENT, REVERSE_REGEX, perf_counter() - start - in_callbacks)
+        return result
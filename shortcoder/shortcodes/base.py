@@ -1,7 +1,9 @@
 """
 Contains base shortcode types
 """
-from typing import Dict, List, Optional, Union
+import re
+from typing import Any, Dict, List, Optional, Pattern, Union
+from shortcoder.binders import KeywordBinder, PositionalBinder
 from shortcoder.exceptions import InvalidInput, ShortcodeNotReversible
 from shortcoder.utils import quote_values
 
@@ -9,32 +11,103 @@ from shortcoder.utils import quote_values
 class Input:
     """Container for shortcode input definition"""
 
+    __slots__ = ("name", "xpath", "default")
+
     def __init__(self, name: str, xpath: Optional[str] = None, default: Optional[str] = None) -> None:
         self.name = name
         self.xpath = xpath
         self.default = default
 
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __repr__(self) -> str:
         return f"Input({self.name}, default={self.default})"
 
 
 class _Shortcode:
-    """Base shortcode class used by all shortcodes"""
+    """
+    Base shortcode class used by all shortcodes
+
+    Shortcode classes of this package are slotted; subclasses without ``__slots__`` get an instance
+    ``__dict__`` as usual.
+
+    Flags can be declared as class attributes of a subclass or set on an instance:
+
+    - ``cacheable``: whether rendered output only depends on inputs and context and can be stored in the
+      render cache, True by default
+    - ``enclosing``: whether shortcode encloses a body closed by ``[%/name%]``, passed to ``convert`` rendered
+      as ``content``, False by default
+    """
+
+    __slots__ = ("name", "inputs", "cacheable", "enclosing")
+
+    # pattern of rendered output; with ``extract`` it makes shortcode reversible without overriding ``reverse``
+    re_reverse: Optional[Pattern] = None
+    # class-level defaults of the flags, see ``__init_subclass__``
+    _cacheable_default = True
+    _enclosing_default = False
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        # a flag declared in the class body would shadow its slot and make it read-only on instances, so it is
+        # moved to the class-level default instead
+        for flag in ("cacheable", "enclosing"):
+            value = cls.__dict__.get(flag)
+            if isinstance(value, bool):
+                setattr(cls, f"_{flag}_default", value)
+                delattr(cls, flag)
 
     def __init__(self, name: str, inputs: List[Input]) -> None:
         self.name = name
         self.inputs = inputs
+        self.cacheable = self._cacheable_default
+        self.enclosing = self._enclosing_default
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """values of set slots and of instance ``__dict__``, if any"""
+        state = dict(getattr(self, "__dict__", {}))
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if not name.startswith("__") and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def reverse(self, text: str) -> str:
         """
         reverse shortcode output to original shortcode
         """
-        raise ShortcodeNotReversible("Reverse Functionality Not Implemented")
+        if self.re_reverse is None:
+            raise ShortcodeNotReversible("Reverse Functionality Not Implemented")
+        return self.re_reverse.sub(self._reverse_match, text)
+
+    def extract(self, match: re.Match) -> Optional[Dict[str, str]]:
+        """input values of ``re_reverse`` match, by default its named groups of input names; None to skip match"""
+        groups = match.groupdict()
+        return {inp.name: groups.get(inp.name) or "" for inp in self.inputs}
+
+    def _reverse_match(self, match: re.Match) -> str:
+        values = self.extract(match)
+        if not values:
+            return match.group()
+        return self._make_shortcode(values)
 
     def _make_shortcode(self, shortcode_kwargs: Dict[str, str]):
         """rejoin values to shortcode"""
         raise NotImplemented("Must be implemented by subclass")
-    
+
+    def make_binder(self):
+        """compile callable that maps tokenized shortcode arguments to input values"""
+        raise NotImplementedError("Must be implemented by subclass")
+
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self.name}, {self.inputs})"
 
@@ -42,21 +115,24 @@ class _Shortcode:
 class KeywordShortcode(_Shortcode):
     """Keyword argument shortcode, e.g. [% shortcode key1=value1 key2=value2 %]"""
 
+    __slots__ = ()
+
     def _make_shortcode(self, shortcode_kwargs: Dict[str, str]):
         shortcode_kwargs = quote_values(shortcode_kwargs)
         return f"[%{self.name} " + " ".join([f"{key}={value}" for key, value in shortcode_kwargs.items() if value]) + " %]"
 
+    def make_binder(self) -> KeywordBinder:
+        return KeywordBinder(self)
+
     def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
         pass
 
-    def reverse(self, text: str) -> str:
-        """reverse shortcode output to original shortcode"""
-        raise ShortcodeNotReversible("Reverse Functionality Not Implemented")
-
 
 class PositionalShortcode(_Shortcode):
     """Positional argument shortcode, e.g. [% shortcode value1 value2 %]"""
 
+    __slots__ = ()
+
     def __init__(self, name: str, inputs: List[Input]) -> None:
         _default_allowed = True
         for input in inputs[::-1]:
@@ -73,9 +149,8 @@ class PositionalShortcode(_Shortcode):
         shortcode_kwargs = quote_values(shortcode_kwargs)
         return f"[%{self.name} " + " ".join(shortcode_kwargs.values()).strip() + " %]"
 
+    def make_binder(self) -> PositionalBinder:
+        return PositionalBinder(self)
+
     def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
         pass
-
-    def reverse(self, text: str) -> str:
-        """reverse shortcode output to original shortcode"""
-        raise ShortcodeNotReversible("Reverse Functionality Not Implemented")
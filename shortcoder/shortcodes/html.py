@@ -1,42 +1,189 @@
 import re
-from typing import Callable, Dict, List, Optional
+from string import Formatter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
-from shortcoder.exceptions import RenderingError, ShortcodeNotReversible
+from shortcoder.backends import HtmlBackend, get_backend, handle_lxml_errors, load_lxml  # noqa: F401
+from shortcoder.exceptions import InvalidInput, InvalidTemplate, RenderingError, ShortcodeNotReversible
 from shortcoder.shortcodes.base import Input, KeywordShortcode, PositionalShortcode
-
-try:
-    from lxml import html
-except ImportError:
-    html = None
+from shortcoder.template import Template
 
 
 class HTMLMixin:
+    # slots are declared by the concrete shortcode classes, two slotted bases could not be combined
+    __slots__ = ()
     re_reverse = re.compile(r"(<[^/]*?\b[^>]*>.*?</.*?>)", flags=re.IGNORECASE | re.DOTALL)
+    # input values that the backend would escape, reject or reserialize and therefore need the full render path
+    re_unsafe_value = re.compile("[&<>\"'\x00-\x1f\x7f-\x9f\ud800-\udfff\ufffe\uffff]")
+    # values of URI attributes (href, src, action, name) are percent-escaped on serialization unless limited to these
+    re_unsafe_uri_value = re.compile(r"[^A-Za-z0-9\-_.!~*()@/:=?;#%,+]")
+    uri_attributes = ("href", "src", "action", "name")
+    re_attribute_start = re.compile(r"([^\s=]+)=\"[^\"]*$")
+    # input xpaths selecting an attribute of the shortcode element itself, read without xpath evaluation
+    re_attribute_xpath = re.compile(r"^@([A-Za-z_][\w.-]*)$")
 
-    def __init__(self, name, inputs: List[Input], template: Callable | str, class_: Optional[str] = None):
+    def __init__(
+        self,
+        name,
+        inputs: List[Input],
+        template: Callable | str | Template,
+        class_: Optional[str] = None,
+        escape: Iterable[str] = (),
+        backend: Union[str, HtmlBackend, None] = None,
+        enclosing: Optional[bool] = None,
+    ):
+        """
+        ``template`` is a format string with input names, ``context`` and ``shortcode`` placeholders, compiled
+        once and validated against the inputs, or a callable taking the same keyword arguments.
+        Inputs listed in ``escape`` are HTML-escaped before the template is rendered.
+        ``backend`` parses and serializes markup, see ``shortcoder.backends.get_backend``.
+        ``enclosing`` shortcodes can also use a ``content`` placeholder for their rendered body, its markup is
+        inserted as is.
+        """
         super().__init__(name, inputs)
-        if not html:
-            raise ImportError("lxml package is required for HtmlShortcode; try: pip install lxml")
+        if enclosing is not None:
+            self.enclosing = enclosing
+        self.backend = get_backend(backend)
+        for inp in inputs:
+            if inp.xpath and not self.backend.supports_xpath(inp.xpath):
+                raise InvalidInput(f"{name} input {inp.name} xpath {inp.xpath!r} is not supported by {self.backend!r}")
+        # reversibility is decided here, only compiling the xpaths is left to the first reverse
+        self._missing_xpath = next((inp for inp in inputs if not inp.xpath), None)
+        fields = [inp.name for inp in inputs] + ["context", "shortcode"] + (["content"] if self.enclosing else [])
         if isinstance(template, str):
-            self.template = template.format
-        else:
-            self.template = template
+            template = Template.shared(template, fields=tuple(fields), escape=tuple(escape))
+        elif isinstance(template, Template):
+            unknown = template.fields.difference(fields)
+            if unknown:
+                raise InvalidTemplate(f"template {template.source!r} of {name} uses unknown fields {sorted(unknown)}")
+        elif escape:
+            raise InvalidTemplate(f"escape is only supported for string templates, {name} has {template!r}")
+        self.template = template
         self.class_ = class_ or f"shortcode-{name}"
+        self._fast_template = self._compile_fast_template(template) if isinstance(template, Template) else None
+
+    def __getstate__(self) -> Dict:
+        # compiled xpaths cannot be pickled, they are compiled again on first use
+        state = super().__getstate__()
+        state.pop("_compiled_extractors", None)
+        return state
+
+    @property
+    def _extractors(self) -> List[Tuple[str, Optional[str], Callable]]:
+        """input extractors compiled on first reverse"""
+        try:
+            return self._compiled_extractors
+        except AttributeError:
+            self._compiled_extractors = self._compile_extractors()
+            return self._compiled_extractors
+
+    def _compile_extractors(self) -> List[Tuple[str, Optional[str], Callable]]:
+        """compile input xpaths once to ``(input name, attribute name, xpath)`` extractors"""
+        extractors = []
+        for inp in self.inputs:
+            attribute = self.re_attribute_xpath.match(inp.xpath)
+            extractors.append((inp.name, attribute.group(1) if attribute else None, self.backend.xpath(inp.xpath)))
+        return extractors
+
+    def _compile_fast_template(self, template: Template) -> Optional[Template]:
+        """
+        Render template once through the backend with sentinel inputs and turn the result back into a format
+        string. The result already carries the class marker and the backend's serialization so rendering safe
+        input values needs no parsing round-trip. Returns None when the template cannot be analysed statically.
+        """
+        if not template.source.lstrip().startswith("<"):
+            # root element has to come from the template itself rather than from input values
+            return None
+        names = [inp.name for inp in self.inputs]
+        counts = dict.fromkeys(names, 0)
+        for _, field, spec, conversion in Formatter().parse(template.source):
+            if field is None:
+                continue
+            if field not in counts or spec or conversion:
+                return None
+            counts[field] += 1
+        sentinels = {name: f"shortcoderfield{i}x" for i, name in enumerate(names)}
+        try:
+            rendered = self.backend.tostring(self._render_tree(sentinels, None))
+        except Exception:
+            return None
+        fast = rendered.replace("{", "{{").replace("}", "}}")
+        uri_names = set()
+        for name, sentinel in sentinels.items():
+            if rendered.count(sentinel) != counts[name]:
+                return None
+            for match in re.finditer(sentinel, rendered):
+                # placeholders are only allowed in text and in quoted attribute values
+                tag_start = rendered.rfind("<", 0, match.start())
+                if tag_start < rendered.rfind(">", 0, match.start()):
+                    continue
+                attribute = self.re_attribute_start.search(rendered, tag_start, match.start())
+                if not attribute:
+                    return None
+                if attribute.group(1).lower() in self.uri_attributes:
+                    uri_names.add(name)
+            fast = fast.replace(sentinel, "{%s}" % name)
+        probe = {
+            name: f"v{i}/:;=?#%.-~_!*()@,+" if name in uri_names else f"v {i} /:;=?#%.-\u00e9"
+            for i, name in enumerate(names)
+        }
+        # leading and trailing whitespace of text is moved around in document-level elements such as <head>
+        padded = {name: value if name in uri_names else f" {value} " for name, value in probe.items()}
+        # escaping leaves safe values as they are, so it is only needed on the full render path
+        fast_template = Template.shared(fast)
+        for values in (probe, padded):
+            try:
+                if fast_template.render(values) != self.backend.tostring(self._render_tree(values, None)):
+                    return None
+            except Exception:
+                return None
+        unsafe_value, unsafe_uri_value = self.re_unsafe_value, self.re_unsafe_uri_value
+        # blank values can change serialization, e.g. libxml2 leaves out the end tag of an empty <li> and moves
+        # whitespace out of <head>, so they take the full render path unless the template renders them as is
+        for blank in ("", " "):
+            # spaces in URI values are unsafe anyway
+            values = {name: "" if name in uri_names else blank for name in names}
+            try:
+                blank_safe = fast_template.render(values) == self.backend.tostring(self._render_tree(values, None))
+            except Exception:
+                blank_safe = False
+            if not blank_safe:
+                unsafe_value = re.compile(r"\A *\Z|" + unsafe_value.pattern)
+                unsafe_uri_value = re.compile(r"\A *\Z|" + unsafe_uri_value.pattern)
+                break
+        self._fast_checks = tuple(
+            (name, unsafe_uri_value.search if name in uri_names else unsafe_value.search) for name in names
+        )
+        return fast_template
 
     def _handle_lxml_errors(self, exception: Exception):
-        if isinstance(exception, ValueError):
-            if "Unicode strings with encoding declartion are not supported" in ''.join(exception.args):
-                return
-        return exception
+        return handle_lxml_errors(exception)
+
+    def _reverse_element(self, tree) -> Optional[str]:
+        """turn parsed shortcode element back to shortcode; None if there is nothing to reverse"""
+        if self._missing_xpath is not None:
+            inp = self._missing_xpath
+            raise ShortcodeNotReversible(f"shortcode {self.name} input {inp} is missing reversing instructions {inp.xpath=}")
+        if self.enclosing:
+            # the body is rendered into the element, there is no reversing instruction for it
+            raise ShortcodeNotReversible(f"enclosing shortcode {self.name} can't be reversed from its HTML")
+        shortcode_kwargs = {}
+        for name, attribute, xpath in self._extractors:
+            value = tree.get(attribute) if attribute else None
+            if value is None:
+                value = xpath(tree)[0]
+            shortcode_kwargs[name] = value or ""
+        if shortcode_kwargs:
+            return self._make_shortcode(shortcode_kwargs)
+        return None
 
     def reverse(self, text: str) -> str:
         """Reverse text value to shortcode"""
 
         def convert(match: re.Match):
-            if not match.group():
+            if not match.group() or self.class_ not in match.group():
                 return match.group()
             try:
-                tree = html.fromstring(match.group())
+                tree = self.backend.fragment(match.group())
             except Exception as e:
                 if new_exception:=self._handle_lxml_errors(e):
                     raise new_exception
@@ -44,14 +191,7 @@ class HTMLMixin:
                     return match.group()
             if self.class_ not in tree.get("class", "").split(" "):
                 return match.group()
-            shortcode_kwargs = {}
-            for inp in self.inputs:
-                if not inp.xpath:
-                    raise ShortcodeNotReversible(f"shortcode {self.name} input {inp} is missing reversing instructions {inp.xpath=}")
-                shortcode_kwargs[inp.name] = tree.xpath(inp.xpath)[0] or ""
-            if shortcode_kwargs:
-                return self._make_shortcode(shortcode_kwargs)
-            return match.group()
+            return self._reverse_element(tree) or match.group()
 
         result = self.re_reverse.sub(convert, text)
         return result
@@ -63,19 +203,40 @@ class HTMLMixin:
             if value is None:
                 raise RenderingError(f"Missing required input {input.name} for {self.name} shortcode; {kwargs=}")
             inputs[input.name] = value or ""
+        if self._fast_template is not None:
+            if not any(unsafe(inputs[name]) for name, unsafe in self._fast_checks):
+                return self._fast_template.render(inputs)
+        if self.enclosing:
+            inputs["content"] = kwargs.get("content", "")
         try:
-            html_text = self.template(**inputs, context=context, shortcode=self)
-            tree = html.fromstring(html_text)
-            _classes = tree.get("class", "").split(" ") + [self.class_]
-            tree.set("class", " ".join(_classes).strip())
+            tree = self._render_tree(inputs, context)
         except Exception as e:
             raise RenderingError(f"Error rendering {self.name} {kwargs=} shortcode: {e}", e)
-        return html.tostring(tree, encoding="unicode")
+        return self.backend.tostring(tree)
+
+    def _render_tree(self, inputs: Dict[str, str], context: Optional[Dict]):
+        """render template and add shortcode class marker to its root element"""
+        html_text = self.template(**inputs, context=context, shortcode=self)
+        tree = self.backend.fragment(html_text)
+        _classes = tree.get("class", "").split(" ") + [self.class_]
+        tree.set("class", " ".join(_classes).strip())
+        return tree
+
+
+_HTML_SLOTS = (
+    "backend",
+    "template",
+    "class_",
+    "_fast_template",
+    "_fast_checks",
+    "_missing_xpath",
+    "_compiled_extractors",
+)
 
 
 class HtmlPargShortcode(HTMLMixin, PositionalShortcode):
-    pass
+    __slots__ = _HTML_SLOTS
 
 
 class HtmlKwargShortcode(HTMLMixin, KeywordShortcode):
-    pass
+    __slots__ = _HTML_SLOTS
@@ -0,0 +1,87 @@
+"""
+Contains registry snapshots: a compiled shortcode manager stored in a compact file
+
+A snapshot keeps every registered shortcode as it was compiled: names, inputs, defaults, xpaths, parsed
+templates and their fast render templates, class markers, argument binders and reverse indexes. Loading
+it restores them without running shortcode constructors, so input validation and template analysis are
+skipped and lxml is only imported once something is rendered or reversed through it.
+
+Snapshots are zlib-compressed pickles: load only snapshots you made yourself with the same shortcoder
+version and with the modules defining custom shortcode classes and template callables importable.
+pickle and zlib are only imported once a snapshot is written or read.
+"""
+import os
+from typing import Any, BinaryIO, Union
+
+MAGIC = b"SHORTCODER-SNAPSHOT\n"
+VERSION = 6
+
+SnapshotFile = Union[str, os.PathLike, BinaryIO]
+
+
+def dumps(shortcoder) -> bytes:
+    """
+    Serialize shortcode manager to snapshot bytes
+
+    Render cache entries, instrumentation and verification are runtime state and are not stored;
+    a restored manager gets an empty render cache of the same size.
+    """
+    import copy
+    import pickle
+    import zlib
+
+    shortcoder = copy.copy(shortcoder)
+    if shortcoder.render_cache is not None:
+        shortcoder.render_cache = type(shortcoder.render_cache)(shortcoder.render_cache.maxsize)
+    shortcoder.instrumentation = None
+    shortcoder.verification = None
+    payload = pickle.dumps(shortcoder, protocol=pickle.HIGHEST_PROTOCOL)
+    return MAGIC + VERSION.to_bytes(2, "big") + zlib.compress(payload)
+
+
+def loads(data: bytes) -> Any:
+    """
+    Restore shortcode manager from snapshot bytes
+
+    Raises
+    ------
+    ValueError
+        raised when data is not a snapshot or was written by an incompatible snapshot format version
+    """
+    if not data.startswith(MAGIC):
+        raise ValueError("not a shortcoder registry snapshot")
+    header = len(MAGIC) + 2
+    version = int.from_bytes(data[len(MAGIC) : header], "big")
+    if version != VERSION:
+        raise ValueError(f"unsupported registry snapshot version {version}, expected {VERSION}")
+    import pickle
+    import zlib
+
+    return pickle.loads(zlib.decompress(data[header:]))
+
+
+def dump(shortcoder, file: SnapshotFile):
+    """write shortcode manager snapshot to a path or binary file object"""
+    data = dumps(shortcoder)
+    if hasattr(file, "write"):
+        file.write(data)
+        return
+    with open(file, "wb") as f:
+        f.write(data)
+
+
+def load(file: SnapshotFile) -> Any:
+    """read shortcode manager snapshot from a path or binary file object, see ``loads``"""
+    if hasattr(file, "read"):
+        return loads(file.read())
+    with open(file, "rb") as f:
+        return loads(f.read())
+
+
+def is_snapshot(path: Union[str, os.PathLike]) -> bool:
+    """whether file at path starts with the snapshot header"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
@@ -0,0 +1,223 @@
+"""
+Contains helpers for parsing and reversing text streams chunk by chunk
+
+Text is buffered only from the start of a shortcode (or HTML element) that is not complete yet, so memory
+is bounded by the largest single shortcode instead of the whole document. Spans that stay incomplete for
+longer than ``max_span`` characters are treated as literal text.
+
+Byte buffers (e.g. memory-mapped files) are parsed in place instead: only shortcode spans are decoded.
+"""
+import codecs
+import re
+from functools import lru_cache
+from typing import BinaryIO, Callable, Iterable, Iterator, TextIO, Tuple, Union
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_SPAN = 1024 * 1024
+
+# shortcode opening up to the end of its longest possible name
+_re_shortcode_head = re.compile(r"\[%\s*(?:(?!%\]|\[%)\S)*")
+
+# characters matched by \s in str patterns
+_UNICODE_WHITESPACE = (
+    "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009"
+    "\u200a\u2028\u2029\u202f\u205f\u3000"
+)
+# any single well-formed UTF-8 encoded character
+_UTF8_CHARACTER = rb"(?:[\x00-\x7f]|[\xc2-\xdf][\x80-\xbf]|[\xe0-\xef][\x80-\xbf]{2}|[\xf0-\xf4][\x80-\xbf]{3})"
+
+
+def iter_chunks(source: Union[TextIO, Iterable[str], str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """iterate over text chunks of a file-like object, an iterable of strings or a single string"""
+    if isinstance(source, str):
+        yield source
+    elif hasattr(source, "read"):
+        yield from iter(lambda: source.read(chunk_size), "")
+    else:
+        yield from source
+
+
+def _with_final(chunks: Iterable[str]) -> Iterator[Tuple[str, bool]]:
+    """pair every chunk with a flag of whether it is the last one"""
+    previous = None
+    for chunk in chunks:
+        if previous is not None:
+            yield previous, False
+        previous = chunk
+    yield previous or "", True
+
+
+def parse_chunks(
+    chunks: Iterable[str],
+    pattern: re.Pattern,
+    render: Callable[[re.Match], str],
+    max_span: int = DEFAULT_MAX_SPAN,
+) -> Iterator[str]:
+    """
+    Replace shortcode ``pattern`` matches in text chunks with ``render`` results
+
+    Produces the same output as ``pattern.sub(render, "".join(chunks))`` unless a shortcode opening
+    is left unterminated for more than ``max_span`` characters.
+    """
+    pending = ""
+    for chunk, final in _with_final(chunks):
+        buffer = pending + chunk
+        pieces = []
+        pos = 0
+        while True:
+            start = buffer.find("[%", pos)
+            if start == -1:
+                cut = len(buffer) - 1 if not final and buffer.endswith("[") else len(buffer)
+                pieces.append(buffer[pos:cut])
+                break
+            waiting = not final and len(buffer) - start <= max_span
+            match = pattern.match(buffer, start)
+            if waiting and (match is None or match.end(1) != _re_shortcode_head.match(buffer, start).end()):
+                # the match could still change with more text: the name could grow with the next chunk or
+                # a longer name candidate (tried first by the regex) could still find its closing marker
+                pieces.append(buffer[pos:start])
+                cut = start
+                break
+            if match is None:
+                pieces.append(buffer[pos : start + 1])
+                pos = start + 1
+                continue
+            pieces.append(buffer[pos:start])
+            pieces.append(render(match))
+            pos = match.end()
+        pending = buffer[cut:]
+        output = "".join(pieces)
+        if output:
+            yield output
+
+
+def reverse_chunks(
+    chunks: Iterable[str],
+    pattern: re.Pattern,
+    reverse: Callable[[str], str],
+    max_span: int = DEFAULT_MAX_SPAN,
+) -> Iterator[str]:
+    """
+    Reverse text chunks in segments that never split a ``pattern`` match
+
+    Every segment is passed to ``reverse`` whole; text from the first element that might still be
+    completed by the next chunk is held back.
+    """
+    pending = ""
+    for chunk, final in _with_final(chunks):
+        buffer = pending + chunk
+        cut = len(buffer)
+        if not final:
+            pos = 0
+            match = pattern.search(buffer)
+            while match:
+                pos = match.end()
+                match = pattern.search(buffer, pos)
+            candidate = buffer.find("<", pos)
+            while candidate != -1:
+                # closing tags can never start an element
+                if not buffer.startswith("</", candidate) and len(buffer) - candidate <= max_span:
+                    cut = candidate
+                    break
+                candidate = buffer.find("<", candidate + 1)
+        segment, pending = buffer[:cut], buffer[cut:]
+        if segment:
+            yield reverse(segment)
+
+
+def check_buffer_encoding(encoding: str):
+    """
+    Shortcode markers can only be searched for in encoded bytes when no character's encoding contains their
+    bytes, which holds for UTF-8 and single-byte ASCII-compatible encodings (latin-1, cp1252, ...)
+
+    Raises
+    ------
+    ValueError
+        raised for any other encoding, e.g. UTF-16 or Shift JIS
+    """
+    name = codecs.lookup(encoding).name
+    if name == "utf-8":
+        return
+    ascii_compatible = bytes(range(128)).decode(encoding, "replace") == "".join(map(chr, range(128)))
+    if not ascii_compatible or len(bytes(range(256)).decode(encoding, "replace")) != 256:
+        raise ValueError(f"{encoding} is not supported for byte buffers, use UTF-8 or a single-byte ASCII encoding")
+
+
+@lru_cache(maxsize=32)
+def bytes_pattern(pattern: re.Pattern, encoding: str = "utf-8") -> re.Pattern:
+    """
+    Bytes version of a str pattern matching encoded text like the str pattern matches decoded text:
+    ``\\s``, ``\\S`` and ``.`` outside of character classes are translated to whole characters of the encoding
+    so matches never end inside a multi-byte character; everything else keeps ASCII semantics.
+    """
+    check_buffer_encoding(encoding)
+    whitespace = []
+    for character in _UNICODE_WHITESPACE:
+        try:
+            whitespace.append(character.encode(encoding))
+        except UnicodeEncodeError:
+            pass
+    if codecs.lookup(encoding).name == "utf-8":
+        space = b"(?:" + b"|".join(re.escape(encoded) for encoded in whitespace) + b")"
+        nonspace = b"(?:(?!" + space + b")" + _UTF8_CHARACTER + b")"
+        dot = _UTF8_CHARACTER if pattern.flags & re.DOTALL else b"(?:(?!\n)" + _UTF8_CHARACTER + b")"
+    else:
+        class_ = b"".join(re.escape(encoded) for encoded in whitespace)
+        space, nonspace, dot = b"[" + class_ + b"]", b"[^" + class_ + b"]", b"."
+
+    source = pattern.pattern
+    translated = []
+    class_start = None
+    i = 0
+    while i < len(source):
+        character = source[i]
+        if character == "\\":
+            token = source[i : i + 2]
+            i += 2
+            if class_start is None and token in ("\\s", "\\S"):
+                translated.append(space if token == "\\s" else nonspace)
+            else:
+                translated.append(token.encode(encoding))
+            continue
+        if class_start is None:
+            if character == "[":
+                class_start = i
+            translated.append(dot if character == "." and class_start is None else character.encode(encoding))
+        else:
+            # "]" right after "[" or "[^" is a literal
+            if character == "]" and i > class_start + 1 and source[class_start + 1 : i] != "^":
+                class_start = None
+            translated.append(character.encode(encoding))
+        i += 1
+    return re.compile(b"".join(translated), pattern.flags & ~re.UNICODE)
+
+
+def parse_buffer(
+    buffer,
+    pattern: re.Pattern,
+    render: Callable[[re.Match], str],
+    writer: BinaryIO,
+    encoding: str = "utf-8",
+) -> int:
+    """
+    Write ``buffer`` to ``writer`` with bytes ``pattern`` matches replaced by encoded ``render`` results
+
+    Literal regions are written as slices of the buffer without being decoded or copied to intermediate
+    objects. Returns number of bytes written.
+    """
+    written = 0
+    pos = 0
+    with memoryview(buffer) as view:
+        for match in pattern.finditer(buffer):
+            start, end = match.span()
+            if start > pos:
+                writer.write(view[pos:start])
+                written += start - pos
+            output = render(match).encode(encoding)
+            writer.write(output)
+            written += len(output)
+            pos = end
+        if pos < len(view):
+            writer.write(view[pos:])
+            written += len(view) - pos
+    return written
@@ -0,0 +1,107 @@
+"""
+Contains format string templates compiled once into literal segments and field slots
+"""
+import re
+from functools import lru_cache
+from html import escape as html_escape
+from string import Formatter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from shortcoder.exceptions import InvalidTemplate
+
+_formatter = Formatter()
+_re_field_root = re.compile(r"[^.\[]*")
+
+
+class Template:
+    """
+    Format string template
+
+    Renders exactly like ``source.format(**values)``, but the format string is parsed once: rendering fills
+    field slots of a precomputed segment list and joins it. When ``fields`` are given every placeholder has to
+    refer to one of them. Values of fields listed in ``escape`` are HTML-escaped after formatting.
+    Templates are callable like ``str.format`` so they can be used anywhere a template callable is expected.
+    Templates are immutable: ``shared`` returns one instance for equal definitions, e.g. of many registries.
+    """
+
+    __slots__ = ("source", "escape", "fields", "_segments", "_slots")
+
+    def __init__(self, source: str, fields: Optional[Iterable[str]] = None, escape: Iterable[str] = ()) -> None:
+        self.source = source
+        self.escape = frozenset(escape)
+        allowed = frozenset(fields) if fields is not None else None
+        used = set()
+        segments = []
+        # (segment index, name of plain field or None, field, conversion, spec, escaped)
+        slots = []
+        for literal, field, spec, conversion in self._parse(source):
+            if literal:
+                segments.append(literal)
+            if field is None:
+                continue
+            root = self._check_field(field, allowed)
+            used.add(root)
+            for _, nested, _, _ in self._parse(spec):
+                if nested is not None:
+                    used.add(self._check_field(nested, allowed))
+            plain = root if field == root and not spec and not conversion else None
+            slots.append((len(segments), plain, field, conversion, spec, root in self.escape))
+            segments.append(None)
+        unknown = self.escape - used
+        if unknown:
+            raise InvalidTemplate(f"escaped fields {sorted(unknown)} are not used in template {source!r}")
+        self.fields = frozenset(used)
+        self._segments: Tuple[Optional[str], ...] = tuple(segments)
+        self._slots: Tuple[Tuple[int, Optional[str], str, Optional[str], str, bool], ...] = tuple(slots)
+
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def shared(cls, source: str, fields: Optional[Tuple[str, ...]] = None, escape: Tuple[str, ...] = ()) -> "Template":
+        """template compiled once per distinct definition"""
+        return cls(source, fields=fields, escape=escape)
+
+    def _parse(self, source: str) -> List[Tuple[str, Optional[str], Optional[str], Optional[str]]]:
+        try:
+            return list(_formatter.parse(source))
+        except ValueError as e:
+            raise InvalidTemplate(f"invalid template {self.source!r}: {e}")
+
+    def _check_field(self, field: str, allowed: Optional[frozenset]) -> str:
+        """validate placeholder and return the name it refers to"""
+        root = _re_field_root.match(field).group()
+        if not root or root.isdigit():
+            raise InvalidTemplate(f"positional placeholder {{{field}}} in template {self.source!r}; use input names")
+        if allowed is not None and root not in allowed:
+            raise InvalidTemplate(
+                f"unknown placeholder {{{field}}} in template {self.source!r}; expected one of {sorted(allowed)}"
+            )
+        return root
+
+    def render(self, values: Dict[str, Any]) -> str:
+        parts = list(self._segments)
+        for index, name, field, conversion, spec, escaped in self._slots:
+            if name is not None:
+                value = values[name]
+                if value.__class__ is not str:
+                    value = format(value)
+            else:
+                obj, _ = _formatter.get_field(field, (), values)
+                obj = _formatter.convert_field(obj, conversion)
+                if "{" in spec:
+                    spec = _formatter.vformat(spec, (), values)
+                value = _formatter.format_field(obj, spec)
+            parts[index] = html_escape(value) if escaped else value
+        return "".join(parts)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __call__(self, **values: Any) -> str:
+        return self.render(values)
+
+    def __repr__(self) -> str:
+        return f"Template({self.source!r})"
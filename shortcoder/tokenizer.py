@@ -0,0 +1,67 @@
+"""
+Contains shortcode argument tokenizer
+"""
+import re
+from typing import List
+
+_re_whitespace = re.compile(r"[ \t\r\n]+")
+_re_unquoted = re.compile(r"[^ \t\r\n'\"\\]+")
+_re_needs_lexing = re.compile(r"['\"\\]")
+_re_piece = re.compile(
+    r"""
+    ([^ \t\r\n'"\\]+)           # unquoted run
+    |'([^']*)'                  # single quoted, no escapes
+    |"((?:[^"\\]|\\.)*)"        # double quoted, backslash escapes \\ and \"
+    |\\(.)                      # escaped character
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_re_dquote_escape = re.compile(r"\\([\\\"])")
+_re_dquote_body = re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL)
+
+
+def split_args(text: str) -> List[str]:
+    """
+    Split shortcode arguments into tokens
+
+    Drop-in replacement for ``shlex.split`` that follows the same POSIX quoting rules
+    but is implemented with precompiled regexes instead of a character-at-a-time lexer.
+
+    Raises
+    ------
+    ValueError
+        raised on unbalanced quotes ("No closing quotation") or a trailing backslash ("No escaped character")
+    """
+    if not _re_needs_lexing.search(text):
+        return _re_unquoted.findall(text)
+    tokens = []
+    pos = 0
+    end = len(text)
+    match_piece = _re_piece.match
+    while pos < end:
+        space = _re_whitespace.match(text, pos)
+        if space:
+            pos = space.end()
+            continue
+        parts = []
+        while pos < end:
+            piece = match_piece(text, pos)
+            if piece is None:
+                char = text[pos]
+                if char in " \t\r\n":
+                    break
+                if char == "\\" or (char == '"' and _re_dquote_body.match(text, pos + 1).end() < end):
+                    raise ValueError("No escaped character")
+                raise ValueError("No closing quotation")
+            unquoted, single, double, escaped = piece.groups()
+            if unquoted is not None:
+                parts.append(unquoted)
+            elif single is not None:
+                parts.append(single)
+            elif double is not None:
+                parts.append(_re_dquote_escape.sub(r"\1", double))
+            else:
+                parts.append(escaped)
+            pos = piece.end()
+        tokens.append("".join(parts))
+    return tokens
@@ -0,0 +1,127 @@
+"""
+Contains opt-in round-trip verification of parsed shortcodes
+
+A verified shortcode instance is reversed from its rendered output alone and the reversed shortcode is rendered
+again; the round trip is lossless when that gives the same output. Shortcodes are sampled per document, so
+production builds can verify a fraction of their shortcodes instead of reversing every document.
+"""
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from shortcoder.exceptions import RoundTripError
+
+
+class Mismatch(NamedTuple):
+    """Shortcode instance that did not survive ``reverse`` of its rendered output"""
+
+    name: str
+    # offsets of the shortcode, including the body of enclosing shortcodes, in the parsed text
+    start: int
+    end: int
+    line: int
+    column: int
+    source: str
+    output: str
+    # reverse of output; None when reversing failed
+    reversed: Optional[str]
+    # output of the reversed shortcode; None when it was not reversed to a shortcode or could not be rendered
+    rendered: Optional[str]
+    error: Optional[BaseException]
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            reason = f"failed with {self.error!r}"
+        elif self.rendered is None:
+            reason = f"reversed to {self.reversed!r}"
+        else:
+            reason = f"reversed to {self.reversed!r} rendering {self.rendered!r}"
+        return f"{self.name} shortcode {self.source!r} at line {self.line} column {self.column} {reason}"
+
+
+Callback = Callable[[Mismatch], None]
+
+
+class Verification:
+    """
+    Round-trip verification settings and results of a shortcode manager, see ``Shortcoder(verification=...)``
+
+    Shortcodes of every parsed document are sampled by ``rate``, the probability of each instance being
+    verified, ``per_document``, a number of instances verified in each document, and ``per_shortcode``, a number
+    of instances of each shortcode name verified in each document; an instance picked by any of them is
+    verified. Without any of them every instance is verified.
+
+    Mismatches are kept up to ``max_mismatches`` latest ones and passed to callbacks, e.g. to log them;
+    ``strict`` verification raises ``RoundTripError`` from ``parse`` for the first mismatch of a document.
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        per_document: int = 0,
+        per_shortcode: int = 0,
+        strict: bool = False,
+        callbacks: Iterable[Callback] = (),
+        max_mismatches: int = 1000,
+        seed: Optional[int] = None,
+    ) -> None:
+        if not 0 <= rate <= 1:
+            raise ValueError(f"verification rate has to be between 0 and 1, got {rate}")
+        if per_document < 0 or per_shortcode < 0:
+            raise ValueError(f"verification sample sizes can't be negative, got {per_document}, {per_shortcode}")
+        self.rate = rate
+        self.per_document = per_document
+        self.per_shortcode = per_shortcode
+        self.strict = strict
+        self.callbacks: List[Callback] = list(callbacks)
+        self.mismatches: Deque[Mismatch] = deque(maxlen=max_mismatches)
+        self.instances = 0
+        self.checked = 0
+        self.mismatched = 0
+        # imported here, verification is opt-in and plain ``import shortcoder`` does not pay for it
+        import random
+
+        self._random = random.Random(seed)
+
+    def add_callback(self, callback: Callback):
+        self.callbacks.append(callback)
+
+    def sample(self, names: Sequence[str]) -> List[int]:
+        """indexes of instances to verify, in source order, out of the shortcode names of a document"""
+        self.instances += len(names)
+        if not (self.rate or self.per_document or self.per_shortcode):
+            return list(range(len(names)))
+        rnd = self._random
+        selected = set()
+        if self.rate:
+            selected.update(index for index in range(len(names)) if rnd.random() < self.rate)
+        if self.per_document:
+            selected.update(rnd.sample(range(len(names)), min(self.per_document, len(names))))
+        if self.per_shortcode:
+            by_name: Dict[str, List[int]] = {}
+            for index, name in enumerate(names):
+                by_name.setdefault(name, []).append(index)
+            for indexes in by_name.values():
+                selected.update(rnd.sample(indexes, min(self.per_shortcode, len(indexes))))
+        return sorted(selected)
+
+    def record(self, mismatch: Optional[Mismatch]):
+        """record result of a single verified instance, None when it round-tripped"""
+        self.checked += 1
+        if mismatch is None:
+            return
+        self.mismatched += 1
+        self.mismatches.append(mismatch)
+        for callback in self.callbacks:
+            callback(mismatch)
+        if self.strict:
+            raise RoundTripError(str(mismatch), mismatch)
+
+    def stats(self) -> Dict[str, int]:
+        return {"instances": self.instances, "checked": self.checked, "mismatched": self.mismatched}
+
+    def reset(self):
+        self.mismatches.clear()
+        self.instances = self.checked = self.mismatched = 0
+
+    def __repr__(self) -> str:
+        return f"Verification({self.stats()})"
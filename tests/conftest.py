@@ -0,0 +1,14 @@
+import pytest
+from helpers import Link, make_html_shortcodes, make_link
+
+from shortcoder.shortcodes.html import HtmlPargShortcode
+
+
+@pytest.fixture
+def link() -> Link:
+    return make_link()
+
+
+@pytest.fixture
+def yt_shortcode() -> HtmlPargShortcode:
+    return make_html_shortcodes()[0]
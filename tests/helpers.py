@@ -0,0 +1,53 @@
+"""
+Shortcodes and registries shared by the tests
+"""
+from typing import Dict, List, Optional
+
+from shortcoder.manager import Shortcoder
+from shortcoder.shortcodes import PositionalShortcode
+from shortcoder.shortcodes.base import Input
+from shortcoder.shortcodes.html import HtmlKwargShortcode, HtmlPargShortcode
+
+
+class Link(PositionalShortcode):
+    """link shortcode counting its conversions; ``page`` of the context is rendered when given"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
+        self.calls += 1
+        page = f' data-page="{context["page"]}"' if context and "page" in context else ""
+        return '<a href="{url}"{page}>{text}</a>'.format(page=page, **kwargs)
+
+
+def make_link() -> Link:
+    return Link("link", inputs=[Input("url"), Input("text", default="link")])
+
+
+def make_html_shortcodes(backend: Optional[str] = None) -> List:
+    """new ``yt``, ``url`` and ``img`` HTML shortcodes"""
+    return [
+        HtmlPargShortcode(
+            "yt", inputs=[Input("id", xpath="@data-id")], template='<i data-id="{id}"></i>', backend=backend
+        ),
+        HtmlKwargShortcode(
+            "url",
+            inputs=[Input("href", xpath="@href"), Input("text", xpath="text()", default="foo")],
+            template='<a href="{href}">{text}</a>',
+            backend=backend,
+        ),
+        HtmlKwargShortcode(
+            "img",
+            inputs=[Input("src", xpath="@src"), Input("alt", xpath="@alt", default="")],
+            template='<img src="{src}" alt="{alt}">',
+            escape=["alt"],
+            backend=backend,
+        ),
+    ]
+
+
+def make_shortcoder(*shortcodes, backend: Optional[str] = None, **kwargs) -> Shortcoder:
+    """registry of new HTML shortcodes followed by ``shortcodes``"""
+    return Shortcoder(make_html_shortcodes(backend) + list(shortcodes), **kwargs)
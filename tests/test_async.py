@@ -0,0 +1,78 @@
+import asyncio
+from typing import Dict, Optional
+
+import pytest
+
+from shortcoder.exceptions import UnknownShortcode
+from shortcoder.instrument import Instrumentation
+from shortcoder.manager import Shortcoder
+from shortcoder.shortcodes import PositionalShortcode
+from shortcoder.shortcodes.base import Input
+
+
+class Sync(PositionalShortcode):
+    def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
+        return f"<sync {kwargs['value']}>"
+
+
+class Slow(PositionalShortcode):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.running = 0
+        self.peak = 0
+
+    async def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        # later shortcodes finish first so output order can not follow completion order
+        await asyncio.sleep(0.01 / (int(kwargs["value"]) + 1))
+        self.running -= 1
+        return f"<slow {kwargs['value']}>"
+
+
+class TestAparse:
+    def setup_method(self) -> None:
+        self.slow = Slow("slow", inputs=[Input("value")])
+        self.sh = Shortcoder([Sync("sync", inputs=[Input("value")]), self.slow])
+        self.text = " ".join(f"[%slow {i} %] [%sync {i} %]" for i in range(10))
+
+    def expected(self) -> str:
+        return " ".join(f"<slow {i}> <sync {i}>" for i in range(10))
+
+    def test_source_order(self):
+        assert asyncio.run(self.sh.aparse(self.text)) == self.expected()
+        assert self.slow.peak == 10
+
+    def test_concurrency_limit(self):
+        assert asyncio.run(self.sh.aparse(self.text, concurrency=3)) == self.expected()
+        assert self.slow.peak == 3
+
+    def test_sync_only(self):
+        text = "[%sync 1 %]"
+        assert asyncio.run(self.sh.aparse(text)) == self.sh.parse(text)
+
+    def test_unknown_shortcode(self):
+        with pytest.raises(UnknownShortcode):
+            asyncio.run(self.sh.aparse("[%slow 1 %] [%unknown %]"))
+
+    def test_enclosing(self):
+        class Box(PositionalShortcode):
+            enclosing = True
+
+            async def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
+                await asyncio.sleep(0)
+                return f"<box {kwargs['content']}>"
+
+        sh = Shortcoder([Sync("sync", inputs=[Input("value")]), self.slow, Box("box", inputs=[])])
+        text = "[%box%][%slow 1 %] [%box%][%slow 2 %][%sync 3 %][%/box%][%/box%] [%slow 4 %]"
+        expected = "<box <slow 1> <box <slow 2><sync 3>>> <slow 4>"
+        assert asyncio.run(sh.aparse(text)) == expected
+        assert asyncio.run(sh.aparse(text, concurrency=1)) == expected
+        assert self.slow.peak == 3
+
+    def test_cache_and_instrumentation(self):
+        sh = Shortcoder([self.slow], cache_size=10, instrumentation=Instrumentation())
+        assert asyncio.run(sh.aparse("[%slow 1 %]")) == "<slow 1>"
+        assert asyncio.run(sh.aparse("[%slow 1 %]")) == "<slow 1>"
+        assert sh.render_cache.stats()["hits"] == 1
+        assert sh.stats()["slow"]["render"]["count"] == 2
@@ -0,0 +1,126 @@
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from helpers import make_shortcoder
+
+from shortcoder.backends import LxmlBackend, ParserBackend, get_backend
+from shortcoder.exceptions import InvalidInput
+from shortcoder.manager import Shortcoder
+from shortcoder.shortcodes.base import Input
+from shortcoder.shortcodes.html import HtmlPargShortcode
+
+ROOT = Path(__file__).parents[1]
+
+MARKUP = [
+    '<a href="foo.jpg" class="shortcode-url">image</a>',
+    '<iframe src="https://example.com/embed/abc" allowfullscreen></iframe>',
+    "<p>one<p>two",
+    "<div><p>text<div>block</div></div>",
+    "<ul><li>one<li>two</ul>",
+    "<b>bold</b> tail",
+    "<br>",
+    '<img src="a b.png" alt="&quot;x&quot; &amp; y">',
+    "<div><script>if (a < b && c) {}</script></div>",
+    "<textarea>&lt;b&gt;</textarea>",
+    "<span>café &amp; &#8212;</span>",
+    "<p>x<!-- comment --></p>",
+    "text <i>only</i>",
+    '<a href="/path?q=é&amp;x=1">link</a>',
+]
+
+
+@pytest.mark.parametrize("markup", MARKUP)
+def test_parser_backend_matches_lxml(markup):
+    lxml, parser = LxmlBackend(), ParserBackend()
+    assert parser.tostring(parser.fragment(markup)) == lxml.tostring(lxml.fragment(markup))
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("@href", ["foo.jpg"]),
+        ("text()", ["link ", " tail"]),
+        ("./b/text()", ["bold"]),
+        ("b/@class", ["x"]),
+        ("*/text()", ["bold"]),
+        ("b", ["b"]),
+    ],
+)
+def test_parser_backend_xpath(expression, expected):
+    backend = ParserBackend()
+    element = backend.fragment('<a href="foo.jpg">link <b class="x">bold</b> tail</a>')
+    result = backend.xpath(expression)(element)
+    assert [getattr(item, "tag", item) for item in result] == expected
+
+
+@pytest.mark.parametrize("expression", ["//a", "@href | text()", "string(@href)", "a[1]", "../b", "text()/a"])
+def test_parser_backend_unsupported_xpath(expression):
+    backend = ParserBackend()
+    assert not backend.supports_xpath(expression)
+    with pytest.raises(ValueError):
+        backend.xpath(expression)
+    with pytest.raises(InvalidInput):
+        HtmlPargShortcode("a", [Input("href", xpath=expression)], '<a href="{href}"></a>', backend="html.parser")
+
+
+def test_get_backend():
+    assert get_backend("html.parser") is get_backend("html.parser")
+    assert isinstance(get_backend("html.parser"), ParserBackend)
+    assert isinstance(get_backend(), LxmlBackend)
+    backend = ParserBackend()
+    assert get_backend(backend) is backend
+    with pytest.raises(ValueError):
+        get_backend("html5lib")
+
+
+def test_backend_pickled_by_name():
+    assert pickle.loads(pickle.dumps(get_backend("html.parser"))) is get_backend("html.parser")
+    shortcode = HtmlPargShortcode("b", [Input("text", xpath="text()")], "<b>{text}</b>", backend="html.parser")
+    assert pickle.loads(pickle.dumps(shortcode)).backend is get_backend("html.parser")
+
+
+def make_embed(backend):
+    return HtmlPargShortcode(
+        "embed",
+        inputs=[Input("id", xpath="@data-id")],
+        template='<iframe data-id="{id}" src="https://youtube.com/embed/{id}" allowfullscreen></iframe>',
+        backend=backend,
+    )
+
+
+@pytest.mark.parametrize("document", [False, True])
+@pytest.mark.parametrize("backend", ["lxml", "html.parser"])
+def test_round_trip(backend, document):
+    sh = make_shortcoder(make_embed(backend), backend=backend)
+    source = 'see [%url href=foo.jpg text="my image" %] and\n[%embed dQw4w9WgXcQ %] [%yt x %] <b>done</b>'
+    if document:
+        source = f"<p>{source}</p>"
+    rendered = sh.parse(source)
+    assert rendered == make_shortcoder(make_embed("lxml")).parse(source)
+    assert sh.reverse(rendered, document=document) == source
+
+
+def test_mixed_backends():
+    sh = Shortcoder(
+        [
+            HtmlPargShortcode("b", [Input("text", xpath="text()")], "<b>{text}</b>", backend="lxml"),
+            HtmlPargShortcode("i", [Input("text", xpath="text()")], "<i>{text}</i>", backend="html.parser"),
+        ]
+    )
+    source = "[%b bold %] and [%i italic %]"
+    assert sh.reverse(sh.parse(source)) == source
+
+
+def test_parser_backend_without_lxml():
+    code = (
+        "import sys\n"
+        "sys.modules['lxml'] = None\n"
+        "from shortcoder import Shortcoder, HtmlPargShortcode, Input\n"
+        "sh = Shortcoder([HtmlPargShortcode('b', [Input('text', xpath='text()')], '<b>{text}</b>')])\n"
+        "assert sh.shortcodes['b'].backend.name == 'html.parser'\n"
+        "assert sh.reverse(sh.parse('x [%b hi %] y'), document=True) == 'x [%b hi %] y'\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT)
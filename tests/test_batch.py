@@ -0,0 +1,44 @@
+import pickle
+from pathlib import Path
+
+import pytest
+from helpers import make_link, make_shortcoder
+
+from shortcoder.exceptions import UnknownShortcode
+
+
+def test_pickle_round_trip():
+    sh = make_shortcoder(make_link())
+    restored = pickle.loads(pickle.dumps(sh))
+    text = "[%link one two %] [%yt abc %]"
+    assert restored.parse(text) == sh.parse(text)
+    restored = pickle.loads(pickle.dumps(make_shortcoder()))
+    assert restored.reverse(sh.parse("[%yt abc %]")) == "[%yt abc %]"
+
+
+@pytest.mark.parametrize("executor, workers", [("thread", 2), ("process", 2), ("thread", 0)])
+@pytest.mark.parametrize("ordered", [True, False])
+def test_parse_many(executor, workers, ordered):
+    sh = make_shortcoder(make_link())
+    documents = [f"[%link url{i} %]" for i in range(20)] + ["[%unknown x %]"]
+    results = list(sh.parse_many(documents, workers=workers, executor=executor, chunksize=3, ordered=ordered))
+    assert len(results) == 21
+    if ordered:
+        assert [result.index for result in results] == list(range(21))
+    results.sort(key=lambda result: result.index)
+    assert [result.output for result in results[:20]] == [f'<a href="url{i}">link</a>' for i in range(20)]
+    assert not results[20].ok
+    assert isinstance(results[20].error, UnknownShortcode)
+
+
+def test_paths(tmp_path: Path):
+    sh = make_shortcoder()
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.html"
+        path.write_text(sh.parse(f"[%yt id{i} %]"))
+        paths.append(path)
+    results = list(sh.reverse_many(paths, workers=2, executor="process"))
+    assert [result.path for result in results] == paths
+    assert [result.output for result in results] == [f"[%yt id{i} %]" for i in range(3)]
+    assert not list(sh.reverse_many([tmp_path / "missing.html"], workers=0))[0].ok
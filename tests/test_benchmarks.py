@@ -0,0 +1,39 @@
+import json
+
+from benchmarks import run
+
+
+def result(shortcodes_per_s):
+    return {"seconds": 1 / shortcodes_per_s, "mb_per_s": 1.0, "shortcodes_per_s": shortcodes_per_s}
+
+
+BASELINE = {
+    "python": "3.11.0",
+    "results": {
+        "10k-d0.01-r2": {"parse": result(1000), "reverse": result(1000), "convert": result(1000)},
+        "200k-d0.1-r40": {"parse": result(1000)},
+    },
+}
+
+
+def test_compare():
+    results = {"10k-d0.01-r2": {"parse": result(500), "reverse": result(850), "convert": result(2000)}}
+    # slowdowns past the threshold are reported, cases missing from the results are not
+    assert run.compare(results, BASELINE, threshold=0.2) == ["10k-d0.01-r2 parse: 50% of baseline"]
+    assert run.compare(results, BASELINE, threshold=0.1) == [
+        "10k-d0.01-r2 parse: 50% of baseline",
+        "10k-d0.01-r2 reverse: 85% of baseline",
+    ]
+    # operations without shortcodes have no rate to compare
+    empty = {"seconds": 0.001, "mb_per_s": 1.0, "shortcodes_per_s": 0}
+    assert run.compare(results, {"results": {"10k-d0.01-r2": {"parse": empty}}}, threshold=0.2) == []
+
+
+def test_main_compare(tmp_path, monkeypatch, capsys):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(BASELINE))
+    monkeypatch.setattr(run, "run", lambda quick, repeat: {"200k-d0.1-r40": {"parse": result(700)}})
+    assert run.main(["--compare", str(baseline)]) == 1
+    assert capsys.readouterr().err == "regression: 200k-d0.1-r40 parse: 70% of baseline\n"
+    monkeypatch.setattr(run, "run", lambda quick, repeat: {"200k-d0.1-r40": {"parse": result(900)}})
+    assert run.main(["--compare", str(baseline)]) == 0
@@ -0,0 +1,47 @@
+import pytest
+
+from shortcoder.binders import KeywordBinder, PositionalBinder
+from shortcoder.exceptions import ExtraParameters, InvalidKeywords
+from shortcoder.shortcodes import KeywordShortcode, PositionalShortcode
+from shortcoder.shortcodes.base import Input
+
+
+class TestPositionalBinder:
+    def setup_method(self) -> None:
+        shortcode = PositionalShortcode("link", inputs=[Input("url"), Input("text", default="link")])
+        self.binder = shortcode.make_binder()
+
+    def test_type(self):
+        assert isinstance(self.binder, PositionalBinder)
+
+    def test_bind(self):
+        assert self.binder(["one", "two"]) == {"url": "one", "text": "two"}
+
+    def test_defaults(self):
+        assert self.binder(["one"]) == {"url": "one", "text": "link"}
+        # defaults are not shared between calls
+        self.binder(["one"])["text"] = "changed"
+        assert self.binder(["one"]) == {"url": "one", "text": "link"}
+
+    def test_extra_parameters(self):
+        with pytest.raises(ExtraParameters, match="shortcode link got 3 parameters when 2 expected"):
+            self.binder(["one", "two", "three"])
+
+
+class TestKeywordBinder:
+    def setup_method(self) -> None:
+        shortcode = KeywordShortcode("link", inputs=[Input("url"), Input("text", default="link")])
+        self.binder = shortcode.make_binder()
+
+    def test_type(self):
+        assert isinstance(self.binder, KeywordBinder)
+
+    def test_bind(self):
+        assert self.binder(["text=two", "url=one=1"]) == {"url": "one=1", "text": "two"}
+
+    def test_defaults(self):
+        assert self.binder(["url=one"]) == {"url": "one", "text": "link"}
+
+    def test_unknown_keys(self):
+        with pytest.raises(InvalidKeywords, match=r"shortcode link got unknown keys \['src'\]"):
+            self.binder(["url=one", "src=two"])
@@ -0,0 +1,72 @@
+import pytest
+from helpers import Link, make_link
+
+from shortcoder.cache import RenderCache, fingerprint
+from shortcoder.manager import Shortcoder
+from shortcoder.shortcodes.base import Input
+
+
+def test_fingerprint():
+    assert fingerprint({"a": [1, {"b": {2}}]}) == fingerprint({"a": [1, {"b": {2}}]})
+    assert fingerprint({"a": 1, "b": 2}) == fingerprint({"b": 2, "a": 1})
+    # equal values of different types render differently
+    assert len({fingerprint(value) for value in (True, 1, 1.0, [1], (1,), {1}, frozenset([1]), 0.0, -0.0)}) == 9
+    assert fingerprint(float("nan")) == fingerprint(float("nan"))
+    with pytest.raises(TypeError):
+        fingerprint({"a": bytearray()})
+
+
+def test_lru_eviction():
+    cache = RenderCache(2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 1, "size": 2, "maxsize": 2}
+
+
+class TestShortcoderCache:
+    def setup_method(self) -> None:
+        self.link = make_link()
+        self.sh = Shortcoder([self.link], cache_size=16)
+
+    def test_hits(self):
+        text = "[%link one %] [%link one link %] [%link 'one' \"link\" %]"
+        assert self.sh.parse(text) == '<a href="one">link</a> <a href="one">link</a> <a href="one">link</a>'
+        assert self.link.calls == 1
+        assert self.sh.render_cache.stats()["hits"] == 2
+
+    def test_context_in_key(self):
+        self.sh.parse("[%link one %]", context={"page": 1})
+        self.sh.parse("[%link one %]", context={"page": 2})
+        self.sh.parse("[%link one %]", context={"page": 1})
+        assert self.link.calls == 2
+
+    def test_context_types_in_key(self):
+        contexts = [{"page": True}, {"page": 1}, {"page": 1.0}, {"page": [1]}, {"page": (1,)}]
+        for context in contexts * 2:
+            expected = f'<a href="one" data-page="{context["page"]}">link</a>'
+            assert self.sh.parse("[%link one %]", context=context) == expected
+        assert self.link.calls == len(contexts)
+
+    def test_list_default(self):
+        link = Link("link", inputs=[Input("url"), Input("text", default=["link"])])
+        sh = Shortcoder([link], cache_size=16)
+        assert sh.parse("[%link one %] [%link one %]") == """<a href="one">['link']</a> <a href="one">['link']</a>"""
+        assert link.calls == 1
+
+    def test_unhashable_context(self):
+        self.sh.parse("[%link one %]", context={"page": bytearray()})
+        self.sh.parse("[%link one %]", context={"page": bytearray()})
+        assert self.link.calls == 2
+        assert len(self.sh.render_cache) == 0
+
+    def test_not_cacheable(self):
+        self.link.cacheable = False
+        self.sh.parse("[%link one %] [%link one %]")
+        assert self.link.calls == 2
+
+
+def test_disabled_by_default():
+    assert Shortcoder().render_cache is None
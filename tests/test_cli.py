@@ -0,0 +1,112 @@
+from pathlib import Path
+
+import pytest
+
+from shortcoder.cli import MANIFEST_NAME, load_module, load_registry, main, pool_executor
+
+REGISTRY = """
+from shortcoder import Shortcoder, HtmlPargShortcode, Input
+
+sh = Shortcoder([HtmlPargShortcode("yt", inputs=[Input("id", xpath="@data-id")], template='{template}')])
+"""
+
+
+@pytest.fixture
+def site(tmp_path: Path):
+    registry = tmp_path / "registry.py"
+    registry.write_text(REGISTRY.format(template='<i data-id="{id}"></i>'))
+    source = tmp_path / "content"
+    (source / "posts").mkdir(parents=True)
+    (source / "index.md").write_text("home [%yt abc %]")
+    (source / "posts" / "one.md").write_text("one [%yt def %]")
+    return registry, source, tmp_path / "build"
+
+
+def run(registry, source, output, *args):
+    return main(["parse", str(source), str(output), "--registry", f"{registry}:sh", *args])
+
+
+def test_load_registry(site):
+    registry, _, _ = site
+    sh, module = load_registry(str(registry))
+    assert sh is module.sh
+    sh, module = load_registry(f"{registry}:sh")
+    assert sh is module.sh
+    assert list(sh.shortcodes) == ["yt"]
+
+
+def test_build(site, capsys):
+    registry, source, output = site
+    assert run(registry, source, output) == 0
+    assert (output / "index.md").read_text() == 'home <i data-id="abc" class="shortcode-yt"></i>'
+    assert (output / "posts" / "one.md").read_text() == 'one <i data-id="def" class="shortcode-yt"></i>'
+    assert (output / MANIFEST_NAME).exists()
+    assert "2 converted, 0 unchanged, 0 failed" in capsys.readouterr().err
+
+
+def test_incremental(site, capsys):
+    registry, source, output = site
+    run(registry, source, output)
+    (source / "index.md").write_text("home [%yt xyz %]")
+    capsys.readouterr()
+    assert run(registry, source, output, "--jobs", "2") == 0
+    assert "1 converted, 1 unchanged, 0 failed" in capsys.readouterr().err
+    assert (output / "index.md").read_text() == 'home <i data-id="xyz" class="shortcode-yt"></i>'
+
+    # registry change invalidates everything
+    registry.write_text(REGISTRY.format(template='<b data-id="{id}"></b>'))
+    assert run(registry, source, output) == 0
+    assert "2 converted, 0 unchanged, 0 failed" in capsys.readouterr().err
+
+
+def test_failures(site, capsys):
+    registry, source, output = site
+    (source / "bad.md").write_text("[%unknown x %]")
+    assert run(registry, source, output) == 1
+    assert "bad.md: UnknownShortcode" in capsys.readouterr().err
+    # failed files are retried on the next run
+    run(registry, source, output)
+    assert "0 converted, 2 unchanged, 1 failed" in capsys.readouterr().err
+
+
+def test_binary_files_copied(site, capsys):
+    registry, source, output = site
+    image = b"\x89PNG\r\n\x1a\n\x00\xff"
+    (source / "logo.png").write_bytes(image)
+    assert run(registry, source, output) == 0
+    assert (output / "logo.png").read_bytes() == image
+    assert "2 converted, 0 unchanged, 0 failed, 1 copied" in capsys.readouterr().err
+    run(registry, source, output)
+    assert "0 converted, 3 unchanged, 0 failed, 0 copied" in capsys.readouterr().err
+
+
+def test_output_inside_source(site, capsys):
+    registry, source, _ = site
+    output = source / "build"
+    assert run(registry, source, output) == 0
+    assert run(registry, source, output, "--force") == 0
+    assert "2 converted, 0 unchanged, 0 failed" in capsys.readouterr().err.splitlines()[-1]
+    assert not (output / "build").exists()
+
+
+def test_pool_executor(site, monkeypatch):
+    import multiprocessing
+
+    registry, _, _ = site
+    _, module = load_registry(str(registry))
+    monkeypatch.setattr(multiprocessing, "get_start_method", lambda: "spawn")
+    # spawned workers can't import a registry loaded from a file path
+    assert pool_executor(module) == "thread"
+    assert pool_executor(load_module("shortcoder.cli")) == "process"
+    monkeypatch.setattr(multiprocessing, "get_start_method", lambda: "fork")
+    assert pool_executor(module) == "process"
+
+
+def test_load_registry_snapshot(site, tmp_path):
+    registry, _, _ = site
+    sh, _ = load_registry(str(registry))
+    path = tmp_path / "registry.snapshot"
+    sh.snapshot(path)
+    restored, module = load_registry(str(path))
+    assert module is None
+    assert restored.parse("[%yt abc %]") == sh.parse("[%yt abc %]")
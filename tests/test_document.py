@@ -0,0 +1,146 @@
+from typing import Dict, Optional
+
+import pytest
+from helpers import make_link
+
+from shortcoder.document import Marker, Node
+from shortcoder.exceptions import ExtraParameters, UnknownShortcode
+from shortcoder.manager import Shortcoder
+from shortcoder.shortcodes import KeywordShortcode
+from shortcoder.shortcodes.base import Input
+
+
+class TestDocument:
+    def setup_method(self) -> None:
+        self.sh = Shortcoder([make_link()])
+        self.text = "start [%link one two %] middle [%link 'three four'%] end"
+        self.doc = self.sh.tokenize(self.text)
+
+    def test_tokens(self):
+        tokens = self.doc.tokens
+        assert [type(token) for token in tokens] == [tuple, Node, tuple, Node, tuple]
+        assert tokens[0] == (0, 6)
+        assert tokens[1].args == ["one", "two"]
+        assert self.doc.source(tokens[1]) == "[%link one two %]"
+        assert tokens[3].args == ["three four"]
+
+    def test_render_matches_parse(self):
+        for context in ({"page": 1}, {"page": 2}):
+            assert self.doc.render(context) == self.sh.parse(self.text, context)
+
+    def test_find(self):
+        assert [node.start for node in self.doc.find("link")] == [6, 31]
+        assert self.doc.find("unknown") == []
+
+    def test_validate(self):
+        doc = self.sh.tokenize("[%link one two three %] [%link ok %] [%unknown x %]")
+        errors = doc.validate()
+        assert [node.start for node, _ in errors] == [0, 37]
+        assert isinstance(errors[0][1], ExtraParameters)
+        assert isinstance(errors[1][1], UnknownShortcode)
+        with pytest.raises(ExtraParameters):
+            doc.render()
+
+    def test_no_shortcodes(self):
+        doc = self.sh.tokenize("plain text")
+        assert doc.tokens == [(0, 10)]
+        assert doc.render() == "plain text"
+
+    def test_interned_names(self):
+        first, second = self.doc.nodes
+        assert first.name is second.name
+
+
+class TestMarkers:
+    def setup_method(self) -> None:
+        self.sh = Shortcoder([make_link()])
+        self.text = "start [%link one two %] middle [% link 'three four'%] [% end"
+        self.markers = self.sh.scan(self.text)
+
+    def test_matches_find_shortcodes(self):
+        assert [(marker.name, marker.args) for marker in self.markers] == self.sh.find_shortcodes(self.text)
+
+    def test_marker(self):
+        assert len(self.markers) == 2
+        assert self.markers[1] == Marker("link", " 'three four'", 31, 53)
+        assert self.markers[-1] == self.markers[1]
+        assert self.markers[:1] == [Marker("link", " one two ", 6, 23)]
+        assert self.markers.span(1) == (31, 53)
+        with pytest.raises(IndexError):
+            self.markers[2]
+
+    def test_offsets_only(self):
+        # six offsets per marker and no substring copies
+        assert len(self.markers.offsets) == 12
+        assert not hasattr(self.markers, "__dict__")
+
+
+class Counting(KeywordShortcode):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
+        self.calls += 1
+        return f"<{kwargs['id']}>"
+
+
+class TestIncrementalDocument:
+    def setup_method(self) -> None:
+        self.shortcode = Counting("c", inputs=[Input("id", default="")])
+        self.sh = Shortcoder([self.shortcode])
+        self.text = " text ".join(f"[%c id={i} %]" for i in range(1000))
+        self.doc = self.sh.incremental(self.text)
+
+    def edit(self, offset: int, deleted: int, inserted: str):
+        previous = self.doc.output
+        self.shortcode.calls = 0
+        change = self.doc.edit(offset, deleted, inserted)
+        self.calls = self.shortcode.calls
+        self.text = self.text[:offset] + inserted + self.text[offset + deleted :]
+        # unlike parse, documents keep unterminated markers as literal text
+        assert self.doc.output == self.sh.tokenize(self.text).render()
+        assert previous[: change.start] + change.text + previous[change.end :] == self.doc.output
+        return change
+
+    def test_initial_output(self):
+        assert self.doc.output == self.sh.parse(self.text)
+
+    def test_edit_renders_only_affected_shortcode(self):
+        offset = self.text.index("id=500") + 3
+        change = self.edit(offset, 3, "x")
+        assert self.calls == 1
+        assert change.text == " text <x> text "
+
+    def test_edit_literal_renders_nothing(self):
+        change = self.edit(self.text.index(" text ") + 1, 4, "word")
+        assert self.calls == 0
+        assert change.text == " word "
+
+    def test_edit_creates_and_removes_shortcodes(self):
+        self.edit(0, 0, "[%c id=new %]")
+        self.edit(len(self.text), 0, " [%c id=")
+        self.edit(len(self.text), 0, "end %]")
+        start = self.text.index("[%c id=10 %]")
+        self.edit(start, len("[%c id=10 %]"), "")
+        assert "<10>" not in self.doc.output
+
+    def test_edit_merging_shortcodes(self):
+        # removing markers between two shortcodes joins them into one
+        start = self.text.index("%] text [%c id=4")
+        change = self.edit(start, len("%] text [%c "), "")
+        assert self.calls == 1
+        assert change.text == " text <4> text "
+
+    def test_edit_keeps_later_blocks(self):
+        blocks = list(self.doc._blocks)
+        offsets = [(node.start, node.end) for node in blocks[-1].nodes]
+        self.edit(1, 0, "x")
+        # blocks after the edit are neither rebuilt nor shifted
+        assert self.doc._blocks[-1] is blocks[-1]
+        assert [(node.start, node.end) for node in blocks[-1].nodes] == offsets
+        assert len(self.doc._blocks) == len(blocks)
+
+    def test_out_of_bounds(self):
+        with pytest.raises(ValueError):
+            self.doc.edit(len(self.text), 1, "")
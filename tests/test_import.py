@@ -0,0 +1,40 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parents[1]
+
+
+def loaded_modules(statement: str):
+    """modules loaded in a fresh interpreter after running statement"""
+    code = f"import sys\n{statement}\nprint(' '.join(sys.modules))"
+    process = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)
+    return set(process.stdout.split())
+
+
+@pytest.mark.parametrize("module", ["lxml", "lxml.html", "asyncio", "concurrent.futures", "inspect", "pickle"])
+def test_import_is_light(module):
+    assert module not in loaded_modules("import shortcoder")
+
+
+def test_parse_is_light():
+    modules = loaded_modules(
+        "from shortcoder import Shortcoder, PositionalShortcode, Input\n"
+        "class Bold(PositionalShortcode):\n"
+        "    def convert(self, kwargs, context):\n"
+        "        return f\"<b>{kwargs['text']}</b>\"\n"
+        "sh = Shortcoder([Bold('b', [Input('text')])])\n"
+        "assert sh.parse('[%b hi%]') == '<b>hi</b>'"
+    )
+    assert not {"lxml", "asyncio", "concurrent.futures", "inspect"} & modules
+
+
+def test_lxml_loaded_on_reverse():
+    modules = loaded_modules(
+        "from shortcoder import Shortcoder, HtmlPargShortcode, Input\n"
+        "sh = Shortcoder([HtmlPargShortcode('b', [Input('text', xpath='text()')], '<b>{text}</b>')])\n"
+        "assert sh.reverse(sh.parse('[%b hi%]')) == '[%b hi %]'"
+    )
+    assert "lxml.html" in modules
@@ -0,0 +1,51 @@
+from shortcoder.instrument import Instrumentation
+from shortcoder.manager import Shortcoder
+
+
+def test_percentiles():
+    instrumentation = Instrumentation()
+    for i in range(1, 101):
+        instrumentation.record("yt", "render", i)
+    stats = instrumentation.stats()["yt"]["render"]
+    assert stats["count"] == 100
+    assert stats["total"] == 5050
+    assert (stats["p50"], stats["p90"], stats["p99"]) == (50, 90, 99)
+
+
+def test_max_samples():
+    instrumentation = Instrumentation(max_samples=2)
+    for i in range(10):
+        instrumentation.record("yt", "render", i)
+    stats = instrumentation.stats()["yt"]["render"]
+    assert stats["count"] == 10
+    assert stats["p50"] == 8
+
+
+def test_parse_and_reverse_phases(link, yt_shortcode):
+    calls = []
+    sh = Shortcoder(
+        [link, yt_shortcode],
+        instrumentation=Instrumentation(callbacks=[lambda *args: calls.append(args)]),
+    )
+    sh.parse("[%link one two %] [%yt abc %] [%yt def %]")
+    stats = sh.stats()
+    assert set(stats["yt"]) == {"tokenize", "bind", "render"}
+    assert stats["yt"]["render"]["count"] == 2
+    assert stats["link"]["tokenize"]["count"] == 1
+    assert len(calls) == 9
+
+
+def test_reverse_phases(yt_shortcode):
+    sh = Shortcoder([yt_shortcode], instrumentation=Instrumentation())
+    html = sh.parse("<b>x</b> [%yt abc %] [%yt def %]")
+    assert sh.reverse(html) == "<b>x</b> [%yt abc %] [%yt def %]"
+    stats = sh.stats()
+    assert stats["yt"]["reverse.parse"]["count"] == 2
+    assert stats["yt"]["reverse.xpath"]["count"] == 2
+    assert stats["*"]["reverse.regex"]["count"] == 1
+
+
+def test_disabled(yt_shortcode):
+    sh = Shortcoder([yt_shortcode])
+    sh.parse("[%yt abc %]")
+    assert sh.stats() == {}
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from shortcoder.exceptions import UnterminatedShortcode
+from shortcoder.lexer import iter_markers, walk
+from shortcoder.manager import Shortcoder
+
+pattern = Shortcoder.re_shcode
+
+
+def markers(text):
+    return [match.groups() for match in iter_markers(text, pattern)]
+
+
+def test_markers():
+    assert markers("a [%yt abc %] b [%box%] [% x  y%]") == [("yt", " abc "), ("box", ""), ("x", "  y")]
+    assert markers("[%a%] b %]") == [("a", "")]
+    assert markers("[%a%][%b c%]") == [("a", ""), ("b", " c")]
+
+
+def test_literal_markers():
+    # markers without a name are closed before the next marker and stay literal text
+    assert markers("[%%] [% %] 100%] [ % x") == []
+
+
+@pytest.mark.parametrize(
+    "text, position",
+    [("text [%yt abc", 5), ("[%yt abc [%yt def %]", 0), ("[%[%a b%]", 0), ("[%a%]\n [%b", 7), ("[%", 0)],
+)
+def test_unterminated(text, position):
+    with pytest.raises(UnterminatedShortcode) as error:
+        markers(text)
+    assert error.value.args[1] == position
+
+
+def test_unterminated_line_and_column():
+    with pytest.raises(UnterminatedShortcode, match="line 2 column 3"):
+        markers("[%a%]\n  [%b")
+
+
+@pytest.mark.parametrize("text", ["[%" + "a" * 50_000, "[%a " * 50_000, "[%a " + "[" * 50_000, "[%%] " * 50_000])
+def test_linear_time(text):
+    start = time.perf_counter()
+    try:
+        markers(text)
+    except UnterminatedShortcode:
+        pass
+    # quadratic backtracking takes many seconds on these inputs
+    assert time.perf_counter() - start < 1
+
+
+def render(text):
+    def leaf(match):
+        return match.group(1).upper()
+
+    def enclose(match, source, pieces):
+        return f"{match.group(1)}({''.join(pieces)})"
+
+    return "".join(walk(text, pattern, {"box", "row"}, leaf, enclose))
+
+
+def test_walk():
+    assert render("a [%x%] b") == "a X b"
+    assert render("[%box%] a [%x%] [%/box%]") == "box( a X )"
+    assert render("[%box%][%row%][%x%][%/row%][%row%][%/row%][%/box%] [%box%][%/box %]") == "box(row(X)row()) box()"
+
+
+@pytest.mark.parametrize(
+    "text, position",
+    [("[%box%] a", 0), ("a [%/box%]", 2), ("[%box%] [%row%] [%/box%]", 8), ("[%box%][%/box%][%/box%]", 15)],
+)
+def test_unbalanced(text, position):
+    with pytest.raises(UnterminatedShortcode) as error:
+        render(text)
+    assert error.value.args[1] == position
+
+
+def test_deep_nesting():
+    depth = 10_000
+    assert render("[%box%]" * depth + "[%/box%]" * depth) == "box(" * depth + ")" * depth
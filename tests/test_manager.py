@@ -4,7 +4,7 @@ from typing import Dict, List, Optional
 import pytest
 from lxml import html
 
-from shortcoder.exceptions import DuplicateShortcode, NoShortcodesRegistered, UnknownShortcode
+from shortcoder.exceptions import DuplicateShortcode, NoShortcodesRegistered, UnknownShortcode, UnterminatedShortcode
 from shortcoder.manager import Shortcoder
 from shortcoder.shortcodes import KeywordShortcode, PositionalShortcode
 from shortcoder.shortcodes.base import Input
@@ -133,3 +133,44 @@ def test_manager_duplicated_registered():
     positional_link2 = PositionalLink("link", inputs=[Input("url"), Input("text")])
     with pytest.raises(DuplicateShortcode):
         Shortcoder([positional_link, positional_link2])
+
+
+class Box(KeywordShortcode):
+    enclosing = True
+
+    def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
+        return '<div class="{class_}">{content}</div>'.format(**kwargs)
+
+
+class TestEnclosing:
+    def setup_method(self) -> None:
+        box = Box("box", inputs=[Input("class_", default="box")])
+        self.sh = Shortcoder([box, KeywordLink("link", inputs=[Input("url"), Input("text")])])
+
+    def test_body_rendered_first(self):
+        text = "a [%box class_=x%] [%link url=u text=t%] [%/box%] b"
+        assert self.sh.parse(text) == 'a <div class="x"> <a href="u">t</a> </div> b'
+
+    def test_nested(self):
+        text = "[%box%][%box class_=inner%]body[%/box%][%box%][%/box%][%/box%]"
+        assert self.sh.parse(text) == '<div class="box"><div class="inner">body</div><div class="box"></div></div>'
+
+    def test_unterminated(self):
+        with pytest.raises(UnterminatedShortcode) as error:
+            self.sh.parse("text [%box%] [%link url=u text=t%]")
+        assert error.value.args[1] == 5
+        with pytest.raises(UnterminatedShortcode) as error:
+            self.sh.parse("[%link url=u text=t%] [%link url=v")
+        assert error.value.args[1] == 22
+
+    def test_closing_non_enclosing(self):
+        with pytest.raises(UnknownShortcode):
+            self.sh.parse("[%link url=u text=t%][%/link%]")
+
+    def test_flag_set_after_registration(self):
+        link = self.sh.shortcodes["link"]
+        link.enclosing = True
+        assert self.sh.parse("[%link url=u text=t%]x[%/link%]") == '<a href="u">t</a>'
+        link.enclosing = False
+        with pytest.raises(UnknownShortcode):
+            self.sh.parse("[%link url=u text=t%]x[%/link%]")
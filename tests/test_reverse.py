@@ -0,0 +1,194 @@
+import re
+from typing import Dict, Optional
+
+import pytest
+from helpers import make_html_shortcodes, make_shortcoder
+from lxml import html
+
+from shortcoder.exceptions import ShortcodeNotReversible
+from shortcoder.manager import Shortcoder
+from shortcoder.reverse import HtmlReverser
+from shortcoder.shortcodes import KeywordShortcode, PositionalShortcode
+from shortcoder.shortcodes.base import Input
+from shortcoder.shortcodes.html import HtmlKwargShortcode, HtmlPargShortcode
+
+
+class TestHtmlReverser:
+    def setup_method(self) -> None:
+        self.sh = make_shortcoder()
+
+    def test_single_stage(self):
+        assert self.sh._reverse_stages == [self.sh._html_reverser]
+        assert set(self.sh._html_reverser.handlers) == {"shortcode-yt", "shortcode-url", "shortcode-img"}
+
+    def test_round_trip(self):
+        text = "video: [%yt abc %] and [%url href=foo.jpg text=image %]"
+        assert self.sh.reverse(self.sh.parse(text)) == text
+
+    def test_untouched_html(self):
+        text = '<p>plain</p><a href="foo.jpg" class="blue">image</a>'
+        assert self.sh.reverse(text) == text
+
+    def test_each_fragment_parsed_once(self, monkeypatch):
+        calls = []
+        _fromstring = html.fromstring
+
+        def fromstring(text):
+            calls.append(text)
+            return _fromstring(text)
+
+        text = self.sh.parse("[%yt abc %] [%url href=foo.jpg text=image %] [%yt def %]")
+        monkeypatch.setattr(html, "fromstring", fromstring)
+        assert self.sh.reverse(text) == "[%yt abc %] [%url href=foo.jpg text=image %] [%yt def %]"
+        assert len(calls) == 3
+
+
+def test_accepts():
+    assert HtmlReverser.accepts(make_html_shortcodes()[0])
+
+    class CustomReverse(HtmlPargShortcode):
+        def reverse(self, text: str) -> str:
+            return text
+
+    assert not HtmlReverser.accepts(CustomReverse("custom", inputs=[Input("id")], template="<p>{id}</p>"))
+
+
+def test_prefilter_counter(monkeypatch):
+    sh = make_shortcoder()
+    text = sh.parse('<p>plain</p> [%yt abc %] <a href="x">shortcode-yt2</a> <b>x</b>')
+    calls = []
+    _fromstring = html.fromstring
+
+    def fromstring(text):
+        calls.append(text)
+        return _fromstring(text)
+
+    monkeypatch.setattr(html, "fromstring", fromstring)
+    assert sh.reverse(text) == '<p>plain</p> [%yt abc %] <a href="x">shortcode-yt2</a> <b>x</b>'
+    assert len(calls) == 1
+    assert sh.reverse_counter == {"skipped": 3, "parsed": 1}
+
+
+def test_compiled_extractors():
+    shortcode = HtmlKwargShortcode(
+        "img",
+        inputs=[Input("src", xpath="@src"), Input("alt", xpath="@alt"), Input("caption", xpath="span/text()")],
+        template='<figure src="{src}" alt="{alt}"><span>{caption}</span></figure>',
+    )
+    assert [attribute for _, attribute, _ in shortcode._extractors] == ["src", "alt", None]
+    tree = html.fromstring(shortcode.convert({"src": "a.jpg", "alt": "", "caption": "cat"}))
+    assert shortcode._reverse_element(tree) == "[%img src=a.jpg caption=cat %]"
+    # attribute missing from the element falls back to xpath evaluation
+    del tree.attrib["src"]
+    with pytest.raises(IndexError):
+        shortcode._reverse_element(tree)
+
+
+def test_not_reversible():
+    shortcode = HtmlPargShortcode("yt", inputs=[Input("id")], template='<i data-id="{id}"></i>')
+    # decided when the shortcode is created, xpaths are still compiled on first reverse
+    assert shortcode._missing_xpath.name == "id"
+    assert not hasattr(shortcode, "_compiled_extractors")
+    with pytest.raises(ShortcodeNotReversible):
+        Shortcoder([shortcode]).reverse('<i data-id="abc" class="shortcode-yt"></i>')
+
+
+class TestReverseDocument:
+    def setup_method(self) -> None:
+        self.box = HtmlKwargShortcode(
+            "box", inputs=[Input("title", xpath="@title")], template='<div title="{title}"><div>inner</div></div>'
+        )
+        self.sh = make_shortcoder(self.box)
+
+    def test_matches_fragment_mode(self):
+        text = "video: [%yt abc %] and [%url href=foo.jpg text=image %]"
+        rendered = self.sh.parse(text)
+        assert self.sh.reverse(rendered, document=True) == self.sh.reverse(rendered) == text
+
+    def test_source_preserved(self):
+        text = "<P CLASS=x>Odd  <b>markup</b>&amp; entities<!-- comment --></P>\n{yt}<br>\n<ul><li>one<li>two</ul>"
+        rendered = text.format(yt=self.sh.parse("[%yt abc %]"))
+        assert self.sh.reverse(rendered, document=True) == text.format(yt="[%yt abc %]")
+
+    def test_nested_elements(self):
+        text = "before [%box title=outer %] after"
+        rendered = self.sh.parse(text)
+        assert rendered.count("</div>") == 2
+        assert self.sh.reverse(rendered, document=True) == text
+        nested = '<div class="shortcode-box" title="outer"><i data-id="x" class="shortcode-yt"></i></div>'
+        assert self.sh.reverse(nested, document=True) == "[%box title=outer %]"
+
+    def test_void_elements(self):
+        text = "a [%img src=a.png %] b"
+        assert self.sh.reverse(self.sh.parse(text), document=True) == text
+
+    def test_markers_in_comments_and_text(self):
+        text = '<!-- <i class="shortcode-yt" data-id="x"></i> --> shortcode-yt <p class="shortcode-ytx">p</p>'
+        assert self.sh.reverse(text, document=True) == text
+
+
+class Email(KeywordShortcode):
+    re_reverse = re.compile(r'<a href="mailto:(?P<address>[^"]+)">[^<]*</a>')
+
+    def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
+        return '<a href="mailto:{address}">{address}</a>'.format(**kwargs)
+
+
+class Emphasis(PositionalShortcode):
+    re_reverse = re.compile(r"<EM>(?P<text>[^<]*)</EM>", flags=re.IGNORECASE)
+
+    def convert(self, kwargs: Dict[str, str], context: Optional[Dict] = None):
+        return "<em>{text}</em>".format(**kwargs)
+
+    def extract(self, match: re.Match) -> Optional[Dict[str, str]]:
+        # only non-empty emphasis is a shortcode
+        return super().extract(match) if match.group("text") else None
+
+
+class AnyLink(KeywordShortcode):
+    re_reverse = re.compile(r'<a href="(?P<address>[^"]+)">[^<]*</a>')
+
+
+class Repeated(PositionalShortcode):
+    re_reverse = re.compile(r"<(b)>(?P<text>[^<]*)</\1>")
+
+
+class TestPatternReverser:
+    def setup_method(self) -> None:
+        self.email = Email("email", inputs=[Input("address")])
+        self.emphasis = Emphasis("em", inputs=[Input("text")])
+        self.sh = Shortcoder([self.email, self.emphasis])
+
+    def test_single_stage(self):
+        assert self.sh._reverse_stages == [self.sh._pattern_reverser]
+        assert self.sh._pattern_reverser.handlers == [self.email, self.emphasis]
+
+    def test_round_trip(self):
+        text = "mail [%email address=me@example.com %] or [%em hello %]"
+        rendered = self.sh.parse(text)
+        assert self.sh.reverse(rendered) == text
+        assert self.sh.reverse(rendered) == self.email.reverse(self.emphasis.reverse(rendered))
+
+    def test_extract_skips_match(self):
+        assert self.sh.reverse("<em></em> <EM>x</EM>") == "<em></em> [%em x %]"
+
+    def test_overlap_first_registered_wins(self):
+        any_link = AnyLink("link", inputs=[Input("address")])
+        text = '<a href="mailto:me@example.com">me@example.com</a>'
+        assert Shortcoder([self.email, any_link]).reverse(text) == "[%email address=me@example.com %]"
+        assert Shortcoder([any_link, self.email]).reverse(text) == "[%link address=mailto:me@example.com %]"
+
+    def test_numbered_backreference_not_merged(self):
+        repeated = Repeated("b", inputs=[Input("text")])
+        sh = Shortcoder([self.email, repeated])
+        assert sh._reverse_stages == [sh._pattern_reverser, repeated]
+        assert sh.reverse("<b>bold</b> <b>x</i>") == "[%b bold %] <b>x</i>"
+
+    def test_overridden_reverse_not_merged(self):
+        class OwnReverse(Email):
+            def reverse(self, text: str) -> str:
+                return text
+
+        own = OwnReverse("own", inputs=[Input("address")])
+        sh = Shortcoder([own])
+        assert sh._reverse_stages == [own]
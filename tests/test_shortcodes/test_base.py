@@ -1,5 +1,7 @@
+import pickle
+
 import pytest
-from shortcoder import PositionalShortcode, Input
+from shortcoder import HtmlKwargShortcode, HtmlPargShortcode, Input, KeywordShortcode, PositionalShortcode
 from shortcoder.exceptions import InvalidInput
 
 class TestPargInit:
@@ -8,4 +10,54 @@ class TestPargInit:
             PositionalShortcode("test", inputs=[Input("foo", default="abc"), Input("bar")])
         with pytest.raises(InvalidInput, match="bar has default abc but is not trailing"):
             PositionalShortcode("test", inputs=[Input("foo"), Input("bar", default="abc"), Input("gaz")])
-        PositionalShortcode("test", inputs=[Input("foo", default="abc"), Input("bar", default="abc")])
\ No newline at end of file
+        PositionalShortcode("test", inputs=[Input("foo", default="abc"), Input("bar", default="abc")])
+
+
+class Counter(PositionalShortcode):
+    def convert(self, kwargs, context=None):
+        return kwargs["value"]
+
+
+def test_slots():
+    assert not hasattr(Input("foo"), "__dict__")
+    assert not hasattr(PositionalShortcode("test", inputs=[]), "__dict__")
+    assert not hasattr(HtmlPargShortcode("test", inputs=[Input("id")], template="<i>{id}</i>"), "__dict__")
+    # subclasses without __slots__ keep their instance attributes
+    shortcode = Counter("count", inputs=[Input("value")])
+    shortcode.cacheable = False
+    assert pickle.loads(pickle.dumps(shortcode)).cacheable is False
+
+
+@pytest.mark.parametrize(
+    "shortcode",
+    [
+        PositionalShortcode("test", inputs=[]),
+        KeywordShortcode("test", inputs=[]),
+        HtmlPargShortcode("test", inputs=[Input("id")], template="<i>{id}</i>"),
+        HtmlKwargShortcode("test", inputs=[Input("id")], template="<i>{id}</i>"),
+    ],
+)
+def test_flags(shortcode):
+    assert (shortcode.cacheable, shortcode.enclosing) == (True, False)
+    shortcode.cacheable = False
+    shortcode.enclosing = True
+    restored = pickle.loads(pickle.dumps(shortcode))
+    assert (restored.cacheable, restored.enclosing) == (False, True)
+
+
+def test_class_flags():
+    class Box(PositionalShortcode):
+        cacheable = False
+        enclosing = True
+
+    box = Box("box", inputs=[])
+    assert (box.cacheable, box.enclosing) == (False, True)
+    box.enclosing = False
+    assert (box.enclosing, Box("box", inputs=[]).enclosing) == (False, True)
+
+
+def test_pickle():
+    inp = pickle.loads(pickle.dumps(Input("foo", xpath="@foo", default="abc")))
+    assert (inp.name, inp.xpath, inp.default) == ("foo", "@foo", "abc")
+    shortcode = pickle.loads(pickle.dumps(HtmlPargShortcode("test", inputs=[Input("id")], template="<i>{id}</i>")))
+    assert shortcode.convert({"id": "x"}) == '<i class="shortcode-test">x</i>'
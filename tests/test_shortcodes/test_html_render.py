@@ -0,0 +1,107 @@
+import pytest
+
+from shortcoder.exceptions import InvalidTemplate, ShortcodeNotReversible
+from shortcoder.manager import Shortcoder
+from shortcoder.shortcodes.base import Input
+from shortcoder.shortcodes.html import HtmlKwargShortcode, HtmlPargShortcode
+
+YT_TEMPLATE = (
+    '<iframe width="560" height="315" data-id="{id}" src="https://www.youtube.com/embed/{id}" '
+    'title="YouTube video player" frameborder="0" allow="accelerometer; autoplay" allowfullscreen></iframe>'
+)
+
+
+def lxml_convert(shortcode, kwargs):
+    fast_template, shortcode._fast_template = shortcode._fast_template, None
+    try:
+        return shortcode.convert(kwargs)
+    finally:
+        shortcode._fast_template = fast_template
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        YT_TEMPLATE,
+        '<a href="{id}" class="blue">{text}</a>',
+        "<a href='{id}'>{text}</a>",
+        '<div>  {text}  <br/><img src="{id}"></div>',
+        "<p>&amp; {text} &nbsp;</p>",
+        # libxml2 leaves out the end tag of an empty <li>
+        "<ul><li>{text}</li></ul>",
+        '<li class="item">{text}</li>',
+    ],
+)
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"id": "2fmCcfAb4k4", "text": "image"},
+        {"id": "", "text": ""},
+        {"id": "x", "text": " "},
+        {"id": "with space", "text": "café & <b>bold</b>"},
+        {"id": "quote's", "text": 'quote"s'},
+    ],
+)
+def test_fast_path_matches_lxml(template, kwargs):
+    shortcode = HtmlPargShortcode("yt", inputs=[Input("id", xpath="@href"), Input("text")], template=template)
+    assert shortcode._fast_template is not None
+    assert shortcode.convert(kwargs) == lxml_convert(shortcode, kwargs)
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        "{text}",
+        "text <b>{text}</b>",
+        "<a {id}>x</a>",
+        "<a title={id}>{text}</a>",
+        "<a>{text!r}</a>",
+        "<a>{context[page]}</a>",
+    ],
+)
+def test_fast_path_fallback(template):
+    shortcode = HtmlPargShortcode("yt", inputs=[Input("id"), Input("text")], template=template)
+    assert shortcode._fast_template is None
+
+
+def test_unknown_placeholder():
+    with pytest.raises(InvalidTemplate):
+        HtmlPargShortcode("yt", inputs=[Input("id")], template='<i data-id="{idd}"></i>')
+
+
+def test_escape():
+    shortcode = HtmlKwargShortcode(
+        "link", inputs=[Input("href"), Input("text")], template='<a href="{href}">{text}</a>', escape=["text"]
+    )
+    assert shortcode._fast_template is not None
+    assert shortcode.convert({"href": "a", "text": "<b>bold</b>"}) == (
+        '<a href="a" class="shortcode-link">&lt;b&gt;bold&lt;/b&gt;</a>'
+    )
+    assert shortcode.convert({"href": "a", "text": "plain"}) == '<a href="a" class="shortcode-link">plain</a>'
+
+
+def test_callable_template():
+    shortcode = HtmlPargShortcode("yt", inputs=[Input("id")], template=lambda id, **_: f'<i data-id="{id}"></i>')
+    assert shortcode._fast_template is None
+    assert shortcode.convert({"id": "x"}) == '<i data-id="x" class="shortcode-yt"></i>'
+    with pytest.raises(InvalidTemplate):
+        HtmlPargShortcode("yt", inputs=[Input("id")], template=lambda id, **_: id, escape=["id"])
+
+
+def test_enclosing_content():
+    # content is only a placeholder of enclosing shortcodes
+    with pytest.raises(InvalidTemplate):
+        HtmlKwargShortcode("box", inputs=[Input("kind")], template='<div data-kind="{kind}">{content}</div>')
+    box = HtmlKwargShortcode(
+        "box",
+        inputs=[Input("kind", xpath="@data-kind", default="note")],
+        template='<div data-kind="{kind}">{content}</div>',
+        enclosing=True,
+    )
+    assert box.enclosing and box._fast_template is None
+    sh = Shortcoder([box, HtmlPargShortcode("b", inputs=[Input("text", xpath="text()")], template="<b>{text}</b>")])
+    assert sh.parse("[%box kind=tip %]see [%b bold %] &amp; more[%/box%]") == (
+        '<div data-kind="tip" class="shortcode-box">see <b class="shortcode-b">bold</b> &amp; more</div>'
+    )
+    with pytest.raises(ShortcodeNotReversible):
+        sh.reverse(sh.parse("[%box%]text[%/box%]"))
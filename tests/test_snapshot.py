@@ -0,0 +1,102 @@
+import io
+import pickle
+import subprocess
+import sys
+import zlib
+from pathlib import Path
+
+import pytest
+from helpers import make_html_shortcodes, make_link, make_shortcoder
+
+from shortcoder import snapshot
+from shortcoder.instrument import Instrumentation
+from shortcoder.manager import Shortcoder
+from shortcoder.shortcodes import PositionalShortcode
+from shortcoder.shortcodes.html import HtmlPargShortcode
+from shortcoder.verify import Verification
+
+TEXT = '[%link one two %] [%yt abc %] [%img src=a.jpg alt="a & b" %] [%img src=b.jpg %]'
+HTML_TEXT = '[%yt abc %] [%img src=a.jpg alt="a & b" %]'
+
+
+def test_round_trip(tmp_path):
+    sh = make_shortcoder(make_link())
+    path = tmp_path / "registry.snapshot"
+    sh.snapshot(path)
+    restored = Shortcoder.from_snapshot(path)
+    assert list(restored.shortcodes) == list(sh.shortcodes)
+    assert restored.parse(TEXT) == sh.parse(TEXT)
+    sh = Shortcoder(make_html_shortcodes())
+    restored = snapshot.loads(snapshot.dumps(sh))
+    rendered = sh.parse(HTML_TEXT)
+    assert restored.reverse(rendered) == sh.reverse(rendered)
+    assert restored.reverse(rendered, document=True) == sh.reverse(rendered, document=True)
+
+
+def test_file_object():
+    buffer = io.BytesIO()
+    make_shortcoder(make_link()).snapshot(buffer)
+    buffer.seek(0)
+    assert Shortcoder.from_snapshot(buffer).parse("[%yt abc %]") == make_shortcoder(make_link()).parse("[%yt abc %]")
+
+
+def test_constructors_skipped(monkeypatch):
+    data = snapshot.dumps(make_shortcoder(make_link()))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("constructor called")
+
+    monkeypatch.setattr(PositionalShortcode, "__init__", fail)
+    monkeypatch.setattr(HtmlPargShortcode, "_compile_fast_template", fail)
+    restored = snapshot.loads(data)
+    assert restored.shortcodes["yt"]._fast_template is not None
+    assert restored.parse("[%yt abc %]") == '<i data-id="abc" class="shortcode-yt"></i>'
+
+
+def test_runtime_state_dropped():
+    sh = make_shortcoder(
+        make_link(), cache_size=8, instrumentation=Instrumentation(), verification=Verification(rate=0.5)
+    )
+    sh.parse(TEXT)
+    restored = snapshot.loads(snapshot.dumps(sh))
+    assert restored.instrumentation is None and restored.verification is None
+    assert restored.render_cache.maxsize == 8 and len(restored.render_cache) == 0
+    assert len(sh.render_cache) and sh.instrumentation is not None
+
+
+def test_compiled_xpaths_not_pickled():
+    sh = Shortcoder(make_html_shortcodes())
+    rendered = sh.parse(HTML_TEXT)
+    sh.reverse(rendered, document=True)
+    restored = pickle.loads(pickle.dumps(sh))
+    assert restored.reverse(rendered, document=True) == sh.reverse(rendered, document=True)
+
+
+def test_invalid_snapshot(tmp_path):
+    with pytest.raises(ValueError):
+        snapshot.loads(b"not a snapshot")
+    data = snapshot.dumps(make_shortcoder(make_link()))
+    with pytest.raises(ValueError):
+        snapshot.loads(snapshot.MAGIC + (snapshot.VERSION + 1).to_bytes(2, "big") + data[len(snapshot.MAGIC) + 2 :])
+    path = tmp_path / "other.snapshot"
+    path.write_bytes(snapshot.MAGIC + snapshot.VERSION.to_bytes(2, "big") + zlib.compress(pickle.dumps({})))
+    with pytest.raises(ValueError):
+        Shortcoder.from_snapshot(path)
+    assert snapshot.is_snapshot(path)
+    assert not snapshot.is_snapshot(tmp_path / "missing")
+
+
+def test_lxml_imported_lazily(tmp_path):
+    path = tmp_path / "registry.snapshot"
+    # shortcodes defined in the tests could not be unpickled in another process
+    Shortcoder(make_html_shortcodes()).snapshot(path)
+    code = f"""
+import sys
+from shortcoder import Shortcoder
+sh = Shortcoder.from_snapshot({str(path)!r})
+assert sh.parse("[%yt abc %] [%img src=a.jpg %]")
+assert "lxml" not in sys.modules, "imported on load"
+sh.reverse(sh.parse("[%yt abc %]"))
+assert "lxml" in sys.modules
+"""
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).parents[1])
@@ -0,0 +1,139 @@
+import io
+import re
+
+import pytest
+from helpers import make_link, make_shortcoder
+
+from shortcoder.exceptions import UnknownShortcode
+from shortcoder.manager import Shortcoder
+from shortcoder.stream import bytes_pattern, iter_chunks
+
+
+def split_every(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def test_iter_chunks():
+    assert list(iter_chunks(io.StringIO("abcde"), chunk_size=2)) == ["ab", "cd", "e"]
+    assert list(iter_chunks(["ab", "c"])) == ["ab", "c"]
+    assert list(iter_chunks("abc")) == ["abc"]
+
+
+class TestParseStream:
+    def setup_method(self) -> None:
+        self.sh = Shortcoder([make_link()])
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 100])
+    def test_matches_parse(self, size):
+        text = "start [%link one two %] middle [%link 'three four'%] [ % [% end"
+        # unlike parse, streams keep unterminated markers as literal text
+        assert "".join(self.sh.parse_stream(split_every(text, size))) == self.sh.tokenize(text).render()
+
+    def test_file_object(self):
+        text = "[%link one %] text " * 100
+        output = self.sh.parse_stream(io.StringIO(text), chunk_size=16)
+        assert "".join(output) == self.sh.parse(text)
+
+    def test_max_span(self):
+        chunks = ["[%link one ", "x" * 10, "%]"]
+        assert "".join(self.sh.parse_stream(chunks, max_span=5)) == "".join(chunks)
+        assert "".join(self.sh.parse_stream(chunks)) == self.sh.parse("".join(chunks))
+
+    def test_bounded_buffer(self):
+        chunks = ["text [%link one %] " for _ in range(1000)]
+        for output in self.sh.parse_stream(chunks):
+            assert len(output) < 100
+
+    def test_enclosing_rejected(self):
+        read = []
+        chunks = (read.append(chunk) or chunk for chunk in ["[%link one%]body[%/link%]"])
+        self.sh.shortcodes["link"].enclosing = True
+        with pytest.raises(ValueError):
+            self.sh.parse_stream(chunks)
+        assert read == []
+
+
+class TestParseBuffer:
+    def setup_method(self) -> None:
+        self.sh = Shortcoder([make_link()])
+
+    @pytest.mark.parametrize("encoding", ["utf-8", "latin-1"])
+    def test_matches_parse(self, encoding):
+        text = "start [%link one two %] middle [%\xa0link 'three four'%] [%link é%] [ % [% end"
+        output = io.BytesIO()
+        written = self.sh.parse_buffer(text.encode(encoding), output, encoding=encoding)
+        assert output.getvalue().decode(encoding) == self.sh.tokenize(text).render()
+        assert written == len(output.getvalue())
+
+    @pytest.mark.parametrize("buffer_type", [bytearray, memoryview])
+    def test_buffer_types(self, buffer_type):
+        text = "a [%link one %] b"
+        output = io.BytesIO()
+        self.sh.parse_buffer(buffer_type(text.encode()), output)
+        assert output.getvalue().decode() == self.sh.parse(text)
+
+    def test_multibyte_whitespace(self):
+        # unicode whitespace separates names and names never end inside a multi-byte character
+        text = "[%link\u3000one%] [%日本 x%]"
+        with pytest.raises(UnknownShortcode) as parsed:
+            self.sh.parse(text)
+        with pytest.raises(UnknownShortcode) as buffered:
+            self.sh.parse_buffer(text.encode(), io.BytesIO())
+        assert buffered.value.args == parsed.value.args
+        text = "[%link\u3000one%]"
+        output = io.BytesIO()
+        self.sh.parse_buffer(text.encode(), output)
+        assert output.getvalue().decode() == self.sh.parse(text)
+
+    def test_whitespace_table(self):
+        pattern = bytes_pattern(re.compile(r"\s"))
+        for codepoint in range(0x3001):
+            character = chr(codepoint)
+            assert bool(pattern.fullmatch(character.encode("utf-8", "surrogatepass"))) == character.isspace()
+
+    def test_unsupported_encoding(self):
+        with pytest.raises(ValueError):
+            self.sh.parse_buffer("[%link one%]".encode("utf-16"), io.BytesIO(), encoding="utf-16")
+
+    def test_parse_file(self, tmp_path):
+        text = "start [%link one two %] é " * 1000
+        source, target = tmp_path / "source.txt", tmp_path / "target.txt"
+        source.write_text(text, encoding="utf-8")
+        written = self.sh.parse_file(source, target)
+        assert target.read_text(encoding="utf-8") == self.sh.parse(text)
+        assert written == target.stat().st_size
+
+    def test_parse_empty_file(self, tmp_path):
+        source, target = tmp_path / "source.txt", tmp_path / "target.txt"
+        source.write_bytes(b"")
+        assert self.sh.parse_file(source, target) == 0
+        assert target.read_bytes() == b""
+
+    def test_parse_file_in_place(self, tmp_path):
+        source = tmp_path / "source.txt"
+        source.write_text("[%link one%]")
+        with pytest.raises(ValueError):
+            self.sh.parse_file(source, source)
+        assert source.read_text() == "[%link one%]"
+
+    def test_enclosing_rejected(self, tmp_path):
+        self.sh.shortcodes["link"].enclosing = True
+        output = io.BytesIO()
+        with pytest.raises(ValueError):
+            self.sh.parse_buffer(b"[%link one%]a[%/link%]", output)
+        assert output.getvalue() == b""
+        source, target = tmp_path / "source.txt", tmp_path / "target.txt"
+        source.write_text("[%link one%]a[%/link%]")
+        with pytest.raises(ValueError):
+            self.sh.parse_file(source, target)
+        assert not target.exists()
+
+
+class TestReverseStream:
+    def setup_method(self) -> None:
+        self.sh = make_shortcoder()
+
+    @pytest.mark.parametrize("size", [1, 2, 5, 13, 1000])
+    def test_matches_reverse(self, size):
+        text = self.sh.parse("<p>start</p> [%yt abc %] <b>middle</b><br> [%yt def %] end <")
+        assert "".join(self.sh.reverse_stream(split_every(text, size))) == self.sh.reverse(text)
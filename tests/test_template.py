@@ -0,0 +1,53 @@
+import pickle
+
+import pytest
+
+from shortcoder.exceptions import InvalidTemplate
+from shortcoder.template import Template
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "",
+        "plain text",
+        "{a}",
+        "<i data-id='{a}'>{b}</i>{a}",
+        "{a!r} {b:>6} {{literal}}",
+        "{c[key]} {a:{width}}",
+    ],
+)
+def test_renders_like_format(source):
+    values = {"a": "x&y", "b": 5, "c": {"key": "value"}, "width": 8}
+    assert Template(source).render(values) == source.format(**values)
+    assert Template(source)(**values) == source.format(**values)
+
+
+def test_fields():
+    template = Template("{a} {c[key]} {b:{width}}")
+    assert template.fields == {"a", "b", "c", "width"}
+
+
+@pytest.mark.parametrize("source", ["{unknown}", "{0}", "{}", "{a:{unknown}}", "{a"])
+def test_invalid(source):
+    with pytest.raises(InvalidTemplate):
+        Template(source, fields=["a"])
+
+
+def test_escape():
+    template = Template('<a title="{title}">{text}</a>', escape=["title"])
+    assert template(title='"<b>"', text="<b>") == '<a title="&quot;&lt;b&gt;&quot;"><b></a>'
+    with pytest.raises(InvalidTemplate):
+        Template("{a}", escape=["b"])
+
+
+def test_pickle():
+    template = Template("<b>{a}</b>", escape=["a"])
+    assert pickle.loads(pickle.dumps(template))(a="&") == "<b>&amp;</b>"
+
+
+def test_shared():
+    template = Template.shared("<b>{a}</b>", fields=("a",))
+    assert Template.shared("<b>{a}</b>", fields=("a",)) is template
+    assert Template.shared("<b>{a}</b>", fields=("a",), escape=("a",)) is not template
+    assert not hasattr(template, "__dict__")
@@ -0,0 +1,53 @@
+import random
+import shlex
+
+import pytest
+
+from shortcoder.tokenizer import split_args
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "one two",
+        "  one\ttwo\nthree ",
+        """url="one's" text=two""",
+        """'one' "two" """,
+        """text="two plus" url=one""",
+        r'escaped\ space "quoted \"inner\" \\ \n" \'',
+        """a""b''c""",
+        "key=",
+    ],
+)
+def test_matches_shlex(text):
+    assert split_args(text) == shlex.split(text)
+
+
+@pytest.mark.parametrize(
+    "text, error",
+    [
+        ("url=one's text=two", "No closing quotation"),
+        ('"unclosed', "No closing quotation"),
+        ("trailing\\", "No escaped character"),
+        ('"unclosed\\', "No escaped character"),
+    ],
+)
+def test_errors(text, error):
+    with pytest.raises(ValueError, match=error):
+        split_args(text)
+
+
+def test_fuzz_against_shlex():
+    rnd = random.Random(0)
+    alphabet = " \t\nab='\"\\="
+
+    def run(func, text):
+        try:
+            return func(text)
+        except ValueError as e:
+            return str(e)
+
+    for _ in range(5000):
+        text = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 12)))
+        assert run(split_args, text) == run(shlex.split, text), text
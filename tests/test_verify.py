@@ -0,0 +1,116 @@
+import re
+
+import pytest
+from helpers import make_html_shortcodes, make_shortcoder
+
+from shortcoder.exceptions import RoundTripError
+from shortcoder.instrument import Instrumentation
+from shortcoder.manager import Shortcoder
+from shortcoder.shortcodes import KeywordShortcode
+from shortcoder.shortcodes.base import Input
+from shortcoder.shortcodes.html import HtmlPargShortcode
+from shortcoder.verify import Verification
+
+
+class Box(KeywordShortcode):
+    enclosing = True
+
+    def convert(self, kwargs, context=None):
+        return f'<div class="box">{kwargs["content"]}</div>'
+
+    def reverse(self, text):
+        return re.sub(r'<div class="box">(.*?)</div>', r"[%box%]\1[%/box%]", text)
+
+
+# title is rendered to an attribute the input does not read back
+LOSSY = HtmlPargShortcode("lossy", inputs=[Input("title", xpath="@title")], template='<b data-t="{title}">x</b>')
+
+
+def test_verify_reports_positions():
+    sh = make_shortcoder(LOSSY)
+    text = "intro [%yt abc %]\n[%url href=a.html text=home %] [%lossy hi %]"
+    mismatches = sh.verify(text)
+    assert len(mismatches) == 1
+    mismatch = mismatches[0]
+    assert (mismatch.name, mismatch.line, mismatch.column) == ("lossy", 2, 32)
+    assert text[mismatch.start : mismatch.end] == mismatch.source == "[%lossy hi %]"
+    assert mismatch.output == sh.parse("[%lossy hi %]")
+    assert "line 2 column 32" in str(mismatch)
+
+
+def test_verify_quoting():
+    sh = make_shortcoder(LOSSY)
+    mismatches = sh.verify("""[%url href='say "hi"' %]""")
+    assert [mismatch.name for mismatch in mismatches] == ["url"]
+    assert mismatches[0].error is None and mismatches[0].rendered != mismatches[0].output
+
+
+def test_verify_uses_render_cache():
+    sh = make_shortcoder(LOSSY, cache_size=16)
+    assert sh.verify("[%yt abc %] [%url href=a.html %]") == []
+    assert sh.render_cache.stats()["hits"] == 2
+
+
+def test_verify_enclosing():
+    # box is reversed before the HTML shortcodes of its body
+    sh = Shortcoder([Box("box", inputs=[])] + make_html_shortcodes() + [LOSSY])
+    assert sh.verify("[%box%]see [%yt abc %][%/box%]") == []
+    mismatches = sh.verify("[%box%][%lossy hi %][%/box%]")
+    assert [mismatch.name for mismatch in mismatches] == ["lossy", "box"]
+
+
+def test_verification_not_recorded():
+    verification = Verification()
+    sh = make_shortcoder(LOSSY, verification=verification, instrumentation=Instrumentation())
+    sh.parse("[%yt abc %] [%url href=a.html %] [%lossy hi %]")
+    assert verification.checked == 3
+    assert sh.reverse_counter == {"skipped": 0, "parsed": 0}
+    stats = sh.stats()
+    assert set(stats["yt"]) == {"tokenize", "bind", "render"}
+    assert stats["yt"]["render"]["count"] == 1
+    sh.verify("[%yt abc %]")
+    assert sh.reverse_counter == {"skipped": 0, "parsed": 0}
+    assert sh.stats()["yt"]["render"]["count"] == 2
+
+
+@pytest.mark.parametrize(
+    "settings, checked",
+    [
+        ({}, 12),
+        ({"per_document": 2}, 2),
+        ({"per_shortcode": 1}, 3),
+        ({"rate": 1.0}, 12),
+    ],
+)
+def test_sampling(settings, checked):
+    verification = Verification(seed=0, **settings)
+    sh = make_shortcoder(LOSSY, verification=verification)
+    sh.parse("[%yt a %] [%url href=b %] [%lossy c %] [%yt d %]" * 3)
+    assert verification.stats()["instances"] == 12
+    assert verification.checked == checked
+    assert verification.mismatched == sum(mismatch.name == "lossy" for mismatch in verification.mismatches)
+
+
+def test_sampling_rate():
+    verification = Verification(rate=0.1, seed=0)
+    sh = make_shortcoder(LOSSY, verification=verification, cache_size=16)
+    sh.parse("[%yt a %] " * 1000)
+    assert 50 < verification.checked < 150
+    assert verification.mismatched == 0
+
+
+def test_strict_and_callbacks():
+    found = []
+    verification = Verification(strict=True, callbacks=[found.append])
+    sh = make_shortcoder(LOSSY, verification=verification)
+    assert sh.parse("[%yt abc %]") == '<i data-id="abc" class="shortcode-yt"></i>'
+    with pytest.raises(RoundTripError) as error:
+        sh.parse("[%yt abc %] [%lossy hi %]")
+    assert error.value.args[1] is found[0]
+    assert found[0].name == "lossy"
+
+
+@pytest.mark.parametrize("settings", [{"rate": 1.5}, {"per_document": -1}, {"per_shortcode": -1}])
+def test_invalid_settings(settings):
+    with pytest.raises(ValueError):
+        Verification(**settings)